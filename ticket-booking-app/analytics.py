@@ -0,0 +1,405 @@
+import threading
+from datetime import datetime, timedelta
+from itertools import chain
+
+import numpy as np
+from sqlalchemy import BigInteger, Integer, cast, select
+
+from models import db, Airport, Airline, Flight, Booking
+
+GRANULARITIES = ('day', 'week', 'month')
+GROUPINGS = ('airline', 'route')
+
+
+def epoch_seconds(column):
+    """Выражение для unix-времени колонки DateTime на стороне БД"""
+    if db.engine.dialect.name == 'sqlite':
+        # unixepoch() (SQLite 3.38+) заметно быстрее strftime('%s') на миллионах строк
+        if db.engine.dialect.dbapi.sqlite_version_info >= (3, 38):
+            return db.func.unixepoch(column)
+        return cast(db.func.strftime('%s', column), Integer)
+    return cast(db.func.extract('epoch', column), BigInteger)
+
+
+def bucket_starts(epochs, granularity):
+    """Векторно переводит unix-время в начало дня/недели/месяца (datetime64[D])"""
+    days = epochs.astype('datetime64[s]').astype('datetime64[D]')
+    if granularity == 'week':
+        # 1970-01-01 - четверг, сдвигаем так, чтобы неделя начиналась с понедельника
+        offset = (days.astype(np.int64) + 3) % 7
+        return days - offset.astype('timedelta64[D]')
+    if granularity == 'month':
+        return days.astype('datetime64[M]').astype('datetime64[D]')
+    return days
+
+
+def _fetch_columns(statement, width):
+    """
+    Загружает результат запроса в двумерный массив float64.
+    Строки читаются прямо из курсора DBAPI, минуя объекты Row SQLAlchemy
+    (на миллионе строк это больше трети времени), и разворачиваются
+    в плоский поток значений без построчной обработки в Python.
+    """
+    result = db.session.connection().execute(statement)
+    try:
+        rows = result.cursor.fetchall()
+    finally:
+        result.close()
+    values = np.fromiter(chain.from_iterable(rows), dtype=np.float64, count=len(rows) * width)
+    return values.reshape(-1, width)
+
+
+def _group_labels(group_by, keys):
+    """Подписи для групп: код авиакомпании или маршрут по кодам аэропортов"""
+    if group_by == 'airline':
+        airlines = dict(db.session.query(Airline.id, Airline.code).filter(Airline.id.in_(keys)).all())
+        return {key: airlines.get(key, str(key)) for key in keys}
+
+    airport_ids = {int(key) >> 32 for key in keys} | {int(key) & 0xFFFFFFFF for key in keys}
+    airports = dict(db.session.query(Airport.id, Airport.code).filter(Airport.id.in_(airport_ids)).all())
+    return {
+        key: f"{airports.get(int(key) >> 32, '?')} → {airports.get(int(key) & 0xFFFFFFFF, '?')}"
+        for key in keys
+    }
+
+
+def _aggregate(buckets, groups, *weights):
+    """Суммирует weights по парам (период, группа)"""
+    if len(buckets) == 0:
+        return np.empty(0, dtype='datetime64[D]'), np.empty(0, dtype=np.int64), [np.empty(0)] * len(weights)
+
+    # Сворачиваем пару (день, группа) в один целочисленный ключ
+    unique_groups, group_index = np.unique(groups, return_inverse=True)
+    days = buckets.astype(np.int64)
+    keys = days * len(unique_groups) + group_index
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+
+    sums = [np.bincount(inverse, weights=w, minlength=len(unique_keys)) for w in weights]
+    result_buckets = (unique_keys // len(unique_groups)).astype('datetime64[D]')
+    result_groups = unique_groups[unique_keys % len(unique_groups)]
+    return result_buckets, result_groups, sums
+
+
+def booking_timeseries(company_id=None, start_date=None, end_date=None,
+                       granularity='day', group_by='airline'):
+    """
+    Временной ряд выручки, количества бронирований и загрузки рейсов.
+
+    Бронирования выгружаются одним запросом в виде колонок
+    (booking_date, price_paid, flight_id) и группируются массивами NumPy.
+    Выручка и бронирования относятся к периоду даты бронирования,
+    загрузка (load factor) - к периоду вылета рейса.
+
+    Время на миллионе бронирований определяется чтением строк из БД
+    (в SQLite около секунды только на fetchall); свертка в NumPy занимает
+    доли секунды, см. benchmarks/bench_statistics.py.
+    """
+    now = datetime.utcnow()
+    end_date = end_date or now
+    start_date = start_date or end_date - timedelta(days=90)
+
+    flight_columns = (
+        Flight.id,
+        Flight.airline_id,
+        Flight.departure_airport_id,
+        Flight.arrival_airport_id,
+        epoch_seconds(Flight.departure_time),
+        db.func.coalesce(Flight.total_seats, 0),
+        db.func.coalesce(Flight.total_seats - Flight.available_seats, 0),
+    )
+
+    # Бронирования за период одним запросом по покрывающему индексу:
+    # (flight_id, booking_date, price_paid)
+    booking_query = select(
+        Booking.flight_id,
+        epoch_seconds(Booking.booking_date),
+        Booking.price_paid,
+    ).where(
+        Booking.booking_date >= start_date,
+        Booking.booking_date <= end_date,
+    )
+    if company_id is not None:
+        booking_query = booking_query.where(
+            Booking.flight_id.in_(select(Flight.id).where(Flight.airline_id == company_id))
+        )
+    bookings = _fetch_columns(booking_query, 3)
+
+    # Рейсы, вылетающие не раньше начала периода: на уже вылетевший рейс
+    # забронировать нельзя, поэтому их достаточно для всех бронирований периода
+    flight_query = select(*flight_columns).where(Flight.departure_time >= start_date)
+    if company_id is not None:
+        flight_query = flight_query.where(Flight.airline_id == company_id)
+    flights = _fetch_columns(flight_query.order_by(Flight.id), 7)
+
+    # Рейсы, которых не оказалось в выборке (например, исторические данные), дозагружаем по id
+    booking_flights = bookings[:, 0].astype(np.int64)
+    missing = np.setdiff1d(booking_flights, flights[:, 0].astype(np.int64))
+    for offset in range(0, len(missing), 500):
+        chunk = [int(flight_id) for flight_id in missing[offset:offset + 500]]
+        extra = _fetch_columns(select(*flight_columns).where(Flight.id.in_(chunk)), 7)
+        # Дозагруженные рейсы не вылетают в периоде и не влияют на загрузку
+        extra[:, 4] = -1
+        flights = np.concatenate([flights, extra])
+    if len(missing):
+        flights = flights[np.argsort(flights[:, 0], kind='stable')]
+
+    flight_ids = flights[:, 0].astype(np.int64)
+    if group_by == 'route':
+        # Пара (вылет, прилет), упакованная в int64
+        flight_groups = (flights[:, 2].astype(np.int64) << 32) | flights[:, 3].astype(np.int64)
+    else:
+        flight_groups = flights[:, 1].astype(np.int64)
+
+    # Сопоставляем бронирования с рейсами бинарным поиском по id. Бронирования,
+    # рейс которых так и не нашелся (или рейсов нет вовсе), не учитываются
+    positions = np.searchsorted(flight_ids, booking_flights)
+    matched = positions < len(flight_ids)
+    matched[matched] = flight_ids[positions[matched]] == booking_flights[matched]
+    positions = positions[matched]
+
+    # Загрузка рейсов, вылетающих в периоде
+    end_epoch = (end_date - datetime(1970, 1, 1)).total_seconds()
+    departing = (flights[:, 4] >= 0) & (flights[:, 4] <= end_epoch) & (flights[:, 5] > 0)
+
+    # Бронирования (по дате бронирования) и рейсы (по дате вылета) сворачиваются
+    # одним проходом: у бронирований нулевые места, у рейсов - нулевая выручка
+    booking_zeros = np.zeros(len(positions))
+    flight_zeros = np.zeros(int(departing.sum()))
+    buckets, keys, (booking_counts, revenue, capacity, booked) = _aggregate(
+        bucket_starts(np.concatenate([bookings[matched, 1], flights[departing, 4]]).astype(np.int64), granularity),
+        np.concatenate([flight_groups[positions], flight_groups[departing]]),
+        np.concatenate([np.ones(len(positions)), flight_zeros]),
+        np.concatenate([bookings[matched, 2], flight_zeros]),
+        np.concatenate([booking_zeros, flights[departing, 5]]),
+        np.concatenate([booking_zeros, flights[departing, 6]]),
+    )
+
+    # Точки упорядочиваются по группе и периоду, значения переводятся в Python списками
+    order = np.lexsort((buckets, keys))
+    keys = keys[order]
+    capacity = capacity[order]
+    load_factor = np.round(np.divide(booked[order], capacity, out=np.zeros(len(capacity)), where=capacity > 0) * 100, 1)
+    points = [
+        {
+            'period': period,
+            'bookings': count,
+            'revenue': amount,
+            'load_factor': load if seats > 0 else None,
+        }
+        for period, count, amount, load, seats in zip(
+            np.datetime_as_string(buckets[order]).tolist(),
+            booking_counts[order].astype(np.int64).tolist(),
+            np.round(revenue[order], 2).tolist(),
+            load_factor.tolist(),
+            capacity.tolist(),
+        )
+    ]
+    group_keys, group_starts = np.unique(keys, return_index=True)
+    group_ends = np.append(group_starts[1:], len(keys))
+    series = {
+        int(key): points[first:last]
+        for key, first, last in zip(group_keys.tolist(), group_starts.tolist(), group_ends.tolist())
+    }
+
+    labels = _group_labels(group_by, list(series.keys()))
+
+    return {
+        'granularity': granularity,
+        'group_by': group_by,
+        'start_date': start_date.strftime('%Y-%m-%d'),
+        'end_date': end_date.strftime('%Y-%m-%d'),
+        'series': [
+            {
+                'key': str(key) if group_by == 'airline' else f'{key >> 32}-{key & 0xFFFFFFFF}',
+                'label': labels[key],
+                'points': points,
+            }
+            for key, points in sorted(series.items(), key=lambda item: labels[item[0]])
+        ],
+    }
+
+
+class RouteSnapshot:
+    """
+    Колоночный снимок показателей по маршрутам (авиакомпания, вылет, прилет).
+    Каждый показатель хранится отдельным массивом NumPy длины "число маршрутов".
+    """
+
+    def __init__(self, airline_ids, departure_ids, arrival_ids, flights, seats,
+                 booked_seats, bookings, revenue, labels, built_at):
+        self.airline_ids = airline_ids
+        self.departure_ids = departure_ids
+        self.arrival_ids = arrival_ids
+        self.flights = flights
+        self.seats = seats
+        self.booked_seats = booked_seats
+        self.bookings = bookings
+        self.revenue = revenue
+        self.labels = labels
+        self.built_at = built_at
+
+        # Производные показатели считаются один раз при построении снимка
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.load_factor = np.where(seats > 0, booked_seats / seats * 100, 0.0)
+            self.average_fare = np.where(bookings > 0, revenue / bookings, 0.0)
+            self.revenue_per_seat = np.where(seats > 0, revenue / seats, 0.0)
+
+    def __len__(self):
+        return len(self.airline_ids)
+
+    def routes(self, company_id=None, sort='revenue', limit=None):
+        """Строки по маршрутам, при необходимости только для одной авиакомпании"""
+        index = np.arange(len(self))
+        if company_id is not None:
+            index = index[self.airline_ids == company_id]
+
+        column = getattr(self, sort, self.revenue)
+        index = index[np.argsort(-column[index], kind='stable')]
+        if limit is not None:
+            index = index[:limit]
+
+        return [
+            {
+                'airline_id': int(self.airline_ids[i]),
+                'airline': self.labels['airlines'].get(int(self.airline_ids[i])),
+                'departure': self.labels['airports'].get(int(self.departure_ids[i])),
+                'arrival': self.labels['airports'].get(int(self.arrival_ids[i])),
+                'flights': int(self.flights[i]),
+                'seats': int(self.seats[i]),
+                'booked_seats': int(self.booked_seats[i]),
+                'bookings': int(self.bookings[i]),
+                'revenue': round(float(self.revenue[i]), 2),
+                'load_factor': round(float(self.load_factor[i]), 1),
+                'average_fare': round(float(self.average_fare[i]), 2),
+                'revenue_per_seat': round(float(self.revenue_per_seat[i]), 2),
+            }
+            for i in index
+        ]
+
+    def airlines(self, company_id=None):
+        """Итоги по авиакомпаниям, сведенные из маршрутов"""
+        ids, inverse = np.unique(self.airline_ids, return_inverse=True)
+        totals = {
+            name: np.bincount(inverse, weights=getattr(self, name), minlength=len(ids))
+            for name in ('flights', 'seats', 'booked_seats', 'bookings', 'revenue')
+        }
+        route_counts = np.bincount(inverse, minlength=len(ids))
+
+        result = []
+        for i, airline_id in enumerate(ids):
+            if company_id is not None and airline_id != company_id:
+                continue
+            seats = totals['seats'][i]
+            bookings = totals['bookings'][i]
+            revenue = totals['revenue'][i]
+            result.append({
+                'airline_id': int(airline_id),
+                'airline': self.labels['airlines'].get(int(airline_id)),
+                'routes': int(route_counts[i]),
+                'flights': int(totals['flights'][i]),
+                'seats': int(seats),
+                'booked_seats': int(totals['booked_seats'][i]),
+                'bookings': int(bookings),
+                'revenue': round(float(revenue), 2),
+                'load_factor': round(float(totals['booked_seats'][i] / seats * 100), 1) if seats else 0.0,
+                'average_fare': round(float(revenue / bookings), 2) if bookings else 0.0,
+                'revenue_per_seat': round(float(revenue / seats), 2) if seats else 0.0,
+            })
+        return result
+
+
+def build_route_snapshot():
+    """
+    Строит снимок двумя агрегирующими запросами (GROUP BY маршрут):
+    вместимость рейсов и выручка бронирований. Возвраты в выручку не входят.
+    """
+    route_columns = (Flight.airline_id, Flight.departure_airport_id, Flight.arrival_airport_id)
+
+    seat_rows = db.session.connection().execute(
+        select(
+            *route_columns,
+            db.func.count(Flight.id),
+            db.func.coalesce(db.func.sum(Flight.total_seats), 0),
+            db.func.coalesce(db.func.sum(Flight.total_seats - Flight.available_seats), 0),
+        ).group_by(*route_columns)
+    ).all()
+
+    revenue_rows = db.session.connection().execute(
+        select(
+            *route_columns,
+            db.func.count(Booking.id),
+            db.func.coalesce(db.func.sum(Booking.price_paid), 0),
+        ).join(Flight, Booking.flight_id == Flight.id)
+        .where(Booking.status != 'refunded')
+        .group_by(*route_columns)
+    ).all()
+
+    revenue_by_route = {tuple(row[:3]): (row[3], row[4]) for row in revenue_rows}
+
+    def column(values, dtype):
+        return np.fromiter(values, dtype=dtype, count=len(seat_rows))
+
+    keys = [tuple(row[:3]) for row in seat_rows]
+    labels = {
+        'airlines': dict(db.session.query(Airline.id, Airline.code).all()),
+        'airports': {
+            airport_id: f'{code} ({city})'
+            for airport_id, code, city in db.session.query(Airport.id, Airport.code, Airport.city).all()
+        },
+    }
+
+    return RouteSnapshot(
+        airline_ids=column((key[0] for key in keys), np.int64),
+        departure_ids=column((key[1] for key in keys), np.int64),
+        arrival_ids=column((key[2] for key in keys), np.int64),
+        flights=column((row[3] for row in seat_rows), np.float64),
+        seats=column((row[4] for row in seat_rows), np.float64),
+        booked_seats=column((row[5] for row in seat_rows), np.float64),
+        bookings=column((revenue_by_route.get(key, (0, 0))[0] for key in keys), np.float64),
+        revenue=column((revenue_by_route.get(key, (0, 0))[1] for key in keys), np.float64),
+        labels=labels,
+        built_at=datetime.utcnow(),
+    )
+
+
+class RouteSnapshotStore:
+    """
+    Хранит последний снимок маршрутов и перестраивает его не чаще max_age секунд.
+    Пока идет перестроение, читатели получают предыдущий снимок.
+    """
+
+    def __init__(self, app, max_age=300):
+        self.app = app
+        self.max_age = max_age
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self.rebuild()
+
+        age = (datetime.utcnow() - snapshot.built_at).total_seconds()
+        # Перестроение запускает только запрос, захвативший блокировку;
+        # ее освобождает фоновый поток по завершении
+        if age > self.max_age and self._lock.acquire(blocking=False):
+            try:
+                threading.Thread(target=self._rebuild_in_background, daemon=True).start()
+            except Exception:
+                self._lock.release()
+                raise
+        return snapshot
+
+    def rebuild(self):
+        with self._lock:
+            self._snapshot = build_route_snapshot()
+            return self._snapshot
+
+    def _rebuild_in_background(self):
+        try:
+            with self.app.app_context():
+                self._snapshot = build_route_snapshot()
+        except Exception:
+            self.app.logger.exception("Ошибка перестроения снимка маршрутов")
+        finally:
+            self._lock.release()
@@ -1,15 +1,34 @@
-from flask import Flask, render_template, redirect, url_for, flash, request, jsonify
+from flask import Flask, render_template, redirect, url_for, flash, request, jsonify, Response, stream_with_context, abort
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash
 from datetime import datetime, timedelta
 import random
 import string
+import io
 import os
 import re
 
-from models import db, User, Airport, Airline, Flight, Booking, Payment, Banner
-from sqlalchemy import text
-from forms import LoginForm, RegistrationForm, FlightSearchForm, BookingForm, FlightForm, AirportForm, AirlineForm, BannerForm
+from models import db, User, Airport, Airline, Flight, Booking, Payment, Banner, ArchivedFlight, ArchivedBooking, SchedulePattern
+from sqlalchemy.orm import joinedload
+from stats import (STATISTICS_NAMESPACE, admin_statistics, flight_class_statistics, flight_namespace,
+                   manager_assignment_statistics, manager_statistics, statistics_scope, user_booking_statistics, user_top_routes)
+from cache import VersionedTTLCache, cached_json_response, get_version, sync_shared_versions
+from analytics import GRANULARITIES, GROUPINGS, RouteSnapshotStore, booking_timeseries
+from loaders import (ARCHIVED_BOOKING_JOINED_FLIGHT_OPTIONS, BOOKING_JOINED_FLIGHT_OPTIONS, BOOKING_LIST_OPTIONS,
+                     FLIGHT_LIST_OPTIONS, FLIGHT_SEARCH_OPTIONS)
+from sqlprofile import init_sql_profiling
+from dbconfig import configure_database, init_engine_profile
+from dbrouting import REPLICA_BIND, init_read_replica, use_primary, use_replica
+from migrations import check_schema_version, upgrade as upgrade_schema
+from principals import UserPrincipalCache
+from refdata import REFERENCE_NAMESPACE, ReferenceDataCache
+from pagination import keyset_paginate, merge_keyset_pages
+from archive import find_booking
+from exports import manifest_statement, stream_csv, stream_xlsx, xlsx_available
+from schedule_import import ScheduleFormatError, import_schedule
+from schedules import RESCHEDULE_FIELDS, reschedule_needed, save_pattern
+from datagen import PROFILES, generate_data
+from forms import LoginForm, RegistrationForm, FlightSearchForm, BookingForm, FlightForm, AirportForm, AirlineForm, BannerForm, SchedulePatternForm
 
 def is_valid_email(email):
     """
@@ -48,6 +67,44 @@ def is_valid_email(email):
     
     return True
 
+def _prefix_match(column, prefix, dialect=None):
+    """
+    Условие "column начинается с prefix", использующее индекс по column.
+    В SQLite - диапазон [prefix, prefix + U+10FFFF): LIKE там не учитывает
+    регистр и индекс не использует. Диапазон верен только при двоичном
+    сравнении строк, поэтому в остальных СУБД (PostgreSQL с локалью) -
+    LIKE 'prefix%' с экранированием % и _ (индексы с text_pattern_ops).
+    """
+    if (dialect or db.engine.dialect.name) == 'sqlite':
+        return db.and_(column >= prefix, column < prefix + '\U0010ffff')
+    return column.startswith(prefix, autoescape=True)
+
+def user_search_condition(search):
+    """
+    Условие поиска пользователей по началу логина, email, имени или фамилии.
+    Логин и email сравниваются без учета регистра (индексы по lower()),
+    имя и фамилия - как введены и с заглавной буквы. "Имя Фамилия" ищется
+    по обоим полям в любом порядке.
+    """
+    terms = search.split()
+    if len(terms) == 2:
+        # Логин и email не содержат пробелов: ищем только по имени и фамилии
+        first, second = (term[:1].upper() + term[1:] for term in terms)
+        return db.or_(
+            db.and_(_prefix_match(User.first_name, first), _prefix_match(User.last_name, second)),
+            db.and_(_prefix_match(User.last_name, first), _prefix_match(User.first_name, second)),
+        )
+    
+    lowered = search.lower()
+    conditions = [
+        _prefix_match(db.func.lower(User.username), lowered),
+        _prefix_match(db.func.lower(User.email), lowered),
+    ]
+    for variant in {search, search[:1].upper() + search[1:]}:
+        conditions.append(_prefix_match(User.first_name, variant))
+        conditions.append(_prefix_match(User.last_name, variant))
+    return db.or_(*conditions)
+
 def generate_seat_number(flight, seat_class):
     """
     Генерирует номер места для пассажира
@@ -94,21 +151,126 @@ def generate_seat_number(flight, seat_class):
     # Если все места заняты, возвращаем резервный номер
     return f"R{random.randint(100, 999)}"
 
+# Статусы рейса с подписями для фильтров
+FLIGHT_STATUSES = {
+    'scheduled': 'Запланирован',
+    'delayed': 'Задержан',
+    'boarding': 'Посадка',
+    'departed': 'Вылетел',
+    'cancelled': 'Отменен',
+}
+
+# Варианты сортировки списка рейсов: имя параметра -> колонка (без NULL)
+FLIGHT_SORT_COLUMNS = {
+    'departure_time': Flight.departure_time,
+    'flight_number': Flight.flight_number,
+    'economy_price': Flight.economy_price,
+    'available_seats': Flight.available_seats,
+}
+FLIGHT_SORT_OPTIONS = {
+    'departure_time': 'Дата вылета',
+    'flight_number': 'Номер рейса',
+    'economy_price': 'Цена (эконом)',
+    'available_seats': 'Свободные места',
+}
+
+# Количество прошедших поездок на одной странице профиля
+PROFILE_PAGE_SIZE = 20
+
+# Ключ сортировки списка пассажиров: booking_date может быть NULL,
+# такие бронирования идут последними (keyset-пагинация не допускает NULL в ключе)
+NO_BOOKING_DATE = datetime(1970, 1, 1)
+PASSENGER_DATE_KEY = db.func.coalesce(Booking.booking_date, db.literal(NO_BOOKING_DATE, db.DateTime))
+
+# Подписи дней недели регулярных расписаний (цифры ISO)
+WEEKDAY_LABELS = {'1': 'Пн', '2': 'Вт', '3': 'Ср', '4': 'Чт', '5': 'Пт', '6': 'Сб', '7': 'Вс'}
+
+# Статусы бронирования и классы обслуживания с подписями для фильтров
+BOOKING_STATUS_LABELS = {
+    'confirmed': 'Подтверждено',
+    'checked_in': 'Регистрация пройдена',
+    'cancelled': 'Отменено',
+    'refunded': 'Возвращено',
+}
+SEAT_CLASS_LABELS = {
+    'economy': 'Эконом',
+    'business': 'Бизнес',
+    'first': 'Первый класс',
+}
+
+def flight_picker_label(flight):
+    """Подпись рейса в поле выбора рейса"""
+    return (f"{flight.flight_number} - {flight.departure_airport.city} → {flight.arrival_airport.city} "
+            f"({flight.departure_time.strftime('%d.%m.%Y %H:%M')})")
+
 def create_app():
     app = Flask(__name__)
     
     # Конфигурация
     app.config['SECRET_KEY'] = 'your-secret-key-here-change-in-production'
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///ticket_booking.db'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # База данных и профиль подключения (DATABASE_URL, DB_PROFILE, SQLITE_*, DB_POOL_*)
+    configure_database(app)
     
     # Настройки для надежности
     app.config['WTF_CSRF_ENABLED'] = True
     app.config['WTF_CSRF_TIME_LIMIT'] = 3600  # 1 час
     app.config['PERMANENT_SESSION_LIFETIME'] = 3600  # 1 час
     
+    # Время жизни кэша статистики панелей и деталей рейсов (секунды)
+    app.config['STATISTICS_CACHE_TTL'] = int(os.environ.get('STATISTICS_CACHE_TTL', 30))
+    # Период перестроения снимка загрузки по маршрутам (секунды)
+    app.config['ROUTE_SNAPSHOT_MAX_AGE'] = int(os.environ.get('ROUTE_SNAPSHOT_MAX_AGE', 300))
+    # Время жизни записи в кэше пользователей user_loader (секунды)
+    app.config['USER_CACHE_TTL'] = int(os.environ.get('USER_CACHE_TTL', 300))
+    # Как часто процесс сверяет общие версии кэшей (cache.py), секунды: изменения из других
+    # процессов (workers, manage.py) доходят до кэшей этого процесса не позже чем через этот интервал
+    app.config['CACHE_SYNC_SECONDS'] = float(os.environ.get('CACHE_SYNC_SECONDS', 1))
+    # Профилирование SQL-запросов (заголовки Server-Timing / X-DB-Queries, лог N+1 и медленных запросов)
+    app.config['SQL_PROFILING'] = os.environ.get('SQL_PROFILING', '0').lower() in ('1', 'true', 'yes')
+    app.config['SQL_SLOW_REQUEST_MS'] = int(os.environ.get('SQL_SLOW_REQUEST_MS', 500))
+    app.config['SQL_N_PLUS_ONE_THRESHOLD'] = int(os.environ.get('SQL_N_PLUS_ONE_THRESHOLD', 5))
+    # Реплика для чтения (DATABASE_REPLICA_URL): допустимое отставание, период его проверки
+    # и сколько секунд после изменения данных пользователь читает из основной базы
+    app.config['REPLICA_MAX_LAG_SECONDS'] = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 5))
+    app.config['REPLICA_LAG_CHECK_SECONDS'] = float(os.environ.get('REPLICA_LAG_CHECK_SECONDS', 1))
+    app.config['REPLICA_STICKY_SECONDS'] = float(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+    # Архивирование (python manage.py archive): через сколько дней после вылета рейс
+    # с бронированиями переносится в архив и сколько рейсов в одной транзакции
+    app.config['ARCHIVE_AFTER_DAYS'] = int(os.environ.get('ARCHIVE_AFTER_DAYS', 180))
+    app.config['ARCHIVE_BATCH_SIZE'] = int(os.environ.get('ARCHIVE_BATCH_SIZE', 1000))
+    # Строк расписания в одном пакете (транзакции) массового импорта рейсов
+    app.config['SCHEDULE_IMPORT_BATCH_SIZE'] = int(os.environ.get('SCHEDULE_IMPORT_BATCH_SIZE', 5000))
+    # На сколько дней вперед регулярные расписания разворачиваются в рейсы (python manage.py materialize)
+    app.config['SCHEDULE_HORIZON_DAYS'] = int(os.environ.get('SCHEDULE_HORIZON_DAYS', 90))
+    # Профиль и seed генератора тестовых данных для /init-data и пустой базы при запуске (см. datagen.py)
+    app.config['DATAGEN_PROFILE'] = os.environ.get('DATAGEN_PROFILE', 'demo')
+    app.config['DATAGEN_SEED'] = int(os.environ.get('DATAGEN_SEED', 1))
+    
     # Инициализация расширений
     db.init_app(app)
+    with app.app_context():
+        init_engine_profile(app, db.engine)
+        if REPLICA_BIND in db.engines:
+            init_engine_profile(app, db.engines[REPLICA_BIND], read_only=True)
+        init_read_replica(app, db)
+        init_sql_profiling(app, *db.engines.values())
+    
+    statistics_cache = VersionedTTLCache(ttl=app.config['STATISTICS_CACHE_TTL'])
+    flight_details_cache = VersionedTTLCache(ttl=app.config['STATISTICS_CACHE_TTL'], maxsize=2048)
+    route_snapshots = RouteSnapshotStore(app, max_age=app.config['ROUTE_SNAPSHOT_MAX_AGE'])
+    app.extensions['route_snapshots'] = route_snapshots
+    user_principals = UserPrincipalCache(ttl=app.config['USER_CACHE_TTL'])
+    # Справочники аэропортов и авиакомпаний, общие для форм, шаблонов и API
+    reference_data = ReferenceDataCache()
+    app.extensions['reference_data'] = reference_data
+    app.jinja_env.globals['reference_data'] = reference_data.get
+    app.jinja_env.globals['flight_picker_label'] = flight_picker_label
+    
+    @app.before_request
+    def sync_cache_versions():
+        # Изменения из других процессов (workers, команды manage.py) сбрасывают кэши этого процесса
+        sync_shared_versions(app.config['CACHE_SYNC_SECONDS'])
     
     login_manager = LoginManager()
     login_manager.init_app(app)
@@ -118,7 +280,9 @@ def create_app():
     
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        # Пользователь берется из кэша; смена роли, блокировка и назначение
+        # менеджера увеличивают версию пользователя и сбрасывают запись
+        return user_principals.load(int(user_id))
     
     # Глобальная обработка ошибок
     @app.errorhandler(404)
@@ -152,11 +316,6 @@ def create_app():
     @app.route('/')
     def index():
         search_form = FlightSearchForm()
-        # Получаем популярные направления
-        recent_flights = Flight.query.filter(
-            Flight.departure_time > datetime.utcnow()
-        ).order_by(Flight.departure_time).limit(6).all()
-        
         # Получаем активный рекламный баннер
         # Сначала пробуем найти баннер для главной страницы
         active_banner = Banner.query.filter(
@@ -183,6 +342,12 @@ def create_app():
         if active_banner:
             active_banner.increment_views()
         
+        # Популярные направления загружаем после фиксации просмотра баннера,
+        # иначе commit сбросит загруженные рейсы и они перечитаются по одному
+        recent_flights = Flight.query.options(*FLIGHT_LIST_OPTIONS).filter(
+            Flight.departure_time > datetime.utcnow()
+        ).order_by(Flight.departure_time).limit(6).all()
+        
         # Отладочная информация
         print(f"DEBUG: Найдено баннеров: {Banner.query.count()}")
         print(f"DEBUG: Активных баннеров: {Banner.query.filter_by(is_active=True).count()}")
@@ -195,9 +360,34 @@ def create_app():
         return render_template('index.html', form=search_form, recent_flights=recent_flights, banner=active_banner)
     
     @app.route('/search', methods=['GET', 'POST'])
+    @use_replica
     def search_flights():
         try:
             form = FlightSearchForm()
+            
+            # Получаем активные баннеры для боковой панели
+            all_banners = Banner.query.all()
+            print(f"DEBUG: Всего баннеров в БД: {len(all_banners)}")
+            
+            sidebar_banners = Banner.query.filter(
+                Banner.is_active == True,
+                Banner.position == 'sidebar'
+            ).order_by(Banner.priority.desc()).all()
+            
+            print(f"DEBUG: Найдено баннеров с position='sidebar' и is_active=True: {len(sidebar_banners)}")
+            
+            # Фильтруем баннеры по датам показа
+            active_banners = [banner for banner in sidebar_banners if banner.is_currently_active()]
+            print(f"DEBUG: Баннеров активных по датам: {len(active_banners)}")
+            
+            sidebar_banners = active_banners[:3]  # Ограничиваем до 3 баннеров
+            print(f"DEBUG: Итого баннеров для отображения: {len(sidebar_banners)}")
+            
+            # Увеличиваем счетчик просмотров для показанных баннеров до поиска рейсов,
+            # чтобы commit не сбросил загруженные результаты
+            for banner in sidebar_banners:
+                banner.increment_views()
+            
             flights = []
             
             # Если это GET запрос или форма не заполнена, показываем все доступные рейсы
@@ -216,7 +406,7 @@ def create_app():
                 ).filter(
                     Flight.departure_time >= datetime.utcnow(),
                     Flight.available_seats > 0
-                ).order_by(Flight.departure_time)
+                ).options(*FLIGHT_SEARCH_OPTIONS).order_by(Flight.departure_time)
                 
                 flights = query.all()
                 print(f"DEBUG: Найдено рейсов для отображения: {len(flights)}")
@@ -264,7 +454,7 @@ def create_app():
                     query = query.filter(arr_airport.city.ilike(f'%{form.arrival_city.data}%'))
                 
                 # Сортируем по времени вылета
-                query = query.order_by(Flight.departure_time)
+                query = query.options(*FLIGHT_SEARCH_OPTIONS).order_by(Flight.departure_time)
                 
                 print(f"DEBUG: SQL запрос: {query}")
                 flights = query.all()
@@ -285,7 +475,7 @@ def create_app():
                     ).filter(
                         Flight.departure_time >= datetime.utcnow(),
                         Flight.available_seats > 0
-                    ).order_by(Flight.departure_time).all()
+                    ).options(*FLIGHT_SEARCH_OPTIONS).order_by(Flight.departure_time).all()
             
             print(f"DEBUG: Итого найдено рейсов: {len(flights)}")
             for flight in flights:
@@ -294,28 +484,6 @@ def create_app():
                 else:
                     print(f"DEBUG: Рейс {flight.flight_number}: {getattr(flight, 'dep_city', 'N/A')} → {getattr(flight, 'arr_city', 'N/A')}")
             
-            # Получаем активные баннеры для боковой панели
-            all_banners = Banner.query.all()
-            print(f"DEBUG: Всего баннеров в БД: {len(all_banners)}")
-            
-            sidebar_banners = Banner.query.filter(
-                Banner.is_active == True,
-                Banner.position == 'sidebar'
-            ).order_by(Banner.priority.desc()).all()
-            
-            print(f"DEBUG: Найдено баннеров с position='sidebar' и is_active=True: {len(sidebar_banners)}")
-            
-            # Фильтруем баннеры по датам показа
-            active_banners = [banner for banner in sidebar_banners if banner.is_currently_active()]
-            print(f"DEBUG: Баннеров активных по датам: {len(active_banners)}")
-            
-            sidebar_banners = active_banners[:3]  # Ограничиваем до 3 баннеров
-            print(f"DEBUG: Итого баннеров для отображения: {len(sidebar_banners)}")
-            
-            # Увеличиваем счетчик просмотров для показанных баннеров
-            for banner in sidebar_banners:
-                banner.increment_views()
-            
             return render_template('search_results.html', form=form, flights=flights, banners=sidebar_banners)
         
         except Exception as e:
@@ -324,11 +492,13 @@ def create_app():
             return render_template('search_results.html', form=form, flights=[], banners=[])
     
     @app.route('/flight/<int:flight_id>')
+    @use_replica
     def flight_details(flight_id):
         flight = Flight.query.get_or_404(flight_id)
         return render_template('flight_details.html', flight=flight)
     
     @app.route('/book/<int:flight_id>', methods=['GET', 'POST'])
+    @use_primary
     @login_required
     def book_flight(flight_id):
         try:
@@ -413,8 +583,62 @@ def create_app():
     @app.route('/profile')
     @login_required
     def profile():
-        bookings = Booking.query.filter_by(user_id=current_user.id).order_by(Booking.booking_date.desc()).all()
-        return render_template('profile.html', bookings=bookings, now=datetime.utcnow())
+        now = datetime.utcnow()
+        # Действующие и архивные бронирования считаются одним запросом
+        counts = db.session.query(*(
+            db.session.query(db.func.count(model.id)).filter(model.user_id == current_user.id).scalar_subquery()
+            for model in (Booking, ArchivedBooking)
+        )).one()
+        total_bookings = sum(counts)
+        
+        # Предстоящие поездки - ближайшие первыми
+        upcoming = Booking.query.options(*BOOKING_JOINED_FLIGHT_OPTIONS)\
+            .join(Flight, Booking.flight_id == Flight.id)\
+            .filter(Booking.user_id == current_user.id, Flight.departure_time >= now)\
+            .order_by(Flight.departure_time, Booking.id).all()
+        
+        # Прошедшие поездки - первая страница, остальные подгружаются через profile_bookings
+        past = past_bookings_page(current_user.id, now)
+        
+        return render_template('profile.html', total_bookings=total_bookings,
+                             upcoming=upcoming, past=past, now=now)
+    
+    def past_bookings_page(user_id, now, cursor=None):
+        """
+        Страница прошедших поездок пользователя, последние вылеты первыми.
+        Старые поездки лежат в архиве: страницы действующих и архивных
+        бронирований читаются с одним курсором и сливаются.
+        """
+        key = lambda booking: [booking.flight.departure_time, booking.id]
+        pages = []
+        for booking_model, flight_model, options in (
+            (Booking, Flight, BOOKING_JOINED_FLIGHT_OPTIONS),
+            (ArchivedBooking, ArchivedFlight, ARCHIVED_BOOKING_JOINED_FLIGHT_OPTIONS),
+        ):
+            query = booking_model.query.options(*options)\
+                .join(flight_model, booking_model.flight_id == flight_model.id)\
+                .filter(booking_model.user_id == user_id, flight_model.departure_time < now)
+            pages.append(keyset_paginate(query, [flight_model.departure_time, booking_model.id], cursor=cursor,
+                                         limit=PROFILE_PAGE_SIZE, descending=True, key=key))
+        return merge_keyset_pages(pages, PROFILE_PAGE_SIZE, key, descending=True)
+    
+    @app.route('/profile/bookings')
+    @login_required
+    def profile_bookings():
+        """Следующая страница прошедших поездок (JSON для бесконечной прокрутки)"""
+        now = datetime.utcnow()
+        try:
+            page = past_bookings_page(current_user.id, now, cursor=request.args.get('cursor'))
+        except ValueError:
+            return jsonify({'error': 'Некорректный курсор'}), 400
+        
+        html = ''.join(render_template('_booking_card.html', booking=booking, now=now) for booking in page.items)
+        return jsonify({
+            'html': html,
+            'count': len(page.items),
+            'next_cursor': page.next_cursor,
+            'has_more': page.has_more
+        })
     
     # АВТОРИЗАЦИЯ
     @app.route('/login', methods=['GET', 'POST'])
@@ -517,7 +741,8 @@ def create_app():
         # Общий доход
         total_revenue = db.session.query(db.func.sum(Booking.price_paid)).scalar() or 0
         
-        recent_bookings = Booking.query.order_by(Booking.booking_date.desc()).limit(10).all()
+        recent_bookings = Booking.query.options(*BOOKING_LIST_OPTIONS)\
+            .order_by(Booking.booking_date.desc()).limit(10).all()
         
         return render_template('admin/dashboard.html', 
                              total_flights=total_flights, 
@@ -529,45 +754,19 @@ def create_app():
                              recent_bookings=recent_bookings)
     
     @app.route('/admin/api/statistics')
+    @use_replica
     @login_required
     def admin_statistics_api():
         if not current_user.is_admin():
             return jsonify({'error': 'Доступ запрещен'}), 403
         
         period = request.args.get('period', 'all')
-        now = datetime.utcnow()
-        
-        # Определяем временные рамки
-        if period == 'today':
-            start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        elif period == 'week':
-            start_date = now - timedelta(days=7)
-        elif period == 'month':
-            start_date = now - timedelta(days=30)
-        else:  # all
-            start_date = datetime.min
-        
-        # Статистика рейсов
-        total_flights = Flight.query.count()
-        active_flights = Flight.query.filter(Flight.departure_time > now).count()
-        completed_flights = Flight.query.filter(Flight.departure_time <= now).count()
-        
-        # Статистика бронирований за период
-        bookings_query = Booking.query.filter(Booking.booking_date >= start_date)
-        total_bookings = bookings_query.count()
-        total_passengers = total_bookings  # Каждое бронирование = 1 пассажир
-        total_revenue = db.session.query(db.func.sum(Booking.price_paid)).filter(
-            Booking.booking_date >= start_date
-        ).scalar() or 0
         
-        return jsonify({
-            'total_flights': total_flights,
-            'active_flights': active_flights,
-            'completed_flights': completed_flights,
-            'total_bookings': total_bookings,
-            'total_passengers': int(total_passengers),
-            'total_revenue': float(total_revenue)
-        })
+        # Одинаковые запросы разных администраторов обслуживаются из кэша
+        return cached_json_response(
+            statistics_cache, ('admin', period), get_version(STATISTICS_NAMESPACE),
+            lambda: admin_statistics(period)
+        )
     
     # АДМИНИСТРИРОВАНИЕ РЕЙСОВ
     
@@ -578,8 +777,106 @@ def create_app():
             flash('У вас нет прав администратора.', 'error')
             return redirect(url_for('index'))
         
-        flights = Flight.query.order_by(Flight.departure_time.desc()).all()
-        return render_template('admin/flights.html', flights=flights)
+        json_mode = request.args.get('format') == 'json'
+        reference = reference_data.get()
+        
+        # Фильтры: период вылета, авиакомпания, статус, маршрут (IATA коды)
+        filters = {
+            'date_from': request.args.get('date_from', '').strip(),
+            'date_to': request.args.get('date_to', '').strip(),
+            'airline_id': request.args.get('airline_id', type=int),
+            'status': request.args.get('status', '').strip(),
+            'from': request.args.get('from', '').strip().upper(),
+            'to': request.args.get('to', '').strip().upper(),
+        }
+        conditions = []
+        try:
+            if filters['date_from']:
+                conditions.append(Flight.departure_time >= datetime.strptime(filters['date_from'], '%Y-%m-%d'))
+            if filters['date_to']:
+                conditions.append(Flight.departure_time < datetime.strptime(filters['date_to'], '%Y-%m-%d') + timedelta(days=1))
+        except ValueError:
+            if json_mode:
+                return jsonify({'error': 'Дата должна быть в формате ГГГГ-ММ-ДД'}), 400
+            flash('Дата должна быть в формате ГГГГ-ММ-ДД', 'error')
+            return redirect(url_for('admin_flights'))
+        
+        if filters['airline_id']:
+            conditions.append(Flight.airline_id == filters['airline_id'])
+        if filters['status'] in FLIGHT_STATUSES:
+            conditions.append(Flight.status == filters['status'])
+        for key, column in (('from', Flight.departure_airport_id), ('to', Flight.arrival_airport_id)):
+            if filters[key]:
+                airport = reference.airports_by_code.get(filters[key])
+                # Неизвестный код аэропорта дает пустой результат
+                conditions.append(column == (airport.id if airport else None))
+        
+        # Сортировка: колонка + id для однозначного порядка при keyset-пагинации
+        sort = request.args.get('sort', 'departure_time')
+        if sort not in FLIGHT_SORT_COLUMNS:
+            sort = 'departure_time'
+        order = 'asc' if request.args.get('order') == 'asc' else 'desc'
+        per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
+        cursor = request.args.get('cursor') or None
+        
+        try:
+            page = keyset_paginate(
+                Flight.query.options(*FLIGHT_LIST_OPTIONS).filter(*conditions),
+                [FLIGHT_SORT_COLUMNS[sort], Flight.id],
+                cursor=cursor, limit=per_page, descending=(order == 'desc')
+            )
+        except ValueError:
+            if json_mode:
+                return jsonify({'error': 'Некорректный курсор'}), 400
+            return redirect(url_for('admin_flights', **{k: v for k, v in request.args.items() if k != 'cursor'}))
+        
+        # Общее количество считаем только для первой страницы
+        total = None
+        if not cursor:
+            total = db.session.query(db.func.count(Flight.id)).filter(*conditions).scalar()
+        
+        next_url = None
+        if page.has_more:
+            next_args = request.args.to_dict()
+            next_args.pop('format', None)
+            next_args['cursor'] = page.next_cursor
+            next_url = url_for('admin_flights', **next_args)
+        
+        if json_mode:
+            return jsonify({
+                'flights': [{
+                    'id': flight.id,
+                    'flight_number': flight.flight_number,
+                    'departure_airport': {'code': flight.departure_airport.code, 'city': flight.departure_airport.city},
+                    'arrival_airport': {'code': flight.arrival_airport.code, 'city': flight.arrival_airport.city},
+                    'airline': {'code': flight.airline.code, 'name': flight.airline.name},
+                    'departure_time': flight.departure_time.strftime('%d.%m.%Y %H:%M'),
+                    'arrival_time': flight.arrival_time.strftime('%d.%m.%Y %H:%M'),
+                    'aircraft_type': flight.aircraft_type,
+                    'total_seats': flight.total_seats,
+                    'available_seats': flight.available_seats,
+                    'economy_price': flight.economy_price,
+                    'business_price': flight.business_price,
+                    'status': flight.status
+                } for flight in page.items],
+                'rows_html': render_template('admin/_flight_rows.html', flights=page.items),
+                'total': total,
+                'next_cursor': page.next_cursor,
+                'next_url': next_url,
+                'has_more': page.has_more
+            })
+        
+        return render_template('admin/flights.html',
+                             flights=page.items,
+                             total=total,
+                             next_url=next_url,
+                             filters=filters,
+                             sort=sort,
+                             order=order,
+                             per_page=per_page,
+                             sort_options=FLIGHT_SORT_OPTIONS,
+                             statuses=FLIGHT_STATUSES,
+                             airline_choices=reference.airline_choices)
     
     @app.route('/admin/flight/add', methods=['GET', 'POST'])
     @login_required
@@ -589,16 +886,17 @@ def create_app():
             return redirect(url_for('index'))
         
         form = FlightForm()
-        form.departure_airport_id.choices = [(a.id, f"{a.code} - {a.city}") for a in Airport.query.all()]
-        form.arrival_airport_id.choices = [(a.id, f"{a.code} - {a.city}") for a in Airport.query.all()]
+        reference = reference_data.get()
+        form.departure_airport_id.choices = reference.airport_choices
+        form.arrival_airport_id.choices = reference.airport_choices
         
         # Ограничиваем выбор авиакомпании для менеджеров
         if current_user.is_admin():
-            form.airline_id.choices = [(a.id, f"{a.code} - {a.name}") for a in Airline.query.all()]
+            form.airline_id.choices = reference.airline_choices
         else:
             # Менеджер может добавлять рейсы только для своей авиакомпании
             if current_user.company_id:
-                airline = Airline.query.get(current_user.company_id)
+                airline = reference.airlines_by_id.get(current_user.company_id)
                 if airline:
                     form.airline_id.choices = [(airline.id, f"{airline.code} - {airline.name}")]
                     form.airline_id.data = airline.id
@@ -645,6 +943,149 @@ def create_app():
         
         return render_template('admin/add_flight.html', form=form)
     
+    @app.route('/admin/flights/import', methods=['POST'])
+    @use_primary
+    @login_required
+    def admin_import_flights():
+        """Массовый импорт расписания из CSV-файла (поле file); отчет в JSON"""
+        if not (current_user.is_admin() or current_user.is_manager()):
+            return jsonify({'error': 'Доступ запрещен'}), 403
+        
+        # Менеджер импортирует только рейсы своей авиакомпании
+        company_id = None
+        if not current_user.is_admin():
+            if not current_user.company_id:
+                return jsonify({'error': 'У вас не назначена авиакомпания'}), 403
+            company_id = current_user.company_id
+        
+        upload = request.files.get('file')
+        if upload is None or not upload.filename:
+            return jsonify({'error': 'Файл расписания не передан'}), 400
+        
+        dry_run = request.form.get('dry_run', '').lower() in ('1', 'true', 'yes', 'on')
+        lines = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+        try:
+            report = import_schedule(lines, reference_data.get(), company_id=company_id,
+                                     batch_size=app.config['SCHEDULE_IMPORT_BATCH_SIZE'], dry_run=dry_run)
+        except (ScheduleFormatError, UnicodeDecodeError) as e:
+            return jsonify({'error': f'Файл не может быть импортирован: {e}'}), 400
+        except Exception as e:
+            print(f"Ошибка импорта расписания: {e}")
+            return jsonify({'error': 'Ошибка при записи расписания'}), 500
+        
+        return jsonify(report.to_dict())
+    
+    # РЕГУЛЯРНЫЕ РАСПИСАНИЯ
+    def schedule_pattern_form(pattern=None):
+        """Форма расписания; менеджер выбирает только свою авиакомпанию"""
+        form = SchedulePatternForm(obj=pattern)
+        reference = reference_data.get()
+        form.departure_airport_id.choices = reference.airport_choices
+        form.arrival_airport_id.choices = reference.airport_choices
+        if current_user.is_admin():
+            form.airline_id.choices = reference.airline_choices
+        else:
+            airline = reference.airlines_by_id.get(current_user.company_id)
+            form.airline_id.choices = [(airline.id, f"{airline.code} - {airline.name}")] if airline else []
+        return form
+    
+    def save_schedule_pattern(pattern, form):
+        """Переносит данные формы в расписание и сохраняет его вместе с рейсами"""
+        previous = {field: getattr(pattern, field) for field in RESCHEDULE_FIELDS}
+        
+        pattern.flight_number = form.flight_number.data.strip().upper()
+        pattern.airline_id = form.airline_id.data if current_user.is_admin() else current_user.company_id
+        pattern.departure_airport_id = form.departure_airport_id.data
+        pattern.arrival_airport_id = form.arrival_airport_id.data
+        pattern.days_of_week = ''.join(sorted(form.days_of_week.data))
+        pattern.valid_from = form.valid_from.data
+        pattern.valid_to = form.valid_to.data
+        pattern.departure_time = form.departure_time.data
+        pattern.arrival_time = form.arrival_time.data
+        pattern.arrival_day_offset = form.arrival_day_offset.data or 0
+        pattern.aircraft_type = form.aircraft_type.data or None
+        pattern.total_seats = form.total_seats.data
+        pattern.economy_price = form.economy_price.data
+        pattern.business_price = form.business_price.data
+        pattern.first_class_price = form.first_class_price.data
+        pattern.is_active = form.is_active.data
+        
+        reschedule = pattern.id is not None and reschedule_needed(pattern, previous)
+        return save_pattern(pattern, app.config['SCHEDULE_HORIZON_DAYS'], reschedule=reschedule)
+    
+    @app.route('/admin/schedules')
+    @login_required
+    def admin_schedules():
+        if not (current_user.is_admin() or current_user.is_manager()):
+            flash('У вас нет прав для управления расписаниями.', 'error')
+            return redirect(url_for('index'))
+        
+        query = SchedulePattern.query
+        if not current_user.is_admin():
+            query = query.filter(SchedulePattern.airline_id == current_user.company_id)
+        
+        cursor = request.args.get('cursor') or None
+        try:
+            page = keyset_paginate(query, [SchedulePattern.id], cursor=cursor, limit=50, descending=True)
+        except ValueError:
+            return redirect(url_for('admin_schedules'))
+        
+        next_url = url_for('admin_schedules', cursor=page.next_cursor) if page.has_more else None
+        return render_template('admin/schedules.html',
+                             patterns=page.items,
+                             next_url=next_url,
+                             reference=reference_data.get(),
+                             weekday_labels=WEEKDAY_LABELS,
+                             horizon_days=app.config['SCHEDULE_HORIZON_DAYS'])
+    
+    @app.route('/admin/schedule/add', methods=['GET', 'POST'])
+    @login_required
+    def admin_add_schedule():
+        if not (current_user.is_admin() or current_user.is_manager()):
+            flash('У вас нет прав для управления расписаниями.', 'error')
+            return redirect(url_for('index'))
+        if not current_user.is_admin() and not current_user.company_id:
+            flash('У вас не назначена авиакомпания.', 'error')
+            return redirect(url_for('manager_dashboard'))
+        
+        form = schedule_pattern_form()
+        if form.validate_on_submit():
+            pattern = SchedulePattern()
+            try:
+                _, created = save_schedule_pattern(pattern, form)
+                flash(f'Расписание {pattern.flight_number} добавлено, создано рейсов: {created}', 'success')
+                return redirect(url_for('admin_schedules'))
+            except Exception as e:
+                print(f"Ошибка сохранения расписания: {e}")
+                flash('Произошла ошибка при сохранении расписания. Проверьте данные.', 'error')
+        
+        return render_template('admin/schedule_form.html', form=form, pattern=None)
+    
+    @app.route('/admin/schedule/edit/<int:pattern_id>', methods=['GET', 'POST'])
+    @login_required
+    def admin_edit_schedule(pattern_id):
+        if not (current_user.is_admin() or current_user.is_manager()):
+            flash('У вас нет прав для управления расписаниями.', 'error')
+            return redirect(url_for('index'))
+        
+        pattern = SchedulePattern.query.get_or_404(pattern_id)
+        if not current_user.is_admin() and pattern.airline_id != current_user.company_id:
+            flash('У вас нет прав на редактирование этого расписания.', 'error')
+            return redirect(url_for('admin_schedules'))
+        
+        form = schedule_pattern_form(pattern)
+        if form.validate_on_submit():
+            try:
+                changed, created = save_schedule_pattern(pattern, form)
+                flash(f'Расписание {pattern.flight_number} сохранено: изменено рейсов {changed}, '
+                      f'создано {created}', 'success')
+                return redirect(url_for('admin_schedules'))
+            except Exception as e:
+                print(f"Ошибка сохранения расписания: {e}")
+                flash('Произошла ошибка при сохранении расписания. Проверьте данные.', 'error')
+        
+        return render_template('admin/schedule_form.html', form=form, pattern=pattern)
+    
     @app.route('/admin/flight/edit/<int:flight_id>', methods=['GET', 'POST'])
     @login_required
     def admin_edit_flight(flight_id):
@@ -659,16 +1100,17 @@ def create_app():
             flash('У вас нет прав на редактирование этого рейса.', 'error')
             return redirect(url_for('manager_flights'))
         form = FlightForm(obj=flight)
-        form.departure_airport_id.choices = [(a.id, f"{a.code} - {a.city}") for a in Airport.query.all()]
-        form.arrival_airport_id.choices = [(a.id, f"{a.code} - {a.city}") for a in Airport.query.all()]
+        reference = reference_data.get()
+        form.departure_airport_id.choices = reference.airport_choices
+        form.arrival_airport_id.choices = reference.airport_choices
         
         # Ограничиваем выбор авиакомпании для менеджеров
         if current_user.is_admin():
-            form.airline_id.choices = [(a.id, f"{a.code} - {a.name}") for a in Airline.query.all()]
+            form.airline_id.choices = reference.airline_choices
         else:
             # Менеджер может редактировать только свою авиакомпанию
             if current_user.company_id:
-                airline = Airline.query.get(current_user.company_id)
+                airline = reference.airlines_by_id.get(current_user.company_id)
                 if airline:
                     form.airline_id.choices = [(airline.id, f"{airline.code} - {airline.name}")]
                     form.airline_id.data = airline.id
@@ -776,6 +1218,7 @@ def create_app():
         return redirect(url_for('admin_flights'))
     
     @app.route('/api/flight/<int:flight_id>/details')
+    @use_replica
     @login_required
     def api_flight_details(flight_id):
         if not current_user.is_admin():
@@ -784,78 +1227,76 @@ def create_app():
         try:
             flight = Flight.query.get_or_404(flight_id)
             
-            # Получаем детальную информацию
-            bookings = Booking.query.filter_by(flight_id=flight_id).all()
-            total_revenue = sum(booking.price_paid for booking in bookings)
-            #"c:\Users\Муса\OneDrive\Desktop\new shit\ticket-booking-app"
-            # Статистика по классам обслуживания
-            class_stats = {}
-            for booking in bookings:
-                seat_class = booking.seat_class
-                if seat_class not in class_stats:
-                    class_stats[seat_class] = {'count': 0, 'revenue': 0}
-                class_stats[seat_class]['count'] += 1
-                class_stats[seat_class]['revenue'] += booking.price_paid
-            
-            # Последние бронирования
-            recent_bookings = Booking.query.filter_by(flight_id=flight_id)\
-                .order_by(Booking.booking_date.desc()).limit(5).all()
-            
-            details = {
-                'flight': {
-                    'id': flight.id,
-                    'flight_number': flight.flight_number,
-                    'departure_airport': {
-                        'code': flight.departure_airport.code,
-                        'name': flight.departure_airport.name,
-                        'city': flight.departure_airport.city
-                    },
-                    'arrival_airport': {
-                        'code': flight.arrival_airport.code,
-                        'name': flight.arrival_airport.name,
-                        'city': flight.arrival_airport.city
-                    },
-                    'airline': {
-                        'code': flight.airline.code,
-                        'name': flight.airline.name
-                    },
-                    'departure_time': flight.departure_time.strftime('%d.%m.%Y %H:%M'),
-                    'arrival_time': flight.arrival_time.strftime('%d.%m.%Y %H:%M'),
-                    'duration': str(flight.arrival_time - flight.departure_time),
-                    'aircraft_type': flight.aircraft_type,
-                    'status': flight.status,
-                    'total_seats': flight.total_seats,
-                    'available_seats': flight.available_seats,
-                    'booked_seats': flight.total_seats - flight.available_seats,
-                    'occupancy_percent': round(((flight.total_seats - flight.available_seats) / flight.total_seats * 100) if flight.total_seats > 0 else 0, 1),
-                    'economy_price': float(flight.economy_price),
-                    'business_price': float(flight.business_price) if flight.business_price else None,
-                    'first_class_price': float(flight.first_class_price) if flight.first_class_price else None
-                },
-                'statistics': {
-                    'total_bookings': len(bookings),
-                    'total_revenue': float(total_revenue),
-                    'average_ticket_price': float(total_revenue / len(bookings)) if bookings else 0,
-                    'class_breakdown': class_stats
-                },
-                'recent_bookings': [
-                    {
-                        'id': booking.id,
-                        'booking_reference': booking.booking_reference,
-                        'passenger_name': f"{booking.passenger_first_name} {booking.passenger_last_name}",
-                        'seat_class': booking.seat_class,
-                        'price_paid': float(booking.price_paid),
-                        'booking_date': booking.booking_date.strftime('%d.%m.%Y %H:%M'),
-                        'status': booking.status
-                    } for booking in recent_bookings
-                ]
-            }
-            
-            return jsonify(details)
+            # Ответ кэшируется до изменения рейса, его бронирований или справочников (названия
+            # аэропортов и авиакомпании), но не дольше STATISTICS_CACHE_TTL
+            return cached_json_response(
+                flight_details_cache, flight_id,
+                (get_version(flight_namespace(flight_id)), get_version(REFERENCE_NAMESPACE)),
+                lambda: flight_details_payload(flight)
+            )
             
         except Exception as e:
             return jsonify({'error': 'Ошибка получения данных'}), 500
     
+    def flight_details_payload(flight):
+        """Детальная информация о рейсе для админ-панели"""
+        # Статистика по классам обслуживания одним GROUP BY запросом
+        class_stats, total_bookings, total_revenue = flight_class_statistics(flight.id)
+        
+        # Последние бронирования
+        recent_bookings = Booking.query.filter_by(flight_id=flight.id)\
+            .order_by(Booking.booking_date.desc()).limit(5).all()
+        
+        return {
+            'flight': {
+                'id': flight.id,
+                'flight_number': flight.flight_number,
+                'departure_airport': {
+                    'code': flight.departure_airport.code,
+                    'name': flight.departure_airport.name,
+                    'city': flight.departure_airport.city
+                },
+                'arrival_airport': {
+                    'code': flight.arrival_airport.code,
+                    'name': flight.arrival_airport.name,
+                    'city': flight.arrival_airport.city
+                },
+                'airline': {
+                    'code': flight.airline.code,
+                    'name': flight.airline.name
+                },
+                'departure_time': flight.departure_time.strftime('%d.%m.%Y %H:%M'),
+                'arrival_time': flight.arrival_time.strftime('%d.%m.%Y %H:%M'),
+                'duration': str(flight.arrival_time - flight.departure_time),
+                'aircraft_type': flight.aircraft_type,
+                'status': flight.status,
+                'total_seats': flight.total_seats,
+                'available_seats': flight.available_seats,
+                'booked_seats': flight.total_seats - flight.available_seats,
+                'occupancy_percent': round(((flight.total_seats - flight.available_seats) / flight.total_seats * 100) if flight.total_seats > 0 else 0, 1),
+                'economy_price': float(flight.economy_price),
+                'business_price': float(flight.business_price) if flight.business_price else None,
+                'first_class_price': float(flight.first_class_price) if flight.first_class_price else None
+            },
+            'statistics': {
+                'total_bookings': total_bookings,
+                'total_revenue': float(total_revenue),
+                'average_ticket_price': float(total_revenue / total_bookings) if total_bookings else 0,
+                'class_breakdown': class_stats
+            },
+            'recent_bookings': [
+                {
+                    'id': booking.id,
+                    'booking_reference': booking.booking_reference,
+                    'passenger_name': f"{booking.passenger_first_name} {booking.passenger_last_name}",
+                    'seat_class': booking.seat_class,
+                    'price_paid': float(booking.price_paid),
+                    'booking_date': booking.booking_date.strftime('%d.%m.%Y %H:%M'),
+                    'status': booking.status
+                } for booking in recent_bookings
+            ]
+        }
+    
     @app.route('/admin/airports')
     @login_required
     def admin_airports():
@@ -955,28 +1396,67 @@ def create_app():
         
         # Получаем параметр фильтра из URL
         role_filter = request.args.get('role', 'all')
-        
-        # Применяем фильтр
-        if role_filter == 'all':
-            users = User.query.order_by(User.created_at.desc()).all()
-        else:
-            users = User.query.filter_by(role=role_filter).order_by(User.created_at.desc()).all()
-        
-        # Статистика для отображения
-        total_users = User.query.count()
-        admin_count = User.query.filter_by(role='admin').count()
-        manager_count = User.query.filter_by(role='manager').count()
-        user_count = User.query.filter_by(role='user').count()
+        if role_filter not in ('all', 'admin', 'manager', 'user'):
+            role_filter = 'all'
+        search = request.args.get('q', '').strip()
+        per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
+        cursor = request.args.get('cursor') or None
+        
+        # Количество пользователей по ролям одним GROUP BY запросом
+        role_counts = dict(db.session.query(User.role, db.func.count(User.id)).group_by(User.role).all())
+        total_users = sum(role_counts.values())
+        
+        query = User.query
+        if role_filter != 'all':
+            query = query.filter(User.role == role_filter)
+        if search:
+            query = query.filter(user_search_condition(search))
+        
+        # Новые пользователи первыми: keyset-пагинация по id
+        try:
+            page = keyset_paginate(query, [User.id], cursor=cursor, limit=per_page, descending=True)
+        except ValueError:
+            return redirect(url_for('admin_users', role=role_filter, q=search or None))
+        users = page.items
+        
+        # Количество и дата последнего бронирования для пользователей страницы одним запросом
+        user_ids = [user.id for user in users]
+        # (по запросу на действующую и архивную таблицы; booking_date может быть NULL)
+        booking_summary = {}
+        for model in (Booking, ArchivedBooking) if user_ids else ():
+            for user_id, count, last_booking in db.session.query(
+                model.user_id, db.func.count(model.id), db.func.max(model.booking_date)
+            ).filter(model.user_id.in_(user_ids)).group_by(model.user_id).all():
+                if user_id in booking_summary:
+                    total, latest = booking_summary[user_id]
+                    count, last_booking = total + count, max(filter(None, (latest, last_booking)), default=None)
+                booking_summary[user_id] = (count, last_booking)
+        
+        # Без поиска количество отфильтрованных пользователей известно из счетчиков ролей
+        filtered_total = None
+        if not search:
+            filtered_total = total_users if role_filter == 'all' else role_counts.get(role_filter, 0)
+        
+        next_url = None
+        if page.has_more:
+            next_url = url_for('admin_users', role=role_filter, q=search or None,
+                               per_page=per_page, cursor=page.next_cursor)
         
         return render_template('admin/users.html', 
                              users=users, 
+                             booking_summary=booking_summary,
                              current_filter=role_filter,
+                             search=search,
+                             filtered_total=filtered_total,
+                             is_first_page=cursor is None,
+                             next_url=next_url,
                              total_users=total_users,
-                             admin_count=admin_count,
-                             manager_count=manager_count,
-                             user_count=user_count)
+                             admin_count=role_counts.get('admin', 0),
+                             manager_count=role_counts.get('manager', 0),
+                             user_count=role_counts.get('user', 0))
     
     @app.route('/api/user/<int:user_id>/details')
+    @use_replica
     @login_required
     def api_user_details(user_id):
         if not current_user.is_admin():
@@ -985,29 +1465,19 @@ def create_app():
         try:
             user = User.query.get_or_404(user_id)
             
-            # Получаем детальную информацию о бронированиях
-            bookings = Booking.query.filter_by(user_id=user_id).order_by(Booking.booking_date.desc()).all()
-            total_spent = sum(booking.price_paid for booking in bookings)
-            
-            # Статистика по статусам бронирований
-            status_stats = {}
-            for booking in bookings:
-                status = booking.status
-                if status not in status_stats:
-                    status_stats[status] = {'count': 0, 'amount': 0}
-                status_stats[status]['count'] += 1
-                status_stats[status]['amount'] += booking.price_paid
-            
-            # Любимые направления
-            destinations = {}
-            for booking in bookings:
-                route = f"{booking.flight.departure_airport.city} → {booking.flight.arrival_airport.city}"
-                if route not in destinations:
-                    destinations[route] = 0
-                destinations[route] += 1
-            
-            # Топ-3 направления
-            top_destinations = sorted(destinations.items(), key=lambda x: x[1], reverse=True)[:3]
+            # Статистика считается на стороне БД
+            status_stats, total_bookings, total_spent = user_booking_statistics(user_id)
+            top_destinations = user_top_routes(user_id, limit=3)
+            
+            # Последние 10 бронирований вместе с рейсами и аэропортами: по запросу
+            # на действующую и архивную таблицы, затем общие 10 самых новых
+            recent_bookings = []
+            for booking_model, flight_model in ((Booking, Flight), (ArchivedBooking, ArchivedFlight)):
+                recent_bookings += booking_model.query.options(
+                    joinedload(booking_model.flight).joinedload(flight_model.departure_airport),
+                    joinedload(booking_model.flight).joinedload(flight_model.arrival_airport)
+                ).filter_by(user_id=user_id).order_by(booking_model.booking_date.desc()).limit(10).all()
+            recent_bookings = sorted(recent_bookings, key=lambda booking: booking.booking_date, reverse=True)[:10]
             
             details = {
                 'user': {
@@ -1022,9 +1492,9 @@ def create_app():
                     'is_active': True  # В будущем можно добавить поле активности
                 },
                 'statistics': {
-                    'total_bookings': len(bookings),
+                    'total_bookings': total_bookings,
                     'total_spent': float(total_spent),
-                    'average_booking_value': float(total_spent / len(bookings)) if bookings else 0,
+                    'average_booking_value': float(total_spent / total_bookings) if total_bookings else 0,
                     'status_breakdown': status_stats,
                     'favorite_destinations': top_destinations
                 },
@@ -1040,7 +1510,7 @@ def create_app():
                         'booking_date': booking.booking_date.strftime('%d.%m.%Y %H:%M'),
                         'status': booking.status,
                         'passenger_name': f"{booking.passenger_first_name} {booking.passenger_last_name}"
-                    } for booking in bookings[:10]  # Последние 10 бронирований
+                    } for booking in recent_bookings
                 ]
             }
             
@@ -1126,141 +1596,120 @@ def create_app():
         time_filter = request.args.get('period', 'all')
         now = datetime.utcnow()
         
-        # Определяем временной диапазон
-        if time_filter == 'today':
-            start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
-            end_date = now.replace(hour=23, minute=59, second=59, microsecond=999999)
-        elif time_filter == 'week':
-            start_date = now - timedelta(days=7)
-            end_date = now
-        elif time_filter == 'month':
-            start_date = now - timedelta(days=30)
-            end_date = now
-        else:  # all
-            start_date = None
-            end_date = None
+        # Все показатели считаются одним агрегирующим запросом на стороне БД
+        stats = manager_statistics(current_user, time_filter, now)
         
-        # Базовые запросы в зависимости от роли
-        if current_user.is_admin():
-            # Админ видит всю статистику
-            base_flight_query = Flight.query
+        # Базовый запрос бронирований в зависимости от роли
+        scope = statistics_scope(current_user)
+        if scope is None:
+            # Админ видит все бронирования
             base_booking_query = Booking.query
-        elif current_user.is_manager() and current_user.company_id:
-            # Менеджер видит только статистику своей авиакомпании
-            base_flight_query = Flight.query.filter_by(airline_id=current_user.company_id)
-            base_booking_query = Booking.query.join(Flight).filter(Flight.airline_id == current_user.company_id)
+        elif scope:
+            # Менеджер видит только бронирования своей авиакомпании
+            base_booking_query = Booking.query.join(Flight).filter(Flight.airline_id == scope)
         else:
-            base_flight_query = Flight.query.filter_by(id=0)  # Пустой запрос
             base_booking_query = Booking.query.filter_by(id=0)  # Пустой запрос
         
-        # Общая статистика рейсов
-        total_flights = base_flight_query.count()
-        active_flights = base_flight_query.filter(Flight.departure_time >= now).count()
-        completed_flights = base_flight_query.filter(Flight.departure_time < now).count()
-        
-        # Статистика бронирований с временным фильтром
-        if start_date and end_date:
-            filtered_bookings = base_booking_query.filter(
-                Booking.booking_date >= start_date,
-                Booking.booking_date <= end_date
-            )
-        else:
-            filtered_bookings = base_booking_query
-        
-        total_passengers = filtered_bookings.count()
-        total_revenue = db.session.query(db.func.sum(Booking.price_paid)).filter(
-            Booking.id.in_([b.id for b in filtered_bookings])
-        ).scalar() or 0
-        
-        # Статистика по статусам бронирований
-        confirmed_bookings = filtered_bookings.filter_by(status='confirmed').count()
-        cancelled_bookings = filtered_bookings.filter_by(status='cancelled').count()
-        refunded_bookings = filtered_bookings.filter_by(status='refunded').count()
-        
         # Последние бронирования
-        recent_bookings = base_booking_query.order_by(Booking.booking_date.desc()).limit(10).all()
+        recent_bookings = base_booking_query.options(*BOOKING_LIST_OPTIONS)\
+            .order_by(Booking.booking_date.desc()).limit(10).all()
         
         return render_template('manager/dashboard.html',
-                             total_flights=total_flights,
-                             active_flights=active_flights,
-                             completed_flights=completed_flights,
-                             total_passengers=total_passengers,
-                             total_revenue=total_revenue,
-                             confirmed_bookings=confirmed_bookings,
-                             cancelled_bookings=cancelled_bookings,
-                             refunded_bookings=refunded_bookings,
+                             total_flights=stats['total_flights'],
+                             active_flights=stats['active_flights'],
+                             completed_flights=stats['completed_flights'],
+                             total_passengers=stats['total_passengers'],
+                             total_revenue=stats['total_revenue'],
+                             confirmed_bookings=stats['confirmed_bookings'],
+                             cancelled_bookings=stats['cancelled_bookings'],
+                             refunded_bookings=stats['refunded_bookings'],
                              recent_bookings=recent_bookings,
                              current_period=time_filter,
                              now=now)
     
     @app.route('/manager/api/statistics')
+    @use_replica
     @login_required
     def manager_statistics_api():
         if not (current_user.is_admin() or current_user.is_manager()):
             return jsonify({'error': 'Нет прав доступа'}), 403
         
         period = request.args.get('period', 'all')
-        now = datetime.utcnow()
         
-        # Определяем временной диапазон
-        if period == 'today':
-            start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
-            end_date = now.replace(hour=23, minute=59, second=59, microsecond=999999)
-        elif period == 'week':
-            start_date = now - timedelta(days=7)
-            end_date = now
-        elif period == 'month':
-            start_date = now - timedelta(days=30)
-            end_date = now
-        else:  # all
-            start_date = None
-            end_date = None
+        def build_statistics():
+            stats = manager_statistics(current_user, period)
+            return {
+                'total_flights': stats['total_flights'],
+                'active_flights': stats['active_flights'],
+                'completed_flights': stats['completed_flights'],
+                'total_passengers': stats['total_passengers'],
+                'total_revenue': stats['total_revenue'],
+                'confirmed_bookings': stats['confirmed_bookings'],
+                'cancelled_bookings': stats['cancelled_bookings'],
+                'refunded_bookings': stats['refunded_bookings'],
+                'period': period
+            }
         
-        # Базовые запросы в зависимости от роли
-        if current_user.is_admin():
-            base_flight_query = Flight.query
-            base_booking_query = Booking.query
-        elif current_user.is_manager() and current_user.company_id:
-            base_flight_query = Flight.query.filter_by(airline_id=current_user.company_id)
-            base_booking_query = Booking.query.join(Flight).filter(Flight.airline_id == current_user.company_id)
-        else:
-            base_flight_query = Flight.query.filter_by(id=0)
-            base_booking_query = Booking.query.filter_by(id=0)
-        
-        # Статистика рейсов
-        total_flights = base_flight_query.count()
-        active_flights = base_flight_query.filter(Flight.departure_time >= now).count()
-        completed_flights = base_flight_query.filter(Flight.departure_time < now).count()
-        
-        # Статистика бронирований с временным фильтром
-        if start_date and end_date:
-            filtered_bookings = base_booking_query.filter(
-                Booking.booking_date >= start_date,
-                Booking.booking_date <= end_date
-            )
-        else:
-            filtered_bookings = base_booking_query
+        # Кэш общий для всех менеджеров одной авиакомпании
+        return cached_json_response(
+            statistics_cache, ('manager', statistics_scope(current_user), period),
+            get_version(STATISTICS_NAMESPACE), build_statistics
+        )
+    
+    @app.route('/manager/api/timeseries')
+    @use_replica
+    @login_required
+    def manager_timeseries_api():
+        if not (current_user.is_admin() or current_user.is_manager()):
+            return jsonify({'error': 'Нет прав доступа'}), 403
+        
+        granularity = request.args.get('granularity', 'day')
+        group_by = request.args.get('group_by', 'airline')
+        if granularity not in GRANULARITIES or group_by not in GROUPINGS:
+            return jsonify({'error': 'Некорректные параметры'}), 400
         
-        total_passengers = filtered_bookings.count()
-        total_revenue = db.session.query(db.func.sum(Booking.price_paid)).filter(
-            Booking.id.in_([b.id for b in filtered_bookings])
-        ).scalar() or 0
+        # Диапазон дат (по умолчанию - последние 90 дней)
+        try:
+            start_date = datetime.strptime(request.args['start'], '%Y-%m-%d') if request.args.get('start') else None
+            end_date = datetime.strptime(request.args['end'], '%Y-%m-%d') + timedelta(days=1) if request.args.get('end') else None
+        except ValueError:
+            return jsonify({'error': 'Неверный формат даты, ожидается ГГГГ-ММ-ДД'}), 400
+        
+        scope = statistics_scope(current_user)
+        if scope is False:
+            return jsonify({'error': 'У вас не назначена авиакомпания'}), 403
+        
+        return cached_json_response(
+            statistics_cache,
+            ('timeseries', scope, granularity, group_by, request.args.get('start'), request.args.get('end')),
+            get_version(STATISTICS_NAMESPACE),
+            lambda: booking_timeseries(scope, start_date, end_date, granularity, group_by)
+        )
+    
+    @app.route('/manager/api/routes')
+    @use_replica
+    @login_required
+    def manager_routes_api():
+        if not (current_user.is_admin() or current_user.is_manager()):
+            return jsonify({'error': 'Нет прав доступа'}), 403
+        
+        scope = statistics_scope(current_user)
+        if scope is False:
+            return jsonify({'error': 'У вас не назначена авиакомпания'}), 403
         
-        # Статистика по статусам
-        confirmed_bookings = filtered_bookings.filter_by(status='confirmed').count()
-        cancelled_bookings = filtered_bookings.filter_by(status='cancelled').count()
-        refunded_bookings = filtered_bookings.filter_by(status='refunded').count()
+        sort = request.args.get('sort', 'revenue')
+        if sort not in ('revenue', 'load_factor', 'average_fare', 'revenue_per_seat', 'bookings', 'flights'):
+            return jsonify({'error': 'Некорректные параметры'}), 400
+        limit = request.args.get('limit', type=int)
+        if limit is not None and limit < 0:
+            return jsonify({'error': 'Некорректные параметры'}), 400
         
+        # Данные берутся из периодически перестраиваемого снимка, без JOIN рейсов и бронирований
+        snapshot = route_snapshots.get()
         return jsonify({
-            'total_flights': total_flights,
-            'active_flights': active_flights,
-            'completed_flights': completed_flights,
-            'total_passengers': total_passengers,
-            'total_revenue': float(total_revenue),
-            'confirmed_bookings': confirmed_bookings,
-            'cancelled_bookings': cancelled_bookings,
-            'refunded_bookings': refunded_bookings,
-            'period': period
+            'built_at': snapshot.built_at.strftime('%d.%m.%Y %H:%M:%S'),
+            'airlines': snapshot.airlines(scope),
+            'routes': snapshot.routes(scope, sort=sort, limit=limit)
         })
     
     @app.route('/manager/flights')
@@ -1273,14 +1722,15 @@ def create_app():
         # Получаем рейсы для менеджера
         if current_user.is_admin():
             # Админ видит все рейсы
-            flights = Flight.query.order_by(Flight.departure_time.desc()).all()
+            flights = Flight.query.options(*FLIGHT_LIST_OPTIONS).order_by(Flight.departure_time.desc()).all()
         else:
             # Менеджер видит только рейсы своей авиакомпании
             if not current_user.company_id:
                 flash('У вас не назначена авиакомпания.', 'error')
                 return redirect(url_for('manager_dashboard'))
             
-            flights = Flight.query.filter_by(airline_id=current_user.company_id).order_by(Flight.departure_time.desc()).all()
+            flights = Flight.query.options(*FLIGHT_LIST_OPTIONS).filter_by(airline_id=current_user.company_id)\
+                .order_by(Flight.departure_time.desc()).all()
         
         return render_template('manager/flights.html', flights=flights)
     
@@ -1291,36 +1741,173 @@ def create_app():
             flash('У вас нет прав менеджера.', 'error')
             return redirect(url_for('index'))
         
-        # Фильтр по рейсу
-        flight_id = request.args.get('flight')
+        # Менеджер видит только рейсы и бронирования своей авиакомпании
+        company_id = None
+        if not current_user.is_admin():
+            if not current_user.company_id:
+                flash('У вас не назначена авиакомпания.', 'error')
+                return redirect(url_for('manager_dashboard'))
+            company_id = current_user.company_id
+        
+        filters = {
+            'flight': request.args.get('flight', type=int),
+            'date_from': request.args.get('date_from', '').strip(),
+            'date_to': request.args.get('date_to', '').strip(),
+            'status': request.args.get('status', '').strip(),
+            'seat_class': request.args.get('seat_class', '').strip(),
+        }
+        per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
+        cursor = request.args.get('cursor') or None
+        
+        bookings_query = Booking.query.join(Flight, Booking.flight_id == Flight.id)
+        if company_id is not None:
+            bookings_query = bookings_query.filter(Flight.airline_id == company_id)
+        
+        # Выбранный рейс (для подписи в поле выбора рейса)
+        selected_flight = None
+        if filters['flight']:
+            selected_flight = Flight.query.options(*FLIGHT_LIST_OPTIONS).get(filters['flight'])
+            if selected_flight is None or (company_id is not None and selected_flight.airline_id != company_id):
+                flash('Рейс не найден.', 'error')
+                return redirect(url_for('manager_passengers'))
+            bookings_query = bookings_query.filter(Booking.flight_id == filters['flight'])
+        
+        # Период - по дате вылета рейса
+        try:
+            if filters['date_from']:
+                bookings_query = bookings_query.filter(
+                    Flight.departure_time >= datetime.strptime(filters['date_from'], '%Y-%m-%d'))
+            if filters['date_to']:
+                bookings_query = bookings_query.filter(
+                    Flight.departure_time < datetime.strptime(filters['date_to'], '%Y-%m-%d') + timedelta(days=1))
+        except ValueError:
+            flash('Дата должна быть в формате ГГГГ-ММ-ДД', 'error')
+            return redirect(url_for('manager_passengers'))
+        
+        if filters['status'] in BOOKING_STATUS_LABELS:
+            bookings_query = bookings_query.filter(Booking.status == filters['status'])
+        if filters['seat_class'] in SEAT_CLASS_LABELS:
+            bookings_query = bookings_query.filter(Booking.seat_class == filters['seat_class'])
+        
+        # Последние бронирования первыми: keyset-пагинация по (booking_date, id)
+        try:
+            page = keyset_paginate(
+                bookings_query.options(*BOOKING_JOINED_FLIGHT_OPTIONS),
+                [PASSENGER_DATE_KEY, Booking.id],
+                cursor=cursor, limit=per_page, descending=True,
+                key=lambda booking: (booking.booking_date or NO_BOOKING_DATE, booking.id)
+            )
+        except ValueError:
+            return redirect(url_for('manager_passengers'))
+        
+        # Количество пассажиров считаем только для одного рейса - это всегда недорого
+        total = None
+        if selected_flight is not None and not cursor:
+            total = bookings_query.order_by(None).with_entities(db.func.count(Booking.id)).scalar()
+        
+        active_args = {key: value for key, value in filters.items() if value}
+        next_url = None
+        if page.has_more:
+            next_url = url_for('manager_passengers', per_page=per_page, cursor=page.next_cursor, **active_args)
+        
+        return render_template('manager/passengers.html', 
+                             passengers=page.items, 
+                             filters=filters,
+                             selected_flight=selected_flight,
+                             total=total,
+                             next_url=next_url,
+                             first_url=url_for('manager_passengers', **active_args) if cursor else None,
+                             statuses=BOOKING_STATUS_LABELS,
+                             seat_classes=SEAT_CLASS_LABELS)
+    
+    @app.route('/manager/passengers/export')
+    @login_required
+    def manager_export_passengers():
+        """Потоковая выгрузка пассажиров рейса или авиакомпании в CSV/XLSX"""
+        if not (current_user.is_admin() or current_user.is_manager()):
+            flash('У вас нет прав менеджера.', 'error')
+            return redirect(url_for('index'))
         
-        # Получаем рейсы для фильтра
+        export_format = request.args.get('format', 'csv')
+        if export_format not in ('csv', 'xlsx'):
+            flash('Неподдерживаемый формат выгрузки.', 'error')
+            return redirect(url_for('manager_passengers'))
+        if export_format == 'xlsx' and not xlsx_available():
+            flash('Выгрузка в XLSX недоступна: не установлен пакет openpyxl.', 'error')
+            return redirect(url_for('manager_passengers'))
+        
+        # Менеджер выгружает только свою авиакомпанию, админ - любую (airline_id) или всю систему
         if current_user.is_admin():
-            # Админ видит все рейсы
-            flights = Flight.query.order_by(Flight.departure_time.desc()).all()
+            company_id = request.args.get('airline_id', type=int)
         else:
-            # Менеджер видит только рейсы своей авиакомпании
             if not current_user.company_id:
                 flash('У вас не назначена авиакомпания.', 'error')
                 return redirect(url_for('manager_dashboard'))
-            
-            flights = Flight.query.filter_by(airline_id=current_user.company_id).order_by(Flight.departure_time.desc()).all()
+            company_id = current_user.company_id
         
-        # Получаем бронирования
-        if current_user.is_admin():
-            bookings_query = Booking.query.join(Flight)
+        flight_id = request.args.get('flight', type=int)
+        reference = reference_data.get()
+        if flight_id:
+            flight = db.session.get(Flight, flight_id)
+            if flight is None or (company_id is not None and flight.airline_id != company_id):
+                flash('Рейс не найден.', 'error')
+                return redirect(url_for('manager_passengers'))
+            name = f"{flight.flight_number}_{flight.departure_time.strftime('%Y%m%d')}"
+        elif company_id is not None:
+            airline = reference.airlines_by_id.get(company_id)
+            name = airline.code if airline else str(company_id)
+        else:
+            name = 'all'
+        # Номер рейса и код приходят из импорта: в имени файла оставляем только безопасные символы
+        name = re.sub(r'[^A-Za-z0-9_-]', '_', name)
+        
+        statement = manifest_statement(company_id=company_id, flight_id=flight_id)
+        if export_format == 'xlsx':
+            generator = stream_xlsx(statement)
+            mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         else:
-            # Только бронирования на рейсы авиакомпании менеджера
-            bookings_query = Booking.query.join(Flight).filter(Flight.airline_id == current_user.company_id)
+            generator = stream_csv(statement)
+            mimetype = 'text/csv; charset=utf-8'
         
-        if flight_id:
-            bookings_query = bookings_query.filter(Booking.flight_id == flight_id)
+        return Response(
+            stream_with_context(generator),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="manifest_{name}.{export_format}"'}
+        )
+    
+    @app.route('/manager/api/flights/search')
+    @login_required
+    def manager_api_flight_search():
+        """Поиск рейсов для выбора в фильтрах: по началу номера рейса или города"""
+        if not (current_user.is_admin() or current_user.is_manager()):
+            return jsonify({'error': 'Доступ запрещен'}), 403
         
-        passengers = bookings_query.order_by(Booking.booking_date.desc()).all()
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify([])
         
-        return render_template('manager/passengers.html', 
-                             passengers=passengers, 
-                             flights=flights)
+        flights_query = Flight.query.options(*FLIGHT_LIST_OPTIONS)
+        if not current_user.is_admin():
+            if not current_user.company_id:
+                return jsonify({'error': 'У вас не назначена авиакомпания'}), 403
+            flights_query = flights_query.filter(Flight.airline_id == current_user.company_id)
+        
+        # Аэропорты городов, начинающихся с запроса, берутся из справочника
+        query_lower = query.lower()
+        airport_ids = [airport.id for airport in reference_data.get().airports
+                       if airport.city.lower().startswith(query_lower)]
+        conditions = [_prefix_match(Flight.flight_number, query.upper())]
+        if airport_ids:
+            conditions.append(Flight.departure_airport_id.in_(airport_ids))
+            conditions.append(Flight.arrival_airport_id.in_(airport_ids))
+        
+        flights = flights_query.filter(db.or_(*conditions))\
+            .order_by(Flight.departure_time.desc()).limit(20).all()
+        
+        return jsonify([{
+            'id': flight.id,
+            'label': flight_picker_label(flight)
+        } for flight in flights])
     
     @app.route('/manager/add-flight', methods=['GET', 'POST'])
     @login_required
@@ -1330,16 +1917,17 @@ def create_app():
             return redirect(url_for('index'))
         
         form = FlightForm()
-        form.departure_airport_id.choices = [(a.id, f"{a.code} - {a.city}") for a in Airport.query.all()]
-        form.arrival_airport_id.choices = [(a.id, f"{a.code} - {a.city}") for a in Airport.query.all()]
+        reference = reference_data.get()
+        form.departure_airport_id.choices = reference.airport_choices
+        form.arrival_airport_id.choices = reference.airport_choices
         
         # Ограничиваем выбор авиакомпании для менеджеров
         if current_user.is_admin():
-            form.airline_id.choices = [(a.id, f"{a.code} - {a.name}") for a in Airline.query.all()]
+            form.airline_id.choices = reference.airline_choices
         else:
             # Менеджер может добавлять рейсы только для своей авиакомпании
             if current_user.company_id:
-                airline = Airline.query.get(current_user.company_id)
+                airline = reference.airlines_by_id.get(current_user.company_id)
                 if airline:
                     form.airline_id.choices = [(airline.id, f"{airline.code} - {airline.name}")]
                     form.airline_id.data = airline.id
@@ -1394,16 +1982,17 @@ def create_app():
             return redirect(url_for('manager_flights'))
         
         form = FlightForm(obj=flight)
-        form.departure_airport_id.choices = [(a.id, f"{a.code} - {a.city}") for a in Airport.query.all()]
-        form.arrival_airport_id.choices = [(a.id, f"{a.code} - {a.city}") for a in Airport.query.all()]
+        reference = reference_data.get()
+        form.departure_airport_id.choices = reference.airport_choices
+        form.arrival_airport_id.choices = reference.airport_choices
         
         # Ограничиваем выбор авиакомпании для менеджеров
         if current_user.is_admin():
-            form.airline_id.choices = [(a.id, f"{a.code} - {a.name}") for a in Airline.query.all()]
+            form.airline_id.choices = reference.airline_choices
         else:
             # Менеджер может редактировать только свою авиакомпанию
             if current_user.company_id:
-                airline = Airline.query.get(current_user.company_id)
+                airline = reference.airlines_by_id.get(current_user.company_id)
                 if airline:
                     form.airline_id.choices = [(airline.id, f"{airline.code} - {airline.name}")]
                     form.airline_id.data = airline.id
@@ -1472,12 +2061,16 @@ def create_app():
     
     # API для менеджеров
     @app.route('/manager/api/booking/<int:booking_id>/details')
+    @use_replica
     @login_required
     def manager_booking_details(booking_id):
         if not (current_user.is_admin() or current_user.is_manager()):
             return jsonify({'error': 'Доступ запрещен'}), 403
         
-        booking = Booking.query.get_or_404(booking_id)
+        # Бронирование могло быть перенесено в архив вместе с рейсом
+        booking = find_booking(booking_id)
+        if booking is None:
+            abort(404)
         
         return jsonify({
             'passenger_first_name': booking.passenger_first_name,
@@ -1493,7 +2086,7 @@ def create_app():
             'baggage_count': booking.baggage_count,
             'price_paid': booking.price_paid,
             'status': booking.status,
-            'booking_date': booking.booking_date.strftime('%d.%m.%Y %H:%M')
+            'booking_date': booking.booking_date.strftime('%d.%m.%Y %H:%M') if booking.booking_date else '—'
         })
     
     @app.route('/admin/assign-seats')
@@ -1603,35 +2196,19 @@ def create_app():
     
     # API для автодополнения городов
     @app.route('/api/cities')
+    @use_replica
     def api_cities():
         query = request.args.get('q', '').strip()
         if len(query) < 1:  # Уменьшаем минимальную длину запроса
             return jsonify([])
         
-        # Ищем города, нечувствительно к регистру
-        # Используем несколько вариантов поиска
-        query_lower = query.lower()
-        
-        # Основной поиск с LOWER()
-        cities = db.session.query(Airport.city).filter(
-            db.func.lower(Airport.city).like(f'%{query_lower}%')
-        ).distinct().limit(15).all()
-        
-        # Если ничего не найдено, пробуем альтернативные варианты
-        if not cities:
-            # Поиск с разными вариантами регистра
-            cities = db.session.query(Airport.city).filter(
-                Airport.city.ilike(f'%{query}%')
-            ).distinct().limit(15).all()
-        
-        # Если все еще ничего не найдено, пробуем частичный поиск
-        if not cities and len(query) > 1:
-            cities = db.session.query(Airport.city).filter(
-                db.func.lower(Airport.city).like(f'%{query_lower[:2]}%')
-            ).distinct().limit(15).all()
+        # Ищем города в справочнике без обращения к БД, нечувствительно к регистру
+        reference = reference_data.get()
+        city_list = reference.search_cities(query)
         
-        # Возвращаем города, отсортированные по релевантности
-        city_list = [city[0] for city in cities]
+        # Если ничего не найдено, пробуем частичный поиск
+        if not city_list and len(query) > 1:
+            city_list = reference.search_cities(query[:2])
         
         # Сортируем: сначала точные совпадения, затем начинающиеся с запроса
         def sort_key(city):
@@ -1676,7 +2253,7 @@ def create_app():
     # Инициализация базы данных
     def init_database():
         with app.app_context():
-            db.create_all()
+            upgrade_schema(db.engine)
             
             # Создание админа (хардкод как запрошено)
             admin = User.query.filter_by(username='admin').first()
@@ -1691,63 +2268,30 @@ def create_app():
                 admin.set_password('admin123')  # Измените пароль в продакшене!
                 db.session.add(admin)
             
+            db.session.commit()
+            
             # Добавление тестовых данных если их нет
             if Airport.query.count() == 0:
-                add_sample_data()
-            
-            db.session.commit()
-    
-    def add_sample_data():
-        # Аэропорты
-        airports = [
-            Airport(code='SVO', name='Шереметьево', city='Москва', country='Россия'),
-            Airport(code='DME', name='Домодедово', city='Москва', country='Россия'),
-            Airport(code='LED', name='Пулково', city='Санкт-Петербург', country='Россия'),
-            Airport(code='AER', name='Сочи', city='Сочи', country='Россия'),
-            Airport(code='KGD', name='Храброво', city='Калининград', country='Россия'),
-        ]
-        
-        for airport in airports:
-            db.session.add(airport)
-        
-        # Авиакомпании
-        airlines = [
-            Airline(code='SU', name='Аэрофлот'),
-            Airline(code='S7', name='S7 Airlines'),
-            Airline(code='FV', name='Россия'),
-        ]
-        
-        for airline in airlines:
-            db.session.add(airline)
-        
-        db.session.commit()
-        
-        # Рейсы
-        flights = [
-            Flight(
-                flight_number='SU1234',
-                departure_airport_id=1, arrival_airport_id=3,
-                airline_id=1,
-                departure_time=datetime.utcnow() + timedelta(days=1, hours=10),
-                arrival_time=datetime.utcnow() + timedelta(days=1, hours=12, minutes=30),
-                economy_price=8500, business_price=25000,
-                aircraft_type='Boeing 737'
-            ),
-            Flight(
-                flight_number='S7456',
-                departure_airport_id=3, arrival_airport_id=1,
-                airline_id=2,
-                departure_time=datetime.utcnow() + timedelta(days=2, hours=14),
-                arrival_time=datetime.utcnow() + timedelta(days=2, hours=16, minutes=20),
-                economy_price=9200, business_price=28000,
-                aircraft_type='Airbus A320'
-            ),
-        ]
-        
-        for flight in flights:
-            db.session.add(flight)
-        
+                generate_sample_data()
+    
+    def generate_sample_data():
+        """Заполняет пустую базу генератором (профиль DATAGEN_PROFILE) и добавляет тестовый баннер"""
+        counts = generate_data(seed=app.config['DATAGEN_SEED'], **PROFILES[app.config['DATAGEN_PROFILE']])
+        
+        admin = User.query.filter_by(username='admin').first()
+        db.session.add(Banner(
+            title='Специальное предложение!',
+            description='Скидка 20% на все рейсы до конца месяца. Бронируйте прямо сейчас!',
+            image_url='https://via.placeholder.com/300x100/007bff/ffffff?text=Скидка+20%',
+            link_url='https://example.com/promo',
+            position='main',
+            is_active=True,
+            views_count=0,
+            clicks_count=0,
+            created_by=admin.id
+        ))
         db.session.commit()
+        return counts
     
     # Управление назначениями менеджеров
     @app.route('/admin/manager-assignments')
@@ -1758,20 +2302,17 @@ def create_app():
             return redirect(url_for('index'))
         
         # Получаем всех менеджеров и авиакомпании
-        managers = User.query.filter_by(role='manager').all()
-        airlines = Airline.query.all()
+        managers = User.query.filter_by(role='manager').order_by(User.id).all()
+        reference = reference_data.get()
         
         # Статистика
-        total_managers = len(managers)
-        assigned_managers = len([m for m in managers if m.company_id])
-        unassigned_managers = total_managers - assigned_managers
+        statistics = manager_assignment_statistics()
         
         return render_template('admin/manager_assignments.html', 
                              managers=managers, 
-                             airlines=airlines,
-                             total_managers=total_managers,
-                             assigned_managers=assigned_managers,
-                             unassigned_managers=unassigned_managers)
+                             airlines=reference.airlines,
+                             airlines_by_id=reference.airlines_by_id,
+                             **statistics)
 
     @app.route('/admin/airlines')
     @login_required
@@ -1780,36 +2321,46 @@ def create_app():
             flash('Доступ запрещен', 'error')
             return redirect(url_for('index'))
         
-        # Получаем все авиакомпании с дополнительной информацией
-        airlines = Airline.query.all()
-        
-        # Создаем словарь менеджеров для каждой авиакомпании
-        airline_managers = {}
-        for airline in airlines:
-            managers = User.query.filter_by(company_id=airline.id, role='manager').all()
-            airline_managers[airline.id] = managers[0] if managers else None
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 50, type=int)
+        pagination = Airline.query.order_by(Airline.id).paginate(
+            page=page, per_page=per_page, max_per_page=200, error_out=False
+        )
+        airlines = pagination.items
+        airline_ids = [airline.id for airline in airlines]
+        
+        # Количество рейсов авиакомпаний страницы одним GROUP BY запросом
+        airline_flight_counts = dict(
+            db.session.query(Flight.airline_id, db.func.count(Flight.id))
+            .filter(Flight.airline_id.in_(airline_ids))
+            .group_by(Flight.airline_id).all()
+        ) if airline_ids else {}
+        
+        # Менеджеры авиакомпаний страницы одним запросом (первый по id, как раньше)
+        airline_managers = {airline_id: None for airline_id in airline_ids}
+        if airline_ids:
+            managers = User.query.filter(
+                User.role == 'manager',
+                User.company_id.in_(airline_ids)
+            ).order_by(User.id).all()
+            for manager in managers:
+                if airline_managers[manager.company_id] is None:
+                    airline_managers[manager.company_id] = manager
         
         # Получаем неназначенных менеджеров
         unassigned_managers = User.query.filter_by(role='manager', company_id=None).all()
         
-        # Подсчитываем статистику
-        airlines_with_managers = 0
-        airlines_without_managers = 0
-        total_flights = 0
-        
-        for airline in airlines:
-            # Проверяем наличие менеджера
-            if airline_managers.get(airline.id):
-                airlines_with_managers += 1
-            else:
-                airlines_without_managers += 1
-            
-            # Подсчитываем рейсы
-            if airline.flights:
-                total_flights += len(airline.flights)
+        # Статистика по всем авиакомпаниям считается в БД
+        airlines_with_managers = db.session.query(
+            db.func.count(db.distinct(User.company_id))
+        ).join(Airline, User.company_id == Airline.id).filter(User.role == 'manager').scalar() or 0
+        airlines_without_managers = pagination.total - airlines_with_managers
+        total_flights = db.session.query(db.func.count(Flight.id)).scalar() or 0
         
         return render_template('admin/airlines.html',
                              airlines=airlines,
+                             pagination=pagination,
+                             airline_flight_counts=airline_flight_counts,
                              airline_managers=airline_managers,
                              unassigned_managers=unassigned_managers,
                              airlines_with_managers=airlines_with_managers,
@@ -2079,17 +2630,14 @@ def create_app():
             return jsonify({'error': 'Доступ запрещен'}), 403
         
         try:
-            managers = User.query.filter_by(role='manager').all()
-            airlines = Airline.query.all()
+            managers = User.query.filter_by(role='manager').order_by(User.id).all()
+            # Названия авиакомпаний берутся из справочника без запроса на каждого менеджера
+            reference = reference_data.get()
+            airlines = reference.airlines
             
             # Формируем данные для API
             managers_data = []
             for manager in managers:
-                company_name = None
-                if manager.company_id:
-                    company = Airline.query.get(manager.company_id)
-                    company_name = company.name if company else None
-                
                 managers_data.append({
                     'id': manager.id,
                     'username': manager.username,
@@ -2097,7 +2645,7 @@ def create_app():
                     'last_name': manager.last_name,
                     'email': manager.email,
                     'company_id': manager.company_id,
-                    'company_name': company_name,
+                    'company_name': reference.airline_name(manager.company_id),
                     'created_at': manager.created_at.strftime('%d.%m.%Y') if manager.created_at else None
                 })
             
@@ -2111,12 +2659,10 @@ def create_app():
             return jsonify({
                 'managers': managers_data,
                 'airlines': airlines_data,
-                'statistics': {
-                    'total_managers': len(managers),
-                    'assigned_managers': len([m for m in managers if m.company_id]),
-                    'unassigned_managers': len([m for m in managers if not m.company_id]),
-                    'total_airlines': len(airlines)
-                }
+                'statistics': dict(
+                    manager_assignment_statistics(),
+                    total_airlines=len(airlines)
+                )
             })
             
         except Exception as e:
@@ -2342,34 +2888,13 @@ def create_app():
     # Регистрация декоратора в Jinja2
     app.jinja_env.globals.update(requires_role=requires_role)
     
-    def migrate_database():
-        """Добавляет недостающие колонки в базу данных"""
-        try:
-            # Проверяем существующие колонки
-            with db.engine.connect() as conn:
-                result = conn.execute(text("PRAGMA table_info(booking)"))
-                columns = [column[1] for column in result.fetchall()]
-                
-                # Добавляем колонку cancelled_at
-                if 'cancelled_at' not in columns:
-                    conn.execute(text('ALTER TABLE booking ADD COLUMN cancelled_at DATETIME'))
-                    print("✓ Добавлена колонка cancelled_at")
-                
-                # Добавляем колонку cancellation_reason
-                if 'cancellation_reason' not in columns:
-                    conn.execute(text('ALTER TABLE booking ADD COLUMN cancellation_reason VARCHAR(100)'))
-                    print("✓ Добавлена колонка cancellation_reason")
-                    
-                conn.commit()
-                
-        except Exception as e:
-            print(f"Ошибка миграции: {e}")
-    
-    # Выполняем миграцию при запуске
+    # Проверка версии схемы при запуске: одно чтение из schema_version без изменения схемы.
+    # Схема обновляется командой python manage.py migrate
     with app.app_context():
-        migrate_database()
+        check_schema_version(db.engine)
     
     @app.route('/booking/<int:booking_id>/cancel')
+    @use_primary
     @login_required
     def cancel_booking(booking_id):
         """Страница отмены бронирования"""
@@ -2392,10 +2917,13 @@ def create_app():
         return render_template('cancel_booking.html', booking=booking)
     
     @app.route('/booking/<int:booking_id>/details')
+    @use_replica
     @login_required
     def booking_details(booking_id):
-        """Получение деталей бронирования в JSON формате"""
-        booking = Booking.query.get_or_404(booking_id)
+        """Получение деталей бронирования в JSON формате (в том числе архивного)"""
+        booking = find_booking(booking_id)
+        if booking is None:
+            abort(404)
         
         # Проверяем права доступа
         if booking.user_id != current_user.id and not current_user.is_admin():
@@ -2459,6 +2987,7 @@ def create_app():
         return jsonify(booking_data)
     
     @app.route('/booking/<int:booking_id>/cancel', methods=['POST'])
+    @use_primary
     @login_required
     def process_cancellation(booking_id):
         """Обработка отмены бронирования"""
@@ -2510,180 +3039,19 @@ def create_app():
             if User.query.count() > 0:
                 return jsonify({'message': 'Data already exists!', 'status': 'exists'})
             
-            # Add test users
-            admin = User(
-                username='admin',
-                email='admin@example.com',
-                first_name='Админ',
-                last_name='Системы',
-                role='admin'
-            )
-            admin.set_password('admin123')
-            db.session.add(admin)
-            
-            # Add airports
-            airports_data = [
-                {'code': 'SVO', 'name': 'Шереметьево', 'city': 'Москва', 'country': 'Россия'},
-                {'code': 'LED', 'name': 'Пулково', 'city': 'Санкт-Петербург', 'country': 'Россия'},
-                {'code': 'DME', 'name': 'Домодедово', 'city': 'Москва', 'country': 'Россия'},
-                {'code': 'ROV', 'name': 'Платов', 'city': 'Ростов-на-Дону', 'country': 'Россия'},
-                {'code': 'KRR', 'name': 'Пашковский', 'city': 'Краснодар', 'country': 'Россия'}
-            ]
-            
-            airports = []
-            for airport_data in airports_data:
-                airport = Airport(**airport_data)
-                airports.append(airport)
-                db.session.add(airport)
-            
-            # Add airlines
-            airlines_data = [
-                {'code': 'SU', 'name': 'Аэрофлот', 'country': 'Россия'},
-                {'code': 'FV', 'name': 'Россия', 'country': 'Россия'},
-                {'code': 'U6', 'name': 'Уральские авиалинии', 'country': 'Россия'}
-            ]
-            
-            airlines = []
-            for airline_data in airlines_data:
-                airline = Airline(**airline_data)
-                airlines.append(airline)
-                db.session.add(airline)
-            
-            db.session.commit()
-            
-            # Add manager
-            manager = User(
-                username='manager',
-                email='manager@airline.com',
-                first_name='Менеджер',
-                last_name='Авиакомпании',
-                role='manager',
-                company_id=airlines[0].id  # Аэрофлот
-            )
-            manager.set_password('manager123')
-            db.session.add(manager)
-            
-            # Add regular user
-            user = User(
-                username='user',
-                email='user@example.com',
-                first_name='Иван',
-                last_name='Петров',
-                role='user'
-            )
-            user.set_password('user123')
-            db.session.add(user)
-            
-            db.session.commit()
-            
-            # Add flights
-            from datetime import datetime, timedelta
-            base_time = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-            
-            flights_data = [
-                {
-                    'flight_number': 'SU100',
-                    'departure_airport_id': airports[0].id,
-                    'arrival_airport_id': airports[1].id,
-                    'airline_id': airlines[0].id,
-                    'departure_time': base_time + timedelta(hours=8),
-                    'arrival_time': base_time + timedelta(hours=10),
-                    'aircraft_type': 'Boeing 737',
-                    'total_seats': 180,
-                    'available_seats': 150,
-                    'economy_price': 8500,
-                    'business_price': 15000,
-                    'status': 'scheduled'
-                },
-                {
-                    'flight_number': 'SU200',
-                    'departure_airport_id': airports[0].id,
-                    'arrival_airport_id': airports[3].id,
-                    'airline_id': airlines[0].id,
-                    'departure_time': base_time + timedelta(hours=12),
-                    'arrival_time': base_time + timedelta(hours=15, minutes=30),
-                    'aircraft_type': 'Airbus A320',
-                    'total_seats': 180,
-                    'available_seats': 120,
-                    'economy_price': 12000,
-                    'business_price': 20000,
-                    'status': 'scheduled'
-                }
-            ]
-            
-            flights = []
-            for flight_data in flights_data:
-                flight = Flight(**flight_data)
-                flights.append(flight)
-                db.session.add(flight)
-            
-            db.session.commit()
-            
-            # Add bookings
-            bookings_data = [
-                {
-                    'booking_reference': 'ABC123',
-                    'user_id': user.id,
-                    'flight_id': flights[0].id,
-                    'passenger_first_name': 'Иван',
-                    'passenger_last_name': 'Петров',
-                    'passenger_email': 'ivan.petrov@example.com',
-                    'passenger_phone': '+7-900-123-45-67',
-                    'seat_class': 'economy',
-                    'seat_number': '12A',
-                    'price_paid': 8500,
-                    'status': 'confirmed',
-                    'booking_date': base_time - timedelta(hours=2),
-                    'baggage_count': 1
-                },
-                {
-                    'booking_reference': 'DEF456',
-                    'user_id': user.id,
-                    'flight_id': flights[1].id,
-                    'passenger_first_name': 'Мария',
-                    'passenger_last_name': 'Сидорова',
-                    'passenger_email': 'maria.sidorova@example.com',
-                    'passenger_phone': '+7-900-234-56-78',
-                    'seat_class': 'business',
-                    'seat_number': '3B',
-                    'price_paid': 20000,
-                    'status': 'confirmed',
-                    'booking_date': base_time - timedelta(hours=5),
-                    'baggage_count': 2
-                }
-            ]
-            
-            for booking_data in bookings_data:
-                booking = Booking(**booking_data)
-                db.session.add(booking)
-            
-            # Add test banner
-            test_banner = Banner(
-                title='Специальное предложение!',
-                description='Скидка 20% на все рейсы до конца месяца. Бронируйте прямо сейчас!',
-                image_url='https://via.placeholder.com/300x100/007bff/ffffff?text=Скидка+20%',
-                link_url='https://example.com/promo',
-                position='main',
-                is_active=True,
-                start_date=None,  # Баннер активен сразу
-                end_date=None,    # Без ограничения по времени
-                views_count=0,
-                clicks_count=0,
-                created_by=admin.id
-            )
-            db.session.add(test_banner)
-            
-            db.session.commit()
+            counts = generate_sample_data()
             
             return jsonify({
                 'message': 'Test data added successfully!',
                 'status': 'success',
                 'data': {
-                    'users': User.query.count(),
-                    'airports': Airport.query.count(),
-                    'airlines': Airline.query.count(),
-                    'flights': Flight.query.count(),
-                    'bookings': Booking.query.count()
+                    'users': counts.get('user', 0),
+                    'airports': counts.get('airport', 0),
+                    'airlines': counts.get('airline', 0),
+                    'flights': counts.get('flight', 0),
+                    'bookings': counts.get('booking', 0),
+                    'payments': counts.get('payment', 0),
+                    'seconds': counts['seconds']
                 },
                 'accounts': {
                     'admin': 'admin / admin123',
@@ -0,0 +1,106 @@
+"""
+Архивирование вылетевших рейсов (горячие и холодные данные).
+
+Рейсы, вылетевшие больше ARCHIVE_AFTER_DAYS дней назад, переносятся вместе
+с бронированиями и платежами в таблицы flight_archive / booking_archive /
+payment_archive пакетами по ARCHIVE_BATCH_SIZE рейсов; каждый пакет - отдельная
+короткая транзакция (INSERT ... SELECT и DELETE по списку id). Действующие
+таблицы и их индексы остаются небольшими.
+
+    python manage.py archive                # по настройкам приложения
+    python manage.py archive --days 365 --batch-size 500
+
+Чтение истории прозрачно: профиль, детали бронирования и статистика
+объединяют действующие и архивные строки (find_booking, stats.py).
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, insert, literal, select
+
+from cache import bump_version
+from models import (db, Flight, Booking, Payment, ArchivedBooking,
+                    flight_archive, booking_archive, payment_archive)
+from stats import STATISTICS_NAMESPACE, flight_namespace
+
+
+def _copy(target, source, condition, archived_at):
+    """INSERT INTO target (колонки) SELECT колонки, archived_at FROM source WHERE condition"""
+    columns = [column.name for column in source.columns]
+    rows = select(*source.columns, literal(archived_at, target.c.archived_at.type)).where(condition)
+    return insert(target).from_select(columns + ['archived_at'], rows)
+
+
+def _max_id(model):
+    return db.session.execute(select(func.max(model.id))).scalar()
+
+
+def archive_batch(cutoff, batch_size):
+    """
+    Переносит в архив до batch_size рейсов, вылетевших раньше cutoff.
+    Возвращает (рейсов, бронирований, платежей).
+    """
+    # Строки с максимальным id не переносятся: SQLite выдает новым строкам MAX(id) + 1
+    # и иначе мог бы повторно выдать id, уже занятый в архиве
+    max_flight_id = _max_id(Flight)
+    max_booking_id = _max_id(Booking)
+    max_payment_id = _max_id(Payment)
+
+    query = select(Flight.id).where(Flight.departure_time < cutoff, Flight.id != max_flight_id)
+    if max_booking_id is not None:
+        newest_booking_flight = select(Booking.flight_id).where(Booking.id == max_booking_id).scalar_subquery()
+        query = query.where(Flight.id != func.coalesce(newest_booking_flight, 0))
+    if max_payment_id is not None:
+        newest_payment_flight = select(Booking.flight_id).join(Payment, Payment.booking_id == Booking.id)\
+            .where(Payment.id == max_payment_id).scalar_subquery()
+        query = query.where(Flight.id != func.coalesce(newest_payment_flight, 0))
+    flight_ids = db.session.execute(query.order_by(Flight.id).limit(batch_size)).scalars().all()
+    if not flight_ids:
+        return 0, 0, 0
+
+    archived_at = datetime.utcnow()
+    flights_condition = Flight.id.in_(flight_ids)
+    bookings_condition = Booking.flight_id.in_(flight_ids)
+    payments_condition = Payment.booking_id.in_(select(Booking.id).where(bookings_condition))
+
+    db.session.execute(_copy(flight_archive, Flight.__table__, flights_condition, archived_at))
+    bookings = db.session.execute(_copy(booking_archive, Booking.__table__, bookings_condition, archived_at)).rowcount
+    payments = db.session.execute(_copy(payment_archive, Payment.__table__, payments_condition, archived_at)).rowcount
+
+    # Удаление в порядке зависимостей: платежи, бронирования, рейсы
+    options = {'synchronize_session': False}
+    db.session.execute(delete(Payment).where(payments_condition), execution_options=options)
+    db.session.execute(delete(Booking).where(bookings_condition), execution_options=options)
+    db.session.execute(delete(Flight).where(flights_condition), execution_options=options)
+    db.session.commit()
+
+    # Core-запросы не проходят через события сессии: кэши сбрасываются явно
+    bump_version(STATISTICS_NAMESPACE, *(flight_namespace(flight_id) for flight_id in flight_ids))
+    return len(flight_ids), bookings, payments
+
+
+def archive_departed(days, batch_size=1000, now=None, progress=None):
+    """Переносит в архив все рейсы, вылетевшие больше days дней назад; возвращает итоговые счетчики"""
+    cutoff = (now or datetime.utcnow()) - timedelta(days=days)
+    totals = [0, 0, 0]
+    while True:
+        try:
+            counts = archive_batch(cutoff, batch_size)
+        except Exception:
+            db.session.rollback()
+            raise
+        if not counts[0]:
+            break
+        totals = [total + count for total, count in zip(totals, counts)]
+        if progress:
+            progress(*totals)
+        if counts[0] < batch_size:
+            break
+    return tuple(totals)
+
+
+# ЧТЕНИЕ
+
+def find_booking(booking_id):
+    """Бронирование по id из действующей таблицы или архива (None, если нет нигде)"""
+    return db.session.get(Booking, booking_id) or db.session.get(ArchivedBooking, booking_id)
+
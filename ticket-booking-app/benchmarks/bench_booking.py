@@ -0,0 +1,202 @@
+"""
+Бенчмарк пропускной способности бронирования для профилей подключения к БД.
+
+Несколько потоков одновременно выполняют транзакцию, повторяющую book_flight:
+чтение рейса, уменьшение available_seats, вставка бронирования и платежа,
+увеличение счетчика просмотров баннера. Сравниваются:
+    sqlite-legacy  - SQLite без PRAGMA (журнал DELETE, synchronous=FULL)
+    sqlite-wal     - профиль sqlite из dbconfig.py (WAL, busy_timeout, mmap...)
+    postgresql     - профиль postgresql (только при указании --postgres-url)
+
+Используются только локальные базы: SQLite во временном каталоге и,
+по желанию, локальный PostgreSQL (таблицы в нем пересоздаются!).
+
+Запуск из каталога ticket-booking-app:
+    python benchmarks/bench_booking.py --threads 8 --bookings 400
+    python benchmarks/bench_booking.py --postgres-url postgresql://localhost/airbook_bench
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from datagen import booking_reference
+from dbconfig import configure_database, init_engine_profile
+from models import db, User, Airport, Airline, Flight, Booking, Payment, Banner
+
+FLIGHTS = 50
+SEATS_PER_FLIGHT = 1000000
+
+# Общий для потоков счетчик номеров бронирований (коды - 6 символов, как в модели)
+_booking_numbers = itertools.count(1)
+_booking_numbers_lock = threading.Lock()
+
+
+def create_bench_app(uri, profile):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if profile == 'sqlite-legacy':
+        # Поведение до введения профилей: настройки драйвера по умолчанию
+        app.config['DB_PROFILE'] = 'legacy'
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {}
+    configure_database(app, environ={})
+    db.init_app(app)
+    with app.app_context():
+        init_engine_profile(app, db.engine)
+        db.drop_all()
+        db.create_all()
+        build_dataset()
+    return app
+
+
+def build_dataset():
+    """Минимальный набор данных: аэропорты, авиакомпания, пользователь, рейсы, баннер"""
+    now = datetime.utcnow()
+    db.session.execute(Airport.__table__.insert(), [
+        {'id': i, 'code': f'A{i:02d}', 'name': f'Airport {i}', 'city': f'City {i}', 'country': 'RU'}
+        for i in range(1, 11)
+    ])
+    db.session.execute(Airline.__table__.insert(), [
+        {'id': 1, 'code': 'BN', 'name': 'Bench Air', 'country': 'RU'},
+    ])
+    db.session.execute(User.__table__.insert(), [
+        {'id': 1, 'username': 'bench', 'email': 'bench@example.com', 'password_hash': '-',
+         'first_name': 'Ivan', 'last_name': 'Petrov', 'role': 'user'},
+    ])
+    db.session.execute(Flight.__table__.insert(), [
+        {
+            'id': i,
+            'flight_number': f'BN{i}',
+            'departure_airport_id': 1 + i % 10,
+            'arrival_airport_id': 1 + (i + 1) % 10,
+            'airline_id': 1,
+            'departure_time': now + timedelta(days=1 + i % 30),
+            'arrival_time': now + timedelta(days=1 + i % 30, hours=2),
+            'total_seats': SEATS_PER_FLIGHT,
+            'available_seats': SEATS_PER_FLIGHT,
+            'economy_price': 5000.0,
+            'status': 'scheduled',
+        }
+        for i in range(1, FLIGHTS + 1)
+    ])
+    db.session.execute(Banner.__table__.insert(), [
+        {'id': 1, 'title': 'Bench', 'image_url': '/static/bench.png', 'position': 'main', 'views_count': 0},
+    ])
+    db.session.commit()
+
+
+def next_booking_reference():
+    with _booking_numbers_lock:
+        return booking_reference(next(_booking_numbers))
+
+
+def book_once(rnd):
+    """Одна транзакция бронирования, как в book_flight"""
+    flight_id = rnd.randint(1, FLIGHTS)
+    price = db.session.execute(
+        select(Flight.economy_price).where(Flight.id == flight_id)
+    ).scalar_one()
+    result = db.session.execute(
+        update(Flight)
+        .where(Flight.id == flight_id, Flight.available_seats > 0)
+        .values(available_seats=Flight.available_seats - 1)
+    )
+    if result.rowcount != 1:
+        db.session.rollback()
+        return
+    booking = Booking(
+        booking_reference=next_booking_reference(),
+        user_id=1,
+        flight_id=flight_id,
+        passenger_first_name='Ivan',
+        passenger_last_name='Petrov',
+        seat_class='economy',
+        price_paid=price,
+        status='confirmed',
+    )
+    db.session.add(booking)
+    db.session.flush()
+    db.session.add(Payment(booking_id=booking.id, amount=price, payment_method='card', status='completed'))
+    db.session.execute(update(Banner).where(Banner.id == 1).values(views_count=Banner.views_count + 1))
+    db.session.commit()
+
+
+def worker(app, bookings, seed, latencies, errors):
+    rnd = random.Random(seed)
+    with app.app_context():
+        for _ in range(bookings):
+            started = time.perf_counter()
+            try:
+                book_once(rnd)
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                errors.append(str(getattr(e, 'orig', None) or e)[:60])
+                continue
+            latencies.append(time.perf_counter() - started)
+        db.session.remove()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_profile(label, app, threads, bookings):
+    latencies = []
+    errors = []
+    workers = [
+        threading.Thread(target=worker, args=(app, bookings, seed, latencies, errors))
+        for seed in range(threads)
+    ]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    if not latencies:
+        print(f'{label:<14} все транзакции завершились ошибкой: {errors[0] if errors else "-"}')
+        return
+    print(f'{label:<14} {len(latencies) / elapsed:9.1f} бр/с   '
+          f'p50 {percentile(latencies, 0.50) * 1000:7.1f} мс   '
+          f'p95 {percentile(latencies, 0.95) * 1000:7.1f} мс   '
+          f'p99 {percentile(latencies, 0.99) * 1000:7.1f} мс   '
+          f'ошибок {len(errors)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--bookings', type=int, default=400, help='Бронирований на поток')
+    parser.add_argument('--postgres-url', help='URL локальной базы PostgreSQL для сравнения')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_booking_')
+    profiles = [
+        ('sqlite-legacy', 'sqlite:///' + os.path.join(workdir, 'legacy.db')),
+        ('sqlite-wal', 'sqlite:///' + os.path.join(workdir, 'wal.db')),
+    ]
+    if args.postgres_url:
+        profiles.append(('postgresql', args.postgres_url))
+
+    print(f'Потоков: {args.threads}, бронирований на поток: {args.bookings}\n')
+    for label, uri in profiles:
+        app = create_bench_app(uri, label)
+        run_profile(label, app, args.threads, args.bookings)
+
+
+if __name__ == '__main__':
+    main()
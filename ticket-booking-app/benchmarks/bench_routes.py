@@ -0,0 +1,372 @@
+"""
+Сквозной бенчмарк горячих маршрутов приложения.
+
+Для каждого набора данных (DATASETS) создается база SQLite, заполняется
+генератором (datagen.py) и нагружается через тестовый клиент Flask:
+несколько потоков одновременно выполняют запросы к одному маршруту, у каждого
+потока свой клиент и своя сессия. Маршруты:
+    search_get          GET  /search
+    search_post         POST /search (маршруты и даты будущих рейсов)
+    cities              GET  /api/cities?q=...
+    book                GET  /book/<id> (будущие рейсы со свободными местами)
+    profile             GET  /profile (самые активные пользователи)
+    admin               GET  /admin
+    manager_statistics  GET  /manager/api/statistics?period=...
+
+Для каждого маршрута считаются p50/p95/p99, среднее и пропускная способность;
+результаты пишутся в JSON, а с --baseline печатается сравнение с прошлым запуском.
+Базы сохраняются в --workdir и используются повторно, пока совпадают набор, seed
+и дата. Статистика отдается из кэша приложения, как и в рабочем режиме.
+
+Запуск из каталога ticket-booking-app:
+    python benchmarks/bench_routes.py
+    python benchmarks/bench_routes.py --datasets small,medium,large --threads 8 --requests 400
+    python benchmarks/bench_routes.py --routes search_post,profile --output after.json --baseline before.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import aliased
+
+from datagen import DEMO_ACCOUNTS, PROFILES, generate_data
+from models import db, User, Airport, Flight, Booking
+import migrations
+
+DATASETS = {
+    'small': PROFILES['demo'],
+    'medium': dict(airports=500, airlines=50, users=5000, flights=30000, bookings=100000),
+    'large': PROFILES['medium'],
+}
+
+STATISTICS_PERIODS = ('today', 'week', 'month', 'all')
+
+# Пароль сгенерированных пользователей (см. datagen.py)
+GENERATED_PASSWORD = 'password'
+
+
+class Workload:
+    """Параметры запросов, выбранные по сгенерированной базе"""
+
+    def __init__(self, cities, searches, flight_ids, users):
+        self.cities = cities
+        self.searches = searches
+        self.flight_ids = flight_ids
+        self.users = users
+
+
+def search_get(rng, workload):
+    return 'GET', '/search', None
+
+
+def search_post(rng, workload):
+    departure, arrival, day = rng.choice(workload.searches)
+    return 'POST', '/search', {
+        'departure_city': departure,
+        'arrival_city': arrival,
+        'departure_date': day.strftime('%Y-%m-%dT00:00'),
+        'passengers': 1,
+        'seat_class': 'economy',
+    }
+
+
+def cities(rng, workload):
+    city = rng.choice(workload.cities)
+    return 'GET', f'/api/cities?q={city[:rng.randint(1, 3)].lower()}', None
+
+
+def book(rng, workload):
+    return 'GET', f'/book/{rng.choice(workload.flight_ids)}', None
+
+
+def profile(rng, workload):
+    return 'GET', '/profile', None
+
+
+def admin(rng, workload):
+    return 'GET', '/admin', None
+
+
+def manager_statistics(rng, workload):
+    return 'GET', f'/manager/api/statistics?period={rng.choice(STATISTICS_PERIODS)}', None
+
+
+# (название, роль клиента, построитель запроса); роль None - без входа
+ROUTES = (
+    ('search_get', None, search_get),
+    ('search_post', None, search_post),
+    ('cities', None, cities),
+    ('book', 'user', book),
+    ('profile', 'user', profile),
+    ('admin', 'admin', admin),
+    ('manager_statistics', 'manager', manager_statistics),
+)
+
+
+def prepare_database(path, options, seed, today):
+    """Создает и заполняет базу, если ее еще нет; возвращает (приложение, объемы таблиц)"""
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    fresh = not os.path.exists(path)
+
+    from app import create_app
+    app, _ = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    with app.app_context():
+        migrations.upgrade(db.engine)
+        if fresh:
+            counts = generate_data(seed=seed, base_date=today, **options)
+        else:
+            counts = {
+                'user': db.session.query(func.count(User.id)).scalar(),
+                'flight': db.session.query(func.count(Flight.id)).scalar(),
+                'booking': db.session.query(func.count(Booking.id)).scalar(),
+            }
+    return app, counts
+
+
+def build_workload(app, threads):
+    """Популярные города, маршруты и даты будущих рейсов и самые активные пользователи"""
+    departure_airport = aliased(Airport)
+    arrival_airport = aliased(Airport)
+    now = datetime.utcnow()
+    with app.app_context():
+        popular = db.session.execute(
+            select(Airport.city)
+            .join(Flight, Flight.departure_airport_id == Airport.id)
+            .group_by(Airport.city)
+            .order_by(func.count(Flight.id).desc())
+            .limit(20)
+        ).scalars().all()
+        flights = db.session.execute(
+            select(Flight.id, departure_airport.city, arrival_airport.city, Flight.departure_time)
+            .join(departure_airport, Flight.departure_airport_id == departure_airport.id)
+            .join(arrival_airport, Flight.arrival_airport_id == arrival_airport.id)
+            .where(Flight.departure_time > now + timedelta(hours=1), Flight.available_seats > 0)
+            .order_by(Flight.id)
+            .limit(5000)
+        ).all()
+        users = db.session.execute(
+            select(User.username)
+            .join(Booking, Booking.user_id == User.id)
+            .where(User.role == 'user')
+            .group_by(User.id, User.username)
+            .order_by(func.count(Booking.id).desc(), User.id)
+            .limit(threads)
+        ).scalars().all()
+    searches = [(departure, arrival, departure_time.date()) for _, departure, arrival, departure_time in flights]
+    return Workload(popular, searches, [flight[0] for flight in flights], users or ['user'])
+
+
+def login(client, username):
+    passwords = {account[0]: account[1] for account in DEMO_ACCOUNTS}
+    response = client.post('/login', data={
+        'username': username,
+        'password': passwords.get(username, GENERATED_PASSWORD),
+    })
+    if response.status_code != 302:
+        raise RuntimeError(f'Не удалось войти как {username}')
+
+
+def create_clients(app, role, workload, threads):
+    """Клиент на каждый поток; пользователи распределяются по самым активным"""
+    clients = []
+    for index in range(threads):
+        client = app.test_client()
+        if role == 'user':
+            login(client, workload.users[index % len(workload.users)])
+        elif role is not None:
+            login(client, role)
+        clients.append(client)
+    return clients
+
+
+def worker(client, build_request, workload, count, seed, deadline, samples):
+    rng = random.Random(seed)
+    for _ in range(count):
+        if time.perf_counter() > deadline:
+            break
+        started = time.perf_counter()
+        try:
+            method, url, data = build_request(rng, workload)
+            response = client.open(url, method=method, data=data)
+            status = response.status_code
+            response.close()
+        except Exception as e:
+            status = e.__class__.__name__
+        samples.append((time.perf_counter() - started, status))
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(samples, elapsed):
+    latencies = [latency for latency, _ in samples]
+    statuses = Counter(str(status) for _, status in samples)
+    errors = sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 500)
+    if not latencies:
+        return {'requests': 0, 'errors': errors, 'status_codes': dict(statuses)}
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'status_codes': dict(sorted(statuses.items())),
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(max(latencies) * 1000, 2),
+    }
+
+
+def run_route(app, route, workload, args):
+    name, role, build_request = route
+    clients = create_clients(app, role, workload, args.threads)
+
+    # Отладочный вывод приложения (print в маршрутах) не должен попадать в отчет
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        warmup_deadline = time.perf_counter() + args.max_seconds
+        for index, client in enumerate(clients):
+            worker(client, build_request, workload, args.warmup, -1 - index, warmup_deadline, [])
+
+        samples = []
+        per_thread = max(args.requests // args.threads, 1)
+        deadline = time.perf_counter() + args.max_seconds
+        workers = [
+            threading.Thread(target=worker, args=(client, build_request, workload, per_thread,
+                                                  args.seed * 1000 + index, deadline, samples))
+            for index, client in enumerate(clients)
+        ]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+    return summarize(samples, elapsed)
+
+
+def print_route(name, result):
+    if not result['requests']:
+        print(f'  {name:<20} нет ответов: {result["status_codes"]}')
+        return
+    print(f'  {name:<20} {result["throughput_rps"]:8.1f} зап/с   '
+          f'p50 {result["p50_ms"]:8.1f} мс   p95 {result["p95_ms"]:8.1f} мс   '
+          f'p99 {result["p99_ms"]:8.1f} мс   ошибок {result["errors"]}')
+
+
+def compare(results, baseline, threshold):
+    """Печатает изменение p95 и пропускной способности относительно baseline"""
+    previous = {dataset['name']: dataset['routes'] for dataset in baseline.get('datasets', [])}
+    print(f'\nСравнение с {baseline.get("started_at", "baseline")} (порог {threshold:.0%}):')
+    for dataset in results['datasets']:
+        for name, result in dataset['routes'].items():
+            before = previous.get(dataset['name'], {}).get(name)
+            if not before or not before.get('requests') or not result.get('requests'):
+                continue
+            p95 = result['p95_ms'] / before['p95_ms'] - 1 if before['p95_ms'] else 0
+            throughput = result['throughput_rps'] / before['throughput_rps'] - 1 if before['throughput_rps'] else 0
+            marker = '  РЕГРЕССИЯ' if p95 > threshold or throughput < -threshold else ''
+            print(f'  {dataset["name"]:<8} {name:<20} p95 {p95:+7.1%}   зап/с {throughput:+7.1%}{marker}')
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--datasets', default='small,medium', help=f'Наборы данных через запятую: {", ".join(DATASETS)}')
+    parser.add_argument('--routes', help='Маршруты через запятую (по умолчанию все)')
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=200, help='Запросов к маршруту на все потоки')
+    parser.add_argument('--warmup', type=int, default=3, help='Запросов прогрева на поток')
+    parser.add_argument('--max-seconds', type=float, default=60, help='Предел времени на прогрев и на замер маршрута')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--workdir', help='Каталог баз (по умолчанию временный)')
+    parser.add_argument('--output', default='bench_routes.json', help='Файл результатов JSON')
+    parser.add_argument('--baseline', help='JSON прошлого запуска для сравнения')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Порог регрессии при сравнении')
+    args = parser.parse_args()
+
+    datasets = args.datasets.split(',')
+    routes = ROUTES
+    if args.routes:
+        selected = args.routes.split(',')
+        routes = [route for route in ROUTES if route[0] in selected]
+    unknown = [name for name in datasets if name not in DATASETS]
+    if unknown or not routes:
+        parser.error(f'неизвестные наборы данных или маршруты: {", ".join(unknown) or args.routes}')
+    if args.threads <= 0 or args.requests <= 0:
+        parser.error('число потоков и запросов должно быть положительным')
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='bench_routes_')
+    os.makedirs(workdir, exist_ok=True)
+    today = date.today()
+    results = {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': environment(),
+        'settings': {'threads': args.threads, 'requests': args.requests, 'warmup': args.warmup,
+                     'max_seconds': args.max_seconds, 'seed': args.seed, 'base_date': today.isoformat()},
+        'datasets': [],
+    }
+
+    print(f'Потоков: {args.threads}, запросов к маршруту: {args.requests}, базы: {workdir}')
+    for name in datasets:
+        path = os.path.join(workdir, f'{name}-seed{args.seed}-{today.isoformat()}.db')
+        started = time.perf_counter()
+        app, counts = prepare_database(path, DATASETS[name], args.seed, today)
+        workload = build_workload(app, args.threads)
+        print(f'\n{name}: {", ".join(f"{table} {count}" for table, count in counts.items() if table != "seconds")} '
+              f'({time.perf_counter() - started:.1f} с)')
+
+        dataset = {'name': name, 'rows': counts, 'routes': {}}
+        for route in routes:
+            result = run_route(app, route, workload, args)
+            dataset['routes'][route[0]] = result
+            print_route(route[0], result)
+        results['datasets'].append(dataset)
+
+        with app.app_context():
+            db.engine.dispose()
+
+    with open(args.output, 'w', encoding='utf-8') as output:
+        json.dump(results, output, ensure_ascii=False, indent=2)
+    print(f'\nРезультаты: {args.output}')
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as baseline:
+            compare(results, json.load(baseline), args.threshold)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Бенчмарк статистики панели менеджера.
+
+Сравнивает старый подход (загрузка бронирований в Python + IN-список)
+с агрегирующим запросом из stats.py на синтетической базе и замеряет
+временной ряд analytics.booking_timeseries за год по всем авиакомпаниям.
+
+Запуск из каталога ticket-booking-app:
+    python benchmarks/bench_statistics.py --bookings 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from models import db, Airport, Airline, Flight, Booking
+from analytics import booking_timeseries
+from stats import booking_statistics, flight_statistics, resolve_period
+
+
+def build_dataset(airlines, flights, bookings, seed=42):
+    """Заполняет базу синтетическими данными пакетными вставками"""
+    rnd = random.Random(seed)
+    now = datetime.utcnow()
+
+    db.session.execute(Airport.__table__.insert(), [
+        {'id': i, 'code': f'A{i:02d}', 'name': f'Airport {i}', 'city': f'City {i}', 'country': 'RU'}
+        for i in range(1, 51)
+    ])
+    db.session.execute(Airline.__table__.insert(), [
+        {'id': i, 'code': f'L{i:02d}', 'name': f'Airline {i}', 'country': 'RU'}
+        for i in range(1, airlines + 1)
+    ])
+
+    flight_rows = []
+    for i in range(1, flights + 1):
+        departure = now + timedelta(hours=rnd.randint(-24 * 365, 24 * 90))
+        flight_rows.append({
+            'id': i,
+            'flight_number': f'XX{i}',
+            'departure_airport_id': rnd.randint(1, 50),
+            'arrival_airport_id': rnd.randint(1, 50),
+            'airline_id': rnd.randint(1, airlines),
+            'departure_time': departure,
+            'arrival_time': departure + timedelta(hours=2),
+            'total_seats': 180,
+            'available_seats': 180,
+            'economy_price': 5000.0,
+            'status': 'scheduled',
+        })
+    db.session.execute(Flight.__table__.insert(), flight_rows)
+
+    statuses = ['confirmed'] * 8 + ['cancelled', 'refunded']
+    batch = []
+    for i in range(1, bookings + 1):
+        batch.append({
+            'id': i,
+            'booking_reference': f'{i:06X}',
+            'user_id': 1,
+            'flight_id': rnd.randint(1, flights),
+            'passenger_first_name': 'Ivan',
+            'passenger_last_name': 'Petrov',
+            'seat_class': 'economy',
+            'price_paid': float(rnd.randint(3000, 30000)),
+            'status': rnd.choice(statuses),
+            'booking_date': now - timedelta(minutes=rnd.randint(0, 60 * 24 * 365)),
+        })
+        if len(batch) >= 50000:
+            db.session.execute(Booking.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(Booking.__table__.insert(), batch)
+
+    db.session.commit()
+
+
+def legacy_statistics(company_id, start_date, end_date):
+    """Старая реализация из manager_statistics_api"""
+    filtered = Booking.query.join(Flight).filter(Flight.airline_id == company_id)
+    if start_date and end_date:
+        filtered = filtered.filter(Booking.booking_date >= start_date, Booking.booking_date <= end_date)
+
+    total = filtered.count()
+    revenue = db.session.query(db.func.sum(Booking.price_paid)).filter(
+        Booking.id.in_([b.id for b in filtered])
+    ).scalar() or 0
+    confirmed = filtered.filter_by(status='confirmed').count()
+    cancelled = filtered.filter_by(status='cancelled').count()
+    refunded = filtered.filter_by(status='refunded').count()
+    return total, revenue, confirmed, cancelled, refunded
+
+
+def measure(label, func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        try:
+            func()
+        except Exception as e:
+            print(f'{label:<12} ошибка: {e.__class__.__name__}: {str(e)[:80]}')
+            return
+        timings.append(time.perf_counter() - started)
+    print(f'{label:<12} мин {min(timings) * 1000:9.1f} мс   среднее {sum(timings) / len(timings) * 1000:9.1f} мс')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bookings', type=int, default=1000000)
+    parser.add_argument('--flights', type=int, default=20000)
+    parser.add_argument('--airlines', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--skip-legacy', action='store_true', help='Не запускать старую реализацию')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_stats_')
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        build_dataset(args.airlines, args.flights, args.bookings)
+        print(f'Данные: {args.bookings} бронирований, {args.flights} рейсов '
+              f'({time.perf_counter() - started:.1f} с)')
+
+        company_id = 1
+        for period in ('month', 'all'):
+            start_date, end_date = resolve_period(period)
+            print(f'\nПериод: {period}')
+            measure('aggregate', lambda: (
+                flight_statistics(company_id),
+                booking_statistics(company_id, start_date, end_date),
+            ), args.repeat)
+            if not args.skip_legacy:
+                measure('legacy', lambda: legacy_statistics(company_id, start_date, end_date), 1)
+                db.session.rollback()
+
+        # Все бронирования набора (за год) одним запросом
+        end_date = datetime.utcnow()
+        start_date = end_date - timedelta(days=366)
+        print(f'\nВременной ряд за год, {args.bookings} бронирований')
+        for group_by in ('airline', 'route'):
+            measure(group_by, lambda: booking_timeseries(None, start_date, end_date, 'day', group_by), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, request
+from sqlalchemy import Column, Integer, MetaData, Table, event, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from dbrouting import replica_cache_ttl
+from models import db
+
+# Счетчики версий данных: при изменении данных версия увеличивается,
+# и все закэшированные под старой версией значения становятся неактуальными
+_versions = {}
+_versions_lock = threading.Lock()
+
+# Счетчики _versions живут в памяти процесса. Чтобы изменения из других процессов
+# (workers, команды manage.py) доходили до кэшей, у групп пространств имен
+# (первый элемент кортежа или сама строка: 'user', 'reference', ...) есть общая
+# версия в БД. bump_version увеличивает ее, а sync_shared_versions периодически
+# сверяет строки и увеличивает локальную версию измененных другими групп.
+# Таблица создана миграцией 8 для кэша пользователей, отсюда ее имя
+_shared_metadata = MetaData()
+shared_versions = Table(
+    'principal_version', _shared_metadata,
+    Column('id', Integer, primary_key=True),
+    Column('version', Integer, nullable=False),
+)
+
+# Группа пространств имен -> строка shared_versions (строки создаются миграциями)
+SHARED_VERSION_ROWS = {
+    'user': 1,
+    'reference': 2,
+    'statistics': 3,
+    'flight': 4,
+}
+
+_shared_epochs = {}
+_shared_seen = None
+_synced_at = None
+_sync_lock = threading.Lock()
+
+
+def _group(namespace):
+    return namespace[0] if isinstance(namespace, tuple) else namespace
+
+
+def get_version(namespace):
+    """Возвращает текущую версию пространства имен"""
+    return _versions.get(namespace, 0) + _shared_epochs.get(_group(namespace), 0)
+
+
+def bump_version(*namespaces):
+    """Увеличивает версию указанных пространств имен и общую версию их групп"""
+    with _versions_lock:
+        for namespace in namespaces:
+            _versions[namespace] = _versions.get(namespace, 0) + 1
+
+    rows = {SHARED_VERSION_ROWS.get(_group(namespace)) for namespace in namespaces} - {None}
+    if not rows:
+        return
+    # Отдельная короткая транзакция после фиксации данных: строка версии
+    # не остается заблокированной на время транзакции изменения
+    try:
+        with db.engine.begin() as connection:
+            connection.execute(
+                update(shared_versions).where(shared_versions.c.id.in_(sorted(rows)))
+                .values(version=shared_versions.c.version + 1)
+            )
+    except SQLAlchemyError as e:
+        print(f"Не удалось увеличить общую версию кэшей: {e}")
+
+
+def sync_shared_versions(interval=1.0):
+    """
+    Сверяет общие версии с БД не чаще раза в interval секунд. Группы,
+    измененные с прошлой сверки, получают новую локальную версию, и их
+    записи во всех кэшах процесса становятся неактуальными.
+    """
+    global _shared_seen, _synced_at
+    if _synced_at is not None and time.monotonic() - _synced_at < interval:
+        return
+    with _sync_lock:
+        if _synced_at is not None and time.monotonic() - _synced_at < interval:
+            return
+        _synced_at = time.monotonic()
+        try:
+            with db.engine.connect() as connection:
+                current = dict(connection.execute(select(shared_versions.c.id, shared_versions.c.version)).all())
+        except SQLAlchemyError as e:
+            current_app.logger.warning(f"Не удалось прочитать общие версии кэшей: {e}")
+            return
+        previous, _shared_seen = _shared_seen, current
+
+    # При первой сверке кэши процесса еще пусты
+    if previous is None:
+        return
+    with _versions_lock:
+        for group, row in SHARED_VERSION_ROWS.items():
+            if current.get(row) != previous.get(row):
+                _shared_epochs[group] = _shared_epochs.get(group, 0) + 1
+
+
+# Правила инвалидации: (классы моделей, функция obj -> пространства имен)
+_invalidation_rules = []
+
+
+def invalidate_on_change(models, namespaces, on_create=True):
+    """
+    Регистрирует правило: при фиксации транзакции, в которой создавались,
+    изменялись или удалялись объекты models, увеличиваются версии
+    пространств имен, возвращаемых namespaces(obj).
+    on_create=False - создание объекта версии не меняет (новых объектов еще нет в кэшах).
+    """
+    _invalidation_rules.append((tuple(models), namespaces, on_create))
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_changed_namespaces(session, flush_context, instances):
+    changed = session.info.setdefault('cache_namespaces', set())
+    modified = [obj for obj in session.dirty if session.is_modified(obj)] + list(session.deleted)
+    for objects, created in ((session.new, True), (modified, False)):
+        for obj in objects:
+            for models, namespaces, on_create in _invalidation_rules:
+                if isinstance(obj, models) and (on_create or not created):
+                    changed.update(namespaces(obj))
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_changed_namespaces(session):
+    changed = session.info.pop('cache_namespaces', None)
+    if changed:
+        bump_version(*changed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed_namespaces(session):
+    session.info.pop('cache_namespaces', None)
+
+
+class VersionedTTLCache:
+    """
+    Ограниченный по размеру потокобезопасный кэш в памяти процесса.
+    Запись считается актуальной, пока не истек TTL и не изменилась версия.
+    """
+
+    def __init__(self, ttl=30, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version=0):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+
+            stored_version, expires_at, value = entry
+            if stored_version != version or (expires_at is not None and expires_at < time.monotonic()):
+                del self._data[key]
+                return None
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, version=0, ttl=None):
+        """ttl - срок жизни этой записи, если он короче срока жизни кэша"""
+        if self.ttl and (ttl is None or ttl > self.ttl):
+            ttl = self.ttl
+        with self._lock:
+            expires_at = time.monotonic() + ttl if ttl else None
+            self._data[key] = (version, expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class CachedJSON:
+    """Сериализованный JSON-ответ вместе с его ETag"""
+
+    __slots__ = ('body', 'etag')
+
+    def __init__(self, data):
+        self.body = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+        self.etag = hashlib.md5(self.body.encode('utf-8')).hexdigest()
+
+
+def cached_json_response(cache, key, version, builder):
+    """
+    Отдает JSON из кэша с поддержкой ETag / 304 Not Modified.
+    builder вызывается только при промахе кэша.
+    """
+    entry = cache.get(key, version)
+    if entry is None:
+        entry = CachedJSON(builder())
+        # Ответ по данным реплики мог не увидеть последнее изменение версии,
+        # поэтому он живет не дольше допустимого отставания реплики
+        cache.set(key, entry, version, ttl=replica_cache_ttl())
+
+    if entry.etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(entry.body, mimetype='application/json')
+
+    response.set_etag(entry.etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
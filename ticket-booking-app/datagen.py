@@ -0,0 +1,548 @@
+"""
+Генератор синтетических данных для разработки и нагрузочного тестирования.
+
+Генерация детерминирована: одинаковые seed, параметры и базовая дата дают
+одинаковую базу. Популярность неравномерна (распределение Ципфа):
+крупные аэропорты и авиакомпании встречаются в маршрутах чаще, а часть
+рейсов собирает большую долю бронирований (не больше числа мест).
+
+Строки пишутся через Core executemany (в SQLite - напрямую через драйвер
+с отключенным на время загрузки synchronous) крупными транзакциями по
+COMMIT_ROWS строк; ORM-объекты не создаются.
+
+    python manage.py generate-data                        # профиль demo
+    python manage.py generate-data --profile large        # около 10 млн строк
+    python manage.py generate-data --flights 500000 --bookings 2000000 --seed 7
+
+Учетные записи admin/admin123, manager/manager123 (авиакомпания 1)
+и user/user123 создаются, если их еще нет; у сгенерированных
+пользователей пароль password.
+"""
+import array
+import itertools
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+from werkzeug.security import generate_password_hash
+
+from cache import bump_version
+from models import db, User, Airport, Airline, Flight, Booking, Payment
+from refdata import REFERENCE_NAMESPACE
+from stats import STATISTICS_NAMESPACE
+
+# Объемы по профилям; large - около 10 млн строк вместе с платежами
+PROFILES = {
+    'demo': dict(airports=40, airlines=8, users=200, flights=3000, bookings=6000),
+    'medium': dict(airports=1000, airlines=100, users=20000, flights=200000, bookings=800000),
+    'large': dict(airports=5000, airlines=500, users=200000, flights=2000000, bookings=4000000),
+}
+
+# Строк в одном executemany и в одной транзакции
+BATCH_SIZE = 10000
+COMMIT_ROWS = 500000
+
+DEMO_ACCOUNTS = (
+    # (логин, пароль, роль, имя, фамилия, email)
+    ('admin', 'admin123', 'admin', 'Админ', 'Системы', 'admin@example.com'),
+    ('manager', 'manager123', 'manager', 'Менеджер', 'Авиакомпании', 'manager@airline.com'),
+    ('user', 'user123', 'user', 'Иван', 'Петров', 'user@example.com'),
+)
+
+# Реальные аэропорты и авиакомпании идут первыми и получают наибольшую популярность
+REAL_AIRPORTS = (
+    ('SVO', 'Шереметьево', 'Москва'), ('DME', 'Домодедово', 'Москва'), ('LED', 'Пулково', 'Санкт-Петербург'),
+    ('VKO', 'Внуково', 'Москва'), ('AER', 'Сочи', 'Сочи'), ('KZN', 'Казань', 'Казань'),
+    ('SVX', 'Кольцово', 'Екатеринбург'), ('OVB', 'Толмачево', 'Новосибирск'), ('KRR', 'Пашковский', 'Краснодар'),
+    ('ROV', 'Платов', 'Ростов-на-Дону'), ('UFA', 'Уфа', 'Уфа'), ('KUF', 'Курумоч', 'Самара'),
+    ('KGD', 'Храброво', 'Калининград'), ('MRV', 'Минеральные Воды', 'Минеральные Воды'),
+    ('KJA', 'Емельяново', 'Красноярск'), ('IKT', 'Иркутск', 'Иркутск'), ('VVO', 'Кневичи', 'Владивосток'),
+    ('CEK', 'Баландино', 'Челябинск'), ('PEE', 'Большое Савино', 'Пермь'), ('TJM', 'Рощино', 'Тюмень'),
+)
+REAL_AIRLINES = (
+    ('SU', 'Аэрофлот'), ('S7', 'S7 Airlines'), ('FV', 'Россия'), ('U6', 'Уральские авиалинии'),
+    ('DP', 'Победа'), ('UT', 'ЮТэйр'), ('N4', 'Северный ветер'), ('5N', 'Смартавиа'),
+)
+COUNTRIES = ('Россия', 'Казахстан', 'Армения', 'Грузия', 'Узбекистан', 'Турция', 'ОАЭ', 'Египет',
+             'Таиланд', 'Китай', 'Индия', 'Сербия', 'Вьетнам', 'Израиль', 'Кипр')
+SYLLABLES = ('ар', 'бел', 'вор', 'гор', 'дан', 'ель', 'зар', 'кам', 'лес', 'мир', 'нов', 'ор',
+             'пол', 'рад', 'сар', 'тор', 'ум', 'хол', 'чер', 'ян', 'ос', 'ви', 'ла', 'ка')
+CITY_SUFFIXES = ('ск', 'ов', 'град', 'инск', 'ево', 'ань', 'поль', '')
+
+# (тип самолета, мест, вес, есть бизнес-класс, есть первый класс)
+AIRCRAFT = (
+    ('Airbus A320', 180, 30, True, False),
+    ('Boeing 737-800', 189, 25, True, False),
+    ('Airbus A321', 220, 15, True, False),
+    ('Sukhoi Superjet 100', 98, 15, True, False),
+    ('Embraer 190', 100, 5, True, False),
+    ('Airbus A330-300', 296, 5, True, True),
+    ('Boeing 777-300ER', 402, 5, True, True),
+)
+
+FIRST_NAMES = ('Иван', 'Мария', 'Алексей', 'Анна', 'Дмитрий', 'Елена', 'Сергей', 'Ольга', 'Андрей',
+               'Наталья', 'Михаил', 'Татьяна', 'Николай', 'Ирина', 'Павел', 'Светлана')
+LAST_NAMES = ('Иванов', 'Петров', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов', 'Лебедев', 'Козлов',
+              'Новиков', 'Морозов', 'Волков', 'Соловьев', 'Васильев', 'Зайцев', 'Павлов', 'Семенов')
+PAYMENT_METHODS = ('card', 'card', 'card', 'paypal', 'bank_transfer')
+
+# Статусы бронирований при генерации
+CONFIRMED, CANCELLED, REFUNDED = 0, 1, 2
+
+
+class DataGenerationError(Exception):
+    """База не подходит для генерации (уже содержит данные)"""
+
+
+def _zipf_weights(count, exponent):
+    """Накопленные веса распределения Ципфа для рангов 1..count (для random.choices)"""
+    return list(itertools.accumulate(1.0 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def _base36(number, width):
+    digits = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    result = []
+    for _ in range(width):
+        number, digit = divmod(number, 36)
+        result.append(digits[digit])
+    return ''.join(reversed(result))
+
+
+def booking_reference(index):
+    """Уникальный 6-символьный код для номера бронирования (биекция по модулю 36^6)"""
+    return _base36((index * 1679627 + 104729) % 36 ** 6, 6)
+
+
+@contextmanager
+def _unsynchronized(connection):
+    """
+    SQLite: на время загрузки отключает fsync при коммите (synchronous=OFF) -
+    загрузка восстановима повторным запуском. Прежнее значение возвращается,
+    чтобы соединение не ушло обратно в пул без гарантий сохранности.
+    """
+    if connection.dialect.name != 'sqlite':
+        yield
+        return
+    previous = connection.exec_driver_sql('PRAGMA synchronous').scalar()
+    connection.exec_driver_sql('PRAGMA synchronous=OFF')
+    connection.commit()
+    try:
+        yield
+    finally:
+        if connection.in_transaction():
+            connection.rollback()
+        connection.exec_driver_sql(f'PRAGMA synchronous={int(previous)}')
+        connection.commit()
+
+
+class BulkWriter:
+    """
+    Пакетная вставка кортежей в таблицу. В SQLite - executemany драйвера
+    с преобразованием значений типами колонок (как это делает Core),
+    в остальных СУБД - Core executemany.
+    """
+
+    def __init__(self, connection, table, columns):
+        self.connection = connection
+        self.columns = columns
+        dialect = connection.dialect
+        self.driver = dialect.name == 'sqlite'
+        if self.driver:
+            preparer = dialect.identifier_preparer
+            self.processors = [
+                (index, processor) for index, processor in enumerate(
+                    table.c[name].type.dialect_impl(dialect).bind_processor(dialect) for name in columns
+                ) if processor is not None
+            ]
+            self.sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+                preparer.format_table(table),
+                ', '.join(preparer.quote(name) for name in columns),
+                ', '.join('?' for _ in columns),
+            )
+        else:
+            self.statement = table.insert()
+
+    def write(self, rows):
+        if not rows:
+            return
+        if not self.driver:
+            self.connection.execute(self.statement, [dict(zip(self.columns, row)) for row in rows])
+            return
+        if self.processors:
+            converted = []
+            for row in rows:
+                row = list(row)
+                for index, processor in self.processors:
+                    row[index] = processor(row[index])
+                converted.append(tuple(row))
+            rows = converted
+        self.connection.exec_driver_sql(self.sql, rows)
+
+
+class DataGenerator:
+    """Генерация одной базы; параметры - объемы таблиц, seed и базовая дата"""
+
+    def __init__(self, seed=1, airports=40, airlines=8, users=200, flights=3000, bookings=6000,
+                 days_back=180, days_ahead=180, base_date=None, progress=None):
+        self.rng = random.Random(seed)
+        self.counts = {'airports': max(airports, 3), 'airlines': max(airlines, 1), 'users': users,
+                       'flights': flights, 'bookings': bookings}
+        self.days_back = days_back
+        self.days_ahead = days_ahead
+        base_date = base_date or datetime.utcnow().date()
+        self.now = datetime.combine(base_date, datetime.min.time())
+        self.start = self.now - timedelta(days=days_back)
+        self.progress = progress
+        self.written = {}
+
+    # ВСПОМОГАТЕЛЬНОЕ
+
+    def _write(self, engine, tables, batches, total):
+        """
+        Пишет пакеты строк в таблицы tables ([(таблица, колонки)]): batches выдает
+        по списку строк на каждую таблицу. Транзакция фиксируется каждые COMMIT_ROWS строк.
+        """
+        batches = iter(batches)
+        done = [0] * len(tables)
+        finished = False
+        with engine.connect() as connection:
+            with _unsynchronized(connection):
+                while not finished:
+                    with connection.begin():
+                        writers = [BulkWriter(connection, table, columns) for table, columns in tables]
+                        in_transaction = 0
+                        while in_transaction < COMMIT_ROWS:
+                            batch = next(batches, None)
+                            if batch is None:
+                                finished = True
+                                break
+                            for position, (writer, rows) in enumerate(zip(writers, batch)):
+                                writer.write(rows)
+                                done[position] += len(rows)
+                                self.written[tables[position][0].name] = done[position]
+                            in_transaction += len(batch[0])
+                            if self.progress:
+                                self.progress(tables[0][0].name, done[0], total)
+        return done[0]
+
+    def _write_rows(self, engine, table, columns, rows, total):
+        """Пишет строки итератора rows в одну таблицу пакетами по BATCH_SIZE"""
+        rows = iter(rows)
+        batches = iter(lambda: [list(itertools.islice(rows, BATCH_SIZE))], [[]])
+        return self._write(engine, [(table, columns)], batches, total)
+
+    @staticmethod
+    def _next_id(connection, model):
+        return (connection.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+    # СПРАВОЧНИКИ
+
+    def _city_name(self):
+        rng = self.rng
+        name = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))) + rng.choice(CITY_SUFFIXES)
+        return name.capitalize()
+
+    def airport_rows(self):
+        """(id, code, name, city, country) аэропортов; коды - уникальные трехбуквенные"""
+        rng = self.rng
+        count = self.counts['airports']
+        used = {code for code, _, _ in REAL_AIRPORTS}
+        codes = [''.join(letters) for letters in itertools.product('ABCDEFGHIJKLMNOPQRSTUVWXYZ', repeat=3)
+                 if ''.join(letters) not in used]
+        rng.shuffle(codes)
+        cities = [self._city_name() for _ in range(max(count * 4 // 5, 1))]
+
+        rows = []
+        for index in range(count):
+            airport_id = index + 1
+            if index < len(REAL_AIRPORTS):
+                code, name, city = REAL_AIRPORTS[index]
+                country = 'Россия'
+            else:
+                code = codes[index - len(REAL_AIRPORTS)]
+                city = rng.choice(cities)
+                name = f'{city} {code}'
+                country = rng.choice(COUNTRIES)
+            rows.append((airport_id, code, name, city, country))
+        return rows
+
+    def airline_rows(self):
+        """(id, code, name, country) авиакомпаний; коды - уникальные двухсимвольные"""
+        rng = self.rng
+        count = self.counts['airlines']
+        used = {code for code, _ in REAL_AIRLINES}
+        alphabet = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+        codes = [first + second for first in alphabet[:26] for second in alphabet if first + second not in used]
+        rng.shuffle(codes)
+        if count > len(REAL_AIRLINES) + len(codes):
+            # Двухсимвольных кодов не хватает - добавляются трехбуквенные
+            codes += [''.join(letters) for letters in itertools.product(alphabet[:26], repeat=3)]
+
+        rows = []
+        for index in range(count):
+            if index < len(REAL_AIRLINES):
+                code, name = REAL_AIRLINES[index]
+                country = 'Россия'
+            else:
+                code = codes[index - len(REAL_AIRLINES)]
+                name = f'{self._city_name()} Air'
+                country = rng.choice(COUNTRIES)
+            rows.append((index + 1, code, name, country))
+        return rows
+
+    def user_rows(self, first_id):
+        rng = self.rng
+        password_hash = generate_password_hash('password')
+        for index in range(self.counts['users']):
+            user_id = first_id + index
+            created_at = self.now - timedelta(minutes=rng.randint(0, 2 * 365 * 24 * 60))
+            yield (user_id, f'user{user_id:07d}', f'user{user_id:07d}@example.com', password_hash, 'user',
+                   rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), None, None, created_at, True)
+
+    # РЕЙСЫ И БРОНИРОВАНИЯ
+
+    def plan_flights(self, cities):
+        """
+        Параметры рейсов в компактных массивах (без строк): аэропорты, авиакомпания,
+        вылет в минутах от начала периода, длительность, самолет. cities - город
+        аэропорта по индексу (id - 1): рейсы внутри одного города не создаются.
+        """
+        rng = self.rng
+        count = self.counts['flights']
+        airports = self.counts['airports']
+        airport_ids = range(1, airports + 1)
+        airport_weights = _zipf_weights(airports, 1.0)
+        airline_ids = range(1, self.counts['airlines'] + 1)
+        airline_weights = _zipf_weights(self.counts['airlines'], 1.0)
+        aircraft_indexes = range(len(AIRCRAFT))
+        aircraft_weights = list(itertools.accumulate(item[2] for item in AIRCRAFT))
+        period_minutes = (self.days_back + self.days_ahead) * 24 * 60
+
+        plan = {
+            'departure_airport': array.array('l'), 'arrival_airport': array.array('l'),
+            'airline': array.array('l'), 'departure': array.array('l'),
+            'duration': array.array('l'), 'aircraft': array.array('b'),
+        }
+        for offset in range(0, count, BATCH_SIZE):
+            size = min(BATCH_SIZE, count - offset)
+            departures = rng.choices(airport_ids, cum_weights=airport_weights, k=size)
+            arrivals = rng.choices(airport_ids, cum_weights=airport_weights, k=size)
+            for departure, arrival in zip(departures, arrivals):
+                for _ in range(airports):
+                    if cities[arrival - 1] != cities[departure - 1]:
+                        break
+                    arrival = arrival % airports + 1
+                plan['departure_airport'].append(departure)
+                plan['arrival_airport'].append(arrival)
+            plan['airline'].extend(rng.choices(airline_ids, cum_weights=airline_weights, k=size))
+            plan['aircraft'].extend(rng.choices(aircraft_indexes, cum_weights=aircraft_weights, k=size))
+            for _ in range(size):
+                plan['departure'].append(rng.randrange(0, period_minutes, 5))
+                plan['duration'].append(rng.randrange(50, 600, 5))
+        return plan
+
+    def plan_bookings(self, plan):
+        """
+        Рейс и статус каждого бронирования. Рейсы выбираются по Ципфу, заполненный
+        рейс заменяется случайным; отмененные бронирования места не занимают.
+        Возвращает (рейсы, статусы, занято мест по рейсам).
+        """
+        rng = self.rng
+        flights = self.counts['flights']
+        count = self.counts['bookings'] if flights else 0
+        seats = array.array('l', (AIRCRAFT[index][1] for index in plan['aircraft']))
+        occupied = array.array('l', bytes(8 * flights))
+        booking_flights = array.array('l')
+        statuses = array.array('b')
+
+        flight_indexes = range(flights)
+        flight_weights = _zipf_weights(flights, 0.7) if flights else []
+        for offset in range(0, count, BATCH_SIZE):
+            size = min(BATCH_SIZE, count - offset)
+            for flight in rng.choices(flight_indexes, cum_weights=flight_weights, k=size):
+                for _ in range(10):
+                    if occupied[flight] < seats[flight]:
+                        break
+                    flight = rng.randrange(flights)
+                roll = rng.random()
+                status = CANCELLED if roll < 0.06 else REFUNDED if roll < 0.08 else CONFIRMED
+                if status == CONFIRMED:
+                    occupied[flight] += 1
+                booking_flights.append(flight)
+                statuses.append(status)
+        return booking_flights, statuses, occupied
+
+    def _prices(self, duration, aircraft):
+        economy = round(1500 + duration * 45 * (0.8 + 0.4 * self.rng.random()), -1)
+        _, _, _, business, first = AIRCRAFT[aircraft]
+        return economy, round(economy * 2.8, -1) if business else None, round(economy * 5, -1) if first else None
+
+    def flight_rows(self, plan, occupied):
+        rng = self.rng
+        airline_codes = {row[0]: row[1] for row in self._airlines}
+        created_at = self.now
+        for index in range(len(plan['departure'])):
+            aircraft = plan['aircraft'][index]
+            departure = self.start + timedelta(minutes=plan['departure'][index])
+            duration = plan['duration'][index]
+            airline = plan['airline'][index]
+            economy, business, first = self._prices(duration, aircraft)
+            aircraft_type, seats = AIRCRAFT[aircraft][:2]
+
+            if departure < self.now:
+                status = 'departed'
+            else:
+                roll = rng.random()
+                status = 'cancelled' if roll < 0.01 else 'delayed' if roll < 0.04 else 'scheduled'
+            yield (index + 1, f'{airline_codes[airline]}{rng.randint(1, 9999)}',
+                   plan['departure_airport'][index], plan['arrival_airport'][index], airline,
+                   departure, departure + timedelta(minutes=duration), aircraft_type,
+                   seats, max(seats - occupied[index], 0), economy, business, first, status, created_at)
+            self._prices_by_class['economy'].append(economy)
+            self._prices_by_class['business'].append(business or economy)
+            self._prices_by_class['first'].append(first or business or economy)
+
+    def booking_batches(self, plan, booking_flights, statuses, user_ids, first_payment_id):
+        """Пакеты ([бронирования], [платежи]); id бронирований и рейсов начинаются с 1"""
+        rng = self.rng
+        # random() в горячем цикле заметно дешевле randint/choice
+        random_ = rng.random
+        user_weights = _zipf_weights(len(user_ids), 0.5)
+        seat_counters = array.array('l', bytes(8 * len(plan['departure'])))
+        letters = 'ABCDEF'
+
+        payment_id = first_payment_id
+        for offset in range(0, len(booking_flights), BATCH_SIZE):
+            size = min(BATCH_SIZE, len(booking_flights) - offset)
+            users = rng.choices(user_ids, cum_weights=user_weights, k=size)
+            bookings, payments = [], []
+            for position in range(size):
+                index = offset + position
+                flight = booking_flights[index]
+                status = statuses[index]
+                departure = self.start + timedelta(minutes=plan['departure'][flight])
+
+                roll = random_()
+                seat_class = 'first' if roll < 0.03 else 'business' if roll < 0.15 else 'economy'
+                price = round(self._prices_by_class[seat_class][flight] * (0.9 + 0.2 * random_()), -1)
+
+                booking_date = departure - timedelta(minutes=60 + int(random_() * 90 * 24 * 60))
+                if booking_date > self.now:
+                    booking_date = self.now - timedelta(minutes=1 + int(random_() * 7 * 24 * 60))
+
+                seat_number = None
+                cancelled_at = reason = None
+                if status == CONFIRMED:
+                    seat = seat_counters[flight]
+                    seat_counters[flight] += 1
+                    seat_number = f'{seat // len(letters) + 1}{letters[seat % len(letters)]}'
+                    status_name = 'checked_in' if departure < self.now else 'confirmed'
+                else:
+                    status_name = 'cancelled' if status == CANCELLED else 'refunded'
+                    cancelled_at = min(booking_date + timedelta(hours=1 + int(random_() * 240)), self.now)
+                    reason = 'Изменение планов'
+
+                booking_id = index + 1
+                first_name = FIRST_NAMES[int(random_() * len(FIRST_NAMES))]
+                last_name = LAST_NAMES[int(random_() * len(LAST_NAMES))]
+                bookings.append((booking_id, booking_reference(booking_id), users[position], flight + 1,
+                                 first_name, last_name, f'passenger{booking_id}@example.com', None,
+                                 seat_class, seat_number, price, status_name, booking_date, cancelled_at, reason,
+                                 int(random_() * 3), None, None))
+
+                if status != CANCELLED:
+                    method = PAYMENT_METHODS[int(random_() * len(PAYMENT_METHODS))]
+                    payment_status = 'refunded' if status == REFUNDED else 'completed'
+                    payments.append((payment_id, booking_id, price, method, f'TX{booking_id:012d}',
+                                     payment_status, booking_date))
+                    payment_id += 1
+            yield bookings, payments
+
+    # ЗАПУСК
+
+    def run(self, engine):
+        with engine.connect() as connection:
+            for model in (Airport, Airline, Flight, Booking):
+                if connection.execute(select(func.count()).select_from(model.__table__)).scalar():
+                    raise DataGenerationError(
+                        f'Таблица {model.__tablename__} уже содержит данные: генератор заполняет пустую базу'
+                    )
+            existing_users = set(connection.execute(select(User.username)).scalars())
+            first_user_id = self._next_id(connection, User)
+            first_payment_id = self._next_id(connection, Payment)
+
+        airports = self.airport_rows()
+        self._airlines = self.airline_rows()
+        self._write_rows(engine, Airport.__table__, ('id', 'code', 'name', 'city', 'country'), airports, len(airports))
+        self._write_rows(engine, Airline.__table__, ('id', 'code', 'name', 'country'), self._airlines,
+                         len(self._airlines))
+
+        user_columns = ('id', 'username', 'email', 'password_hash', 'role', 'first_name', 'last_name',
+                        'phone', 'company_id', 'created_at', 'is_active')
+        accounts = []
+        for username, password, role, first_name, last_name, email in DEMO_ACCOUNTS:
+            if username in existing_users:
+                continue
+            accounts.append((first_user_id, username, email, generate_password_hash(password), role,
+                             first_name, last_name, None, 1 if role == 'manager' else None, self.now, True))
+            first_user_id += 1
+        self._write_rows(engine, User.__table__, user_columns,
+                         itertools.chain(accounts, self.user_rows(first_user_id)),
+                         len(accounts) + self.counts['users'])
+        with engine.connect() as connection:
+            user_ids = connection.execute(
+                select(User.id).where(User.role == 'user').order_by(User.id)
+            ).scalars().all()
+
+        if not user_ids:
+            self.counts['bookings'] = 0
+        plan = self.plan_flights([row[3] for row in airports])
+        booking_flights, statuses, occupied = self.plan_bookings(plan)
+
+        self._prices_by_class = {seat_class: array.array('d') for seat_class in ('economy', 'business', 'first')}
+        flight_columns = ('id', 'flight_number', 'departure_airport_id', 'arrival_airport_id', 'airline_id',
+                          'departure_time', 'arrival_time', 'aircraft_type', 'total_seats', 'available_seats',
+                          'economy_price', 'business_price', 'first_class_price', 'status', 'created_at')
+        self._write_rows(engine, Flight.__table__, flight_columns, self.flight_rows(plan, occupied),
+                         self.counts['flights'])
+
+        # Платежи пишутся в тех же транзакциях, что и их бронирования
+        booking_columns = ('id', 'booking_reference', 'user_id', 'flight_id', 'passenger_first_name',
+                           'passenger_last_name', 'passenger_email', 'passenger_phone', 'seat_class',
+                           'seat_number', 'price_paid', 'status', 'booking_date', 'cancelled_at',
+                           'cancellation_reason', 'baggage_count', 'meal_preference', 'special_requests')
+        payment_columns = ('id', 'booking_id', 'amount', 'payment_method', 'transaction_id', 'status', 'payment_date')
+        self._write(engine, [(Booking.__table__, booking_columns), (Payment.__table__, payment_columns)],
+                    self.booking_batches(plan, booking_flights, statuses, user_ids, first_payment_id),
+                    len(booking_flights))
+
+        reset_sequences(engine)
+        return dict(self.written)
+
+
+def reset_sequences(engine):
+    """PostgreSQL: после вставки с явными id счетчики SERIAL переводятся на MAX(id)"""
+    if engine.dialect.name != 'postgresql':
+        return
+    with engine.begin() as connection:
+        for model in (User, Airport, Airline, Flight, Booking, Payment):
+            table = model.__table__
+            name = connection.dialect.identifier_preparer.format_table(table)
+            connection.exec_driver_sql(
+                f"SELECT setval(pg_get_serial_sequence('{name}', 'id'), COALESCE((SELECT MAX(id) FROM {name}), 0) + 1, false)"
+            )
+
+
+def generate_data(engine=None, seed=1, progress=None, **options):
+    """
+    Заполняет пустую базу синтетическими данными; options - объемы таблиц
+    (см. PROFILES), days_back, days_ahead, base_date. Возвращает {таблица: строк}.
+    """
+    started = time.perf_counter()
+    result = DataGenerator(seed=seed, progress=progress, **options).run(engine or db.engine)
+    # Вставка идет мимо событий сессии: кэши статистики и справочников сбрасываются явно
+    bump_version(STATISTICS_NAMESPACE, REFERENCE_NAMESPACE)
+    result['seconds'] = round(time.perf_counter() - started, 1)
+    return result
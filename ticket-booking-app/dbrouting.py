@@ -0,0 +1,191 @@
+"""
+Маршрутизация чтения между основной базой и репликой.
+
+Реплика подключается переменной DATABASE_REPLICA_URL (bind "replica").
+Представления, помеченные @use_replica (поиск, автодополнение, статистика,
+детальные API), читают из реплики; записи (flush, INSERT/UPDATE/DELETE,
+текстовые запросы) всегда идут в основную базу.
+
+Представления, помеченные @use_primary (бронирование, отмена), работают
+только с основной базой, а после изменяющего запроса пользователь еще
+REPLICA_STICKY_SECONDS читает из основной базы - так он сразу видит свои изменения.
+
+Защита от отставания: раз в REPLICA_LAG_CHECK_SECONDS в основную базу пишется
+отметка времени (таблица replica_heartbeat) и читается из реплики. Если реплика
+отстает больше REPLICA_MAX_LAG_SECONDS или недоступна, чтение идет в основную базу.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, g, has_app_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Column, Float, Integer, MetaData, Table, select, update
+
+REPLICA_BIND = 'replica'
+
+# Служебная таблица вне моделей приложения: в нее пишет только монитор отставания
+_heartbeat_metadata = MetaData()
+replica_heartbeat = Table(
+    'replica_heartbeat', _heartbeat_metadata,
+    Column('id', Integer, primary_key=True),
+    Column('updated_at', Float, nullable=False),
+)
+
+
+class ReplicaRouter:
+    """Реплика приложения и оценка ее отставания от основной базы"""
+
+    def __init__(self, primary, replica, max_lag=5.0, check_interval=1.0, sticky_seconds=10.0):
+        self.primary = primary
+        self.replica = replica
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.sticky_seconds = sticky_seconds
+        self._lag = None
+        self._checked_at = None
+        self._error = None
+        self._lock = threading.Lock()
+
+    def measure_lag(self):
+        """
+        Записывает отметку в основную базу и читает последнюю дошедшую до реплики.
+        Возвращает отставание в секундах (с точностью до интервала проверки)
+        или None, если реплика недоступна или еще не получила таблицу отметок
+        (таблица создается миграцией 4, см. migrations.py).
+        """
+        try:
+            with self.primary.begin() as connection:
+                connection.execute(update(replica_heartbeat).where(replica_heartbeat.c.id == 1)
+                                   .values(updated_at=time.time()))
+            with self.replica.connect() as connection:
+                replicated_at = connection.execute(
+                    select(replica_heartbeat.c.updated_at).where(replica_heartbeat.c.id == 1)
+                ).scalar()
+        except Exception as e:
+            error = f"{e.__class__.__name__}: {e}"
+            # Повторяющаяся ошибка пишется в лог один раз, а не при каждой проверке
+            if error != self._error:
+                print(f"Реплика недоступна: {error}")
+            self._error = error
+            return None
+        self._error = None
+        if replicated_at is None:
+            return None
+        return max(0.0, time.time() - replicated_at)
+
+    def lag(self):
+        """Последняя оценка отставания; обновляется не чаще check_interval"""
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return self._lag
+        # Проверку выполняет один поток, остальные используют предыдущую оценку
+        if not self._lock.acquire(blocking=False):
+            return self._lag
+        try:
+            self._lag = self.measure_lag()
+            self._checked_at = time.monotonic()
+        finally:
+            self._lock.release()
+        return self._lag
+
+    def available(self):
+        lag = self.lag()
+        return lag is not None and lag <= self.max_lag
+
+
+def _is_read(clause):
+    # connection() без выражения используется для чтения справочников;
+    # DML и текстовые запросы отправляются в основную базу
+    return clause is None or getattr(clause, 'is_select', False)
+
+
+def current_replica():
+    """Engine реплики, если текущее чтение можно выполнить на ней, иначе None"""
+    if not has_app_context() or g.get('db_route') != REPLICA_BIND or g.get('db_primary_reads'):
+        return None
+    router = current_app.extensions.get('db_routing')
+    if router is None or not router.available():
+        return None
+    g.db_replica_reads = True
+    return router.replica
+
+
+class RoutingSession(Session):
+    """Сессия Flask-SQLAlchemy, отправляющая чтения помеченных представлений в реплику"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and _is_read(clause):
+            replica = current_replica()
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def replica_cache_ttl():
+    """
+    Если в текущем запросе читались данные реплики, результат может отставать
+    на REPLICA_MAX_LAG_SECONDS: кэшировать его дольше этого срока нельзя.
+    Возвращает ограничение TTL в секундах или None.
+    """
+    if not has_app_context() or not g.get('db_replica_reads'):
+        return None
+    return current_app.extensions['db_routing'].max_lag
+
+
+@contextmanager
+def primary_reads():
+    """Чтения внутри блока идут в основную базу (заполнение кэшей прав и справочников)"""
+    if not has_app_context():
+        yield
+        return
+    previous = g.get('db_primary_reads', False)
+    g.db_primary_reads = True
+    try:
+        yield
+    finally:
+        g.db_primary_reads = previous
+
+
+def use_replica(view):
+    """Чтения представления выполняются на реплике (если она настроена и не отстает)"""
+    @wraps(view)
+    def decorated_view(*args, **kwargs):
+        primary_until = session.get('db_primary_until')
+        if primary_until is None or primary_until < time.time():
+            g.db_route = REPLICA_BIND
+        return view(*args, **kwargs)
+    return decorated_view
+
+
+def use_primary(view):
+    """
+    Представление работает только с основной базой; после изменяющего запроса
+    чтения пользователя некоторое время тоже идут в основную базу.
+    """
+    @wraps(view)
+    def decorated_view(*args, **kwargs):
+        g.db_route = 'primary'
+        response = view(*args, **kwargs)
+        router = current_app.extensions.get('db_routing')
+        if router is not None and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            session['db_primary_until'] = time.time() + router.sticky_seconds
+        return response
+    return decorated_view
+
+
+def init_read_replica(app, db):
+    """Подключает реплику, если в SQLALCHEMY_BINDS задан bind "replica" """
+    replica = db.engines.get(REPLICA_BIND)
+    if replica is None:
+        return None
+
+    router = ReplicaRouter(
+        db.engine, replica,
+        max_lag=app.config['REPLICA_MAX_LAG_SECONDS'],
+        check_interval=app.config['REPLICA_LAG_CHECK_SECONDS'],
+        sticky_seconds=app.config['REPLICA_STICKY_SECONDS'],
+    )
+    app.extensions['db_routing'] = router
+    return router
@@ -0,0 +1,150 @@
+"""
+Потоковая выгрузка списка пассажиров (манифеста) в CSV и XLSX.
+
+Строки читаются отдельным соединением с серверным курсором порциями
+(yield_per), поэтому память не зависит от размера выгрузки.
+"""
+import csv
+import io
+import os
+import re
+import tempfile
+
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+from models import db, Airport, Flight, Booking
+
+try:
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+except ImportError:  # XLSX-выгрузка доступна только при установленном openpyxl
+    Workbook = None
+
+# Количество строк, читаемых из БД и записываемых за один шаг
+EXPORT_BATCH_SIZE = 1000
+
+# Первые символы, с которых Excel и LibreOffice начинают формулу: такие ячейки CSV
+# (например, имя пассажира "=HYPERLINK(...)") выгружаются с префиксом "'".
+# Числа и телефоны ("+7 900 123-45-67") формулой не станут и выгружаются как есть
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+_PLAIN_VALUE = re.compile(r'[+-]?[\d\s()-]+')
+
+# Колонки манифеста: (заголовок, выражение)
+_departure_airport = aliased(Airport)
+_arrival_airport = aliased(Airport)
+MANIFEST_COLUMNS = (
+    ('Код бронирования', Booking.booking_reference),
+    ('Дата бронирования', Booking.booking_date),
+    ('Статус', Booking.status),
+    ('Имя', Booking.passenger_first_name),
+    ('Фамилия', Booking.passenger_last_name),
+    ('Email', Booking.passenger_email),
+    ('Телефон', Booking.passenger_phone),
+    ('Рейс', Flight.flight_number),
+    ('Вылет', Flight.departure_time),
+    ('Откуда', _departure_airport.code),
+    ('Куда', _arrival_airport.code),
+    ('Класс', Booking.seat_class),
+    ('Место', Booking.seat_number),
+    ('Цена', Booking.price_paid),
+    ('Багаж', Booking.baggage_count),
+    ('Питание', Booking.meal_preference),
+)
+
+
+def xlsx_available():
+    return Workbook is not None
+
+
+def manifest_statement(company_id=None, flight_id=None):
+    """SELECT манифеста рейса или авиакомпании в порядке вылета и бронирования"""
+    statement = select(*(column for _, column in MANIFEST_COLUMNS))\
+        .join(Flight, Booking.flight_id == Flight.id)\
+        .join(_departure_airport, Flight.departure_airport_id == _departure_airport.id)\
+        .join(_arrival_airport, Flight.arrival_airport_id == _arrival_airport.id)
+    if company_id is not None:
+        statement = statement.where(Flight.airline_id == company_id)
+    if flight_id is not None:
+        statement = statement.where(Booking.flight_id == flight_id)
+    return statement.order_by(Flight.departure_time, Booking.flight_id, Booking.id)
+
+
+def iter_manifest_rows(statement, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Отдает строки манифеста порциями через серверный курсор.
+    Используется отдельное соединение, чтобы выгрузка не держала сессию запроса.
+    """
+    with db.engine.connect() as connection:
+        result = connection.execution_options(yield_per=batch_size).execute(statement)
+        for partition in result.partitions():
+            yield partition
+
+
+def _escape_formula(value):
+    """Экранирует строку CSV, которую табличный редактор выполнил бы как формулу"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) and not _PLAIN_VALUE.fullmatch(value):
+        return "'" + value
+    return value
+
+
+def _xlsx_cell(sheet, value):
+    """openpyxl считает формулой только строки с "=": они записываются как текст без изменений"""
+    if isinstance(value, str) and value.startswith('='):
+        cell = WriteOnlyCell(sheet, value=value)
+        cell.data_type = 's'
+        return cell
+    return value
+
+
+def _format_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'strftime'):
+        return value.strftime('%d.%m.%Y %H:%M')
+    return _escape_formula(value)
+
+
+def stream_csv(statement):
+    """Генератор CSV (UTF-8 с BOM для Excel) без накопления строк в памяти"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+
+    buffer.write('\ufeff')
+    writer.writerow([title for title, _ in MANIFEST_COLUMNS])
+
+    for partition in iter_manifest_rows(statement):
+        writer.writerows([_format_value(value) for value in row] for row in partition)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_xlsx(statement, chunk_size=64 * 1024):
+    """
+    Генератор XLSX. Книга пишется в режиме write_only во временный файл
+    (формат zip не позволяет отдавать ее по частям во время записи),
+    затем файл отдается частями и удаляется.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Пассажиры')
+    sheet.append([title for title, _ in MANIFEST_COLUMNS])
+    for partition in iter_manifest_rows(statement):
+        for row in partition:
+            sheet.append([_xlsx_cell(sheet, value) for value in row])
+
+    handle, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(handle)
+    try:
+        workbook.save(path)
+        with open(path, 'rb') as file:
+            while True:
+                chunk = file.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
@@ -1,6 +1,6 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, SelectField, SubmitField, IntegerField, FloatField, TextAreaField, DateTimeLocalField, URLField, BooleanField
-from wtforms.validators import DataRequired, Email, EqualTo, Length, Optional, NumberRange, Regexp
+from wtforms import StringField, PasswordField, SelectField, SubmitField, IntegerField, FloatField, TextAreaField, DateTimeLocalField, URLField, BooleanField, SelectMultipleField, DateField, TimeField, widgets
+from wtforms.validators import DataRequired, Email, EqualTo, Length, Optional, NumberRange, Regexp, ValidationError
 from datetime import datetime
 
 class LoginForm(FlaskForm):
@@ -55,6 +55,38 @@ class FlightForm(FlaskForm):
     status = SelectField('Статус', choices=[('scheduled', 'Запланирован'), ('delayed', 'Задержан'), ('cancelled', 'Отменен'), ('boarding', 'Посадка'), ('departed', 'Вылетел')], default='scheduled')
     submit = SubmitField('Сохранить рейс')
 
+class MultiCheckboxField(SelectMultipleField):
+    """Множественный выбор в виде флажков"""
+    widget = widgets.ListWidget(prefix_label=False)
+    option_widget = widgets.CheckboxInput()
+
+class SchedulePatternForm(FlaskForm):
+    flight_number = StringField('Номер рейса', validators=[DataRequired(), Length(max=10)])
+    departure_airport_id = SelectField('Аэропорт вылета', coerce=int, validators=[DataRequired()])
+    arrival_airport_id = SelectField('Аэропорт прибытия', coerce=int, validators=[DataRequired()])
+    airline_id = SelectField('Авиакомпания', coerce=int, validators=[DataRequired()])
+    days_of_week = MultiCheckboxField('Дни недели', choices=[('1', 'Пн'), ('2', 'Вт'), ('3', 'Ср'), ('4', 'Чт'), ('5', 'Пт'), ('6', 'Сб'), ('7', 'Вс')], validators=[DataRequired(message='Выберите хотя бы один день')])
+    valid_from = DateField('Действует с', validators=[DataRequired()])
+    valid_to = DateField('Действует по', validators=[Optional()])
+    departure_time = TimeField('Время вылета', validators=[DataRequired()])
+    arrival_time = TimeField('Время прибытия', validators=[DataRequired()])
+    arrival_day_offset = IntegerField('Прибытие через (сутки)', validators=[Optional(), NumberRange(min=0, max=3)], default=0)
+    aircraft_type = StringField('Тип самолета', validators=[Optional(), Length(max=50)])
+    total_seats = IntegerField('Всего мест', validators=[DataRequired(), NumberRange(min=1)], default=180)
+    economy_price = FloatField('Цена эконом', validators=[DataRequired()])
+    business_price = FloatField('Цена бизнес', validators=[Optional()])
+    first_class_price = FloatField('Цена первый класс', validators=[Optional()])
+    is_active = BooleanField('Расписание действует', default=True)
+    submit = SubmitField('Сохранить расписание')
+    
+    def validate_valid_to(self, field):
+        if field.data and self.valid_from.data and field.data < self.valid_from.data:
+            raise ValidationError('Дата окончания раньше даты начала')
+    
+    def validate_arrival_time(self, field):
+        if not (self.arrival_day_offset.data or 0) and self.departure_time.data and field.data <= self.departure_time.data:
+            raise ValidationError('Время прибытия должно быть позже времени вылета (или укажите прибытие на следующие сутки)')
+
 class AirportForm(FlaskForm):
     code = StringField('IATA код', validators=[DataRequired(), Length(min=3, max=3)])
     name = StringField('Название аэропорта', validators=[DataRequired(), Length(max=100)])
@@ -0,0 +1,47 @@
+from sqlalchemy.orm import configure_mappers, contains_eager, joinedload, selectinload
+
+from models import Flight, Booking, ArchivedFlight, ArchivedBooking
+
+# Обратные связи (backref) появляются у классов только после настройки мапперов
+configure_mappers()
+
+# Наборы стратегий загрузки для страниц со списками.
+# Связи в models.py ленивые (lazy=True), поэтому без явных опций
+# каждая строка списка порождает 3-4 дополнительных запроса.
+
+# Рейс с аэропортами и авиакомпанией (списки рейсов, выпадающие списки)
+FLIGHT_LIST_OPTIONS = (
+    joinedload(Flight.departure_airport),
+    joinedload(Flight.arrival_airport),
+    joinedload(Flight.airline),
+)
+
+# То же для запросов, где аэропорты уже присоединены через aliased()
+# (поиск рейсов): связи догружаются отдельными запросами по списку id
+FLIGHT_SEARCH_OPTIONS = (
+    selectinload(Flight.departure_airport),
+    selectinload(Flight.arrival_airport),
+    selectinload(Flight.airline),
+)
+
+# Бронирование с рейсом, аэропортами и авиакомпанией (профиль, пассажиры, панели)
+BOOKING_LIST_OPTIONS = (
+    joinedload(Booking.flight).joinedload(Flight.departure_airport),
+    joinedload(Booking.flight).joinedload(Flight.arrival_airport),
+    joinedload(Booking.flight).joinedload(Flight.airline),
+)
+
+# То же для запросов, где рейс уже присоединен явно через join(Flight)
+# для фильтров и сортировки: рейс берется из этого же JOIN
+BOOKING_JOINED_FLIGHT_OPTIONS = (
+    contains_eager(Booking.flight).joinedload(Flight.departure_airport),
+    contains_eager(Booking.flight).joinedload(Flight.arrival_airport),
+    contains_eager(Booking.flight).joinedload(Flight.airline),
+)
+
+# Архивное бронирование с присоединенным архивным рейсом (история поездок в профиле)
+ARCHIVED_BOOKING_JOINED_FLIGHT_OPTIONS = (
+    contains_eager(ArchivedBooking.flight).joinedload(ArchivedFlight.departure_airport),
+    contains_eager(ArchivedBooking.flight).joinedload(ArchivedFlight.arrival_airport),
+    contains_eager(ArchivedBooking.flight).joinedload(ArchivedFlight.airline),
+)
@@ -0,0 +1,179 @@
+"""
+Команды обслуживания приложения.
+
+Запуск из каталога ticket-booking-app:
+    python manage.py migrate              # применить новые миграции схемы
+    python manage.py migrate --to 3       # применить миграции до версии 3
+    python manage.py migrations           # список миграций и их состояние
+    python manage.py archive              # перенести вылетевшие рейсы в архив
+    python manage.py import-schedule FILE # массовый импорт расписания из CSV
+    python manage.py materialize          # создать рейсы регулярных расписаний на горизонт
+    python manage.py generate-data        # заполнить пустую базу синтетическими данными
+"""
+import argparse
+import sys
+from datetime import date
+
+from flask import current_app
+
+from app import create_app
+from archive import archive_departed
+from datagen import PROFILES, DataGenerationError, generate_data
+from refdata import load_reference_data
+from schedule_import import ScheduleFormatError, import_schedule
+from schedules import materialize_patterns
+from models import db
+import migrations
+
+
+def command_migrate(args):
+    if args.to is not None and not 0 < args.to <= migrations.head_version():
+        print(f"Неизвестная версия: {args.to} (последняя {migrations.head_version()})")
+        return 1
+
+    applied = migrations.upgrade(db.engine, target=args.to)
+    with db.engine.connect() as connection:
+        version = migrations.current_version(connection)
+    if applied:
+        print(f"Применено миграций: {len(applied)}, версия схемы: {version}")
+    else:
+        print(f"Схема актуальна, версия: {version}")
+    return 0
+
+
+def command_migrations(args):
+    with db.engine.connect() as connection:
+        applied = migrations.applied_migrations(connection)
+    for item in migrations.MIGRATIONS:
+        applied_at = applied.get(item.version)
+        state = applied_at.strftime('%d.%m.%Y %H:%M') if applied_at else 'не применена'
+        print(f"{item.version:>4}  {item.name:<50} {state}")
+    return 0
+
+
+def command_archive(args):
+    config = current_app.config
+    days = config['ARCHIVE_AFTER_DAYS'] if args.days is None else args.days
+    batch_size = config['ARCHIVE_BATCH_SIZE'] if args.batch_size is None else args.batch_size
+    if days < 0 or batch_size <= 0:
+        print("Срок хранения не может быть отрицательным, размер пакета должен быть положительным")
+        return 1
+
+    def progress(flights, bookings, payments):
+        print(f"  ... рейсов: {flights}, бронирований: {bookings}, платежей: {payments}")
+
+    flights, bookings, payments = archive_departed(days, batch_size, progress=progress)
+    print(f"Перенесено в архив рейсов: {flights}, бронирований: {bookings}, платежей: {payments}")
+    return 0
+
+
+def command_import_schedule(args):
+    batch_size = args.batch_size or current_app.config['SCHEDULE_IMPORT_BATCH_SIZE']
+
+    def progress(report):
+        print(f"  ... строк: {report.rows}, добавлено: {report.inserted}, обновлено: {report.updated}, "
+              f"ошибок: {report.error_count}")
+
+    try:
+        with open(args.file, encoding='utf-8-sig', newline='') as lines:
+            report = import_schedule(lines, load_reference_data(), batch_size=batch_size,
+                                     dry_run=args.dry_run, progress=progress)
+    except (OSError, ScheduleFormatError, UnicodeDecodeError) as e:
+        print(f"Файл не может быть импортирован: {e}")
+        return 1
+
+    result = report.to_dict()
+    for error in result['errors']:
+        print(f"  строка {error['line']}: {error['error']}")
+    if report.error_count > len(result['errors']):
+        print(f"  ... и еще {report.error_count - len(result['errors'])} ошибок")
+    prefix = 'Проверка без записи' if args.dry_run else 'Импорт завершен'
+    print(f"{prefix}: строк {report.rows}, добавлено {report.inserted}, обновлено {report.updated}, "
+          f"ошибок {report.error_count} за {result['seconds']} с")
+    return 1 if report.error_count else 0
+
+
+def command_materialize(args):
+    days = current_app.config['SCHEDULE_HORIZON_DAYS'] if args.days is None else args.days
+    if days < 0:
+        print("Горизонт не может быть отрицательным")
+        return 1
+
+    patterns, created = materialize_patterns(days)
+    print(f"Расписаний развернуто: {patterns}, создано рейсов: {created} (горизонт {days} дн.)")
+    return 0
+
+
+def command_generate_data(args):
+    options = dict(PROFILES[args.profile])
+    for name in options:
+        if getattr(args, name) is not None:
+            options[name] = getattr(args, name)
+    if any(value < 0 for value in options.values()) or args.days_back < 0 or args.days_ahead < 0:
+        print("Объемы и периоды не могут быть отрицательными")
+        return 1
+
+    def progress(table, done, total):
+        if done == total or done % 100000 == 0:
+            print(f"  ... {table}: {done} из {total}")
+
+    # Генератор заполняет базу с актуальной схемой
+    migrations.upgrade(db.engine)
+    try:
+        result = generate_data(seed=args.seed, progress=progress, days_back=args.days_back,
+                               days_ahead=args.days_ahead, base_date=args.base_date, **options)
+    except DataGenerationError as e:
+        print(f"Данные не сгенерированы: {e}")
+        return 1
+
+    seconds = result.pop('seconds')
+    rows = ', '.join(f"{table} {count}" for table, count in result.items())
+    print(f"Сгенерировано строк: {sum(result.values())} ({rows}) за {seconds} с")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    migrate = commands.add_parser('migrate', help='Применить миграции схемы')
+    migrate.add_argument('--to', type=int, help='Целевая версия (по умолчанию последняя)')
+    migrate.set_defaults(handler=command_migrate)
+
+    listing = commands.add_parser('migrations', help='Список миграций')
+    listing.set_defaults(handler=command_migrations)
+
+    archive = commands.add_parser('archive', help='Перенести вылетевшие рейсы в архивные таблицы')
+    archive.add_argument('--days', type=int, help='Через сколько дней после вылета (по умолчанию ARCHIVE_AFTER_DAYS)')
+    archive.add_argument('--batch-size', type=int, help='Рейсов в одной транзакции (по умолчанию ARCHIVE_BATCH_SIZE)')
+    archive.set_defaults(handler=command_archive)
+
+    schedule = commands.add_parser('import-schedule', help='Массовый импорт расписания рейсов из CSV')
+    schedule.add_argument('file', help='CSV-файл расписания (см. schedule_import.py)')
+    schedule.add_argument('--batch-size', type=int, help='Строк в одной транзакции (по умолчанию SCHEDULE_IMPORT_BATCH_SIZE)')
+    schedule.add_argument('--dry-run', action='store_true', help='Только проверить строки, ничего не записывая')
+    schedule.set_defaults(handler=command_import_schedule)
+
+    materialize = commands.add_parser('materialize', help='Создать рейсы регулярных расписаний на горизонт')
+    materialize.add_argument('--days', type=int, help='Горизонт в днях (по умолчанию SCHEDULE_HORIZON_DAYS)')
+    materialize.set_defaults(handler=command_materialize)
+
+    generate = commands.add_parser('generate-data', help='Заполнить пустую базу синтетическими данными')
+    generate.add_argument('--profile', choices=sorted(PROFILES), default='demo', help='Набор объемов (по умолчанию demo)')
+    generate.add_argument('--seed', type=int, default=1, help='Seed генератора: одинаковый seed дает одинаковые данные')
+    for name in ('airports', 'airlines', 'users', 'flights', 'bookings'):
+        generate.add_argument(f'--{name}', type=int, help='Переопределить объем профиля')
+    generate.add_argument('--days-back', type=int, default=180, help='Дней истории рейсов до базовой даты')
+    generate.add_argument('--days-ahead', type=int, default=180, help='Дней расписания после базовой даты')
+    generate.add_argument('--base-date', type=date.fromisoformat,
+                          help='Базовая дата ГГГГ-ММ-ДД (по умолчанию сегодня)')
+    generate.set_defaults(handler=command_generate_data)
+
+    args = parser.parse_args(argv)
+    app, _ = create_app()
+    with app.app_context():
+        return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,409 @@
+"""
+Версионные миграции схемы базы данных.
+
+Примененные миграции записываются в таблицу schema_version. При запуске
+приложение только читает из нее номер версии (check_schema_version),
+а изменяет схему команда:
+
+    python manage.py migrate             # применить все новые миграции
+    python manage.py migrate --to 2      # до указанной версии
+    python manage.py migrations          # список миграций и их состояние
+
+Миграции идемпотентны: колонки и индексы создаются, только если их еще нет,
+поэтому их можно применять и к базам, созданным раньше через db.create_all().
+Индексы создаются без блокировки записи (CREATE INDEX CONCURRENTLY в PostgreSQL);
+в SQLite такого режима нет, и индекс строится обычным CREATE INDEX.
+"""
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import (Boolean, Column, DateTime, Float, ForeignKey, Integer, MetaData, String, Table, Text,
+                        func, inspect, select, text)
+from sqlalchemy.schema import CreateIndex
+
+from cache import shared_versions
+from dbrouting import replica_heartbeat
+from models import db, SchedulePattern, flight_archive, booking_archive, payment_archive
+
+# Служебная таблица версий вне моделей приложения
+_schema_metadata = MetaData()
+schema_version = Table(
+    'schema_version', _schema_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('name', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+# transactional=False - миграция выполняется в режиме autocommit
+# (нужно для CREATE INDEX CONCURRENTLY)
+Migration = namedtuple('Migration', 'version name upgrade transactional')
+
+MIGRATIONS = []
+
+
+def migration(version, name, transactional=True):
+    """Регистрирует функцию upgrade(connection) как миграцию с номером version"""
+    def decorator(upgrade):
+        if MIGRATIONS and version <= MIGRATIONS[-1].version:
+            raise ValueError(f'Миграции должны идти по возрастанию номеров: {version}')
+        MIGRATIONS.append(Migration(version, name, upgrade, transactional))
+        return upgrade
+    return decorator
+
+
+def head_version():
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+# ВСПОМОГАТЕЛЬНЫЕ ОПЕРАЦИИ
+
+def add_column(connection, column):
+    """ALTER TABLE ... ADD COLUMN по описанию колонки модели, если ее еще нет"""
+    table = column.table.name
+    existing = {item['name'] for item in inspect(connection).get_columns(table)}
+    if column.name in existing:
+        return False
+
+    preparer = connection.dialect.identifier_preparer
+    column_type = column.type.compile(dialect=connection.dialect)
+    connection.execute(text(
+        f'ALTER TABLE {preparer.format_table(column.table)} ADD COLUMN {preparer.format_column(column)} {column_type}'
+    ))
+    print(f"✓ Добавлена колонка {table}.{column.name}")
+    return True
+
+
+def _find_index(name):
+    for table in db.metadata.tables.values():
+        for index in table.indexes:
+            if index.name == name:
+                return index
+    raise KeyError(f'Индекс {name} не описан в моделях')
+
+
+def _index_state(connection, name):
+    """None - индекса нет, True - есть, False - есть, но не достроен (PostgreSQL)"""
+    # Каталоги запрашиваются напрямую: рефлексия пропускает индексы по выражениям (lower(...))
+    if connection.dialect.name == 'postgresql':
+        return connection.execute(text(
+            'SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid '
+            'WHERE c.relname = :name'
+        ), {'name': name}).scalar()
+    exists = connection.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = :name"
+    ), {'name': name}).scalar()
+    return True if exists else None
+
+
+def create_index(connection, name):
+    """
+    Создает индекс, описанный в моделях, не блокируя запись в таблицу.
+    Недостроенный индекс, оставшийся после прерванного CREATE INDEX CONCURRENTLY,
+    удаляется и строится заново.
+    """
+    index = _find_index(name)
+    state = _index_state(connection, name)
+    if state:
+        return False
+
+    online = connection.dialect.name == 'postgresql'
+    if state is False:
+        drop_index(connection, name)
+    if online:
+        index.dialect_options['postgresql']['concurrently'] = True
+    try:
+        connection.execute(CreateIndex(index, if_not_exists=True))
+    finally:
+        if online:
+            index.dialect_options['postgresql']['concurrently'] = False
+    print(f"✓ Создан индекс {name}")
+    return True
+
+
+def drop_index(connection, name):
+    """Удаляет индекс, если он есть (в PostgreSQL - без блокировки записи)"""
+    concurrently = 'CONCURRENTLY ' if connection.dialect.name == 'postgresql' else ''
+    connection.execute(text(f'DROP INDEX {concurrently}IF EXISTS {name}'))
+
+
+def add_shared_version(connection, row_id):
+    """Строка общей версии кэшей (cache.SHARED_VERSION_ROWS), если ее еще нет"""
+    if connection.execute(select(shared_versions.c.id).where(shared_versions.c.id == row_id)).first() is None:
+        connection.execute(shared_versions.insert(), {'id': row_id, 'version': 0})
+
+
+# МИГРАЦИИ
+# Новые изменения схемы добавляются только новыми миграциями в конец списка
+
+# Снимок схемы на момент введения миграций (до миграции 2). Миграция 1 создает
+# именно эти таблицы, а не текущие модели: иначе на новой базе последующие
+# миграции ничего бы не меняли и не проверялись. Снимок не меняется вместе с моделями
+_baseline_metadata = MetaData()
+Table(
+    'user', _baseline_metadata,
+    Column('id', Integer, primary_key=True),
+    Column('username', String(80), unique=True, nullable=False),
+    Column('email', String(120), unique=True, nullable=False),
+    Column('password_hash', String(128)),
+    Column('role', String(20)),
+    Column('first_name', String(50)),
+    Column('last_name', String(50)),
+    Column('phone', String(20)),
+    Column('company_id', Integer, ForeignKey('airline.id')),
+    Column('created_at', DateTime),
+    Column('is_active', Boolean, nullable=False),
+)
+Table(
+    'airport', _baseline_metadata,
+    Column('id', Integer, primary_key=True),
+    Column('code', String(3), unique=True, nullable=False),
+    Column('name', String(100), nullable=False),
+    Column('city', String(50), nullable=False),
+    Column('country', String(50), nullable=False),
+)
+Table(
+    'airline', _baseline_metadata,
+    Column('id', Integer, primary_key=True),
+    Column('code', String(3), unique=True, nullable=False),
+    Column('name', String(100), nullable=False),
+    Column('country', String(50), nullable=False),
+)
+Table(
+    'flight', _baseline_metadata,
+    Column('id', Integer, primary_key=True),
+    Column('flight_number', String(10), nullable=False),
+    Column('departure_airport_id', Integer, ForeignKey('airport.id'), nullable=False),
+    Column('arrival_airport_id', Integer, ForeignKey('airport.id'), nullable=False),
+    Column('airline_id', Integer, ForeignKey('airline.id'), nullable=False),
+    Column('departure_time', DateTime, nullable=False),
+    Column('arrival_time', DateTime, nullable=False),
+    Column('aircraft_type', String(50)),
+    Column('total_seats', Integer),
+    Column('available_seats', Integer),
+    Column('economy_price', Float, nullable=False),
+    Column('business_price', Float),
+    Column('first_class_price', Float),
+    Column('status', String(20)),
+    Column('created_at', DateTime),
+)
+Table(
+    'booking', _baseline_metadata,
+    Column('id', Integer, primary_key=True),
+    Column('booking_reference', String(6), unique=True, nullable=False),
+    Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+    Column('flight_id', Integer, ForeignKey('flight.id'), nullable=False),
+    Column('passenger_first_name', String(50), nullable=False),
+    Column('passenger_last_name', String(50), nullable=False),
+    Column('passenger_email', String(120)),
+    Column('passenger_phone', String(20)),
+    Column('seat_class', String(20)),
+    Column('seat_number', String(10)),
+    Column('price_paid', Float, nullable=False),
+    Column('status', String(20)),
+    Column('booking_date', DateTime),
+    Column('baggage_count', Integer),
+    Column('meal_preference', String(50)),
+    Column('special_requests', Text),
+)
+Table(
+    'payment', _baseline_metadata,
+    Column('id', Integer, primary_key=True),
+    Column('booking_id', Integer, ForeignKey('booking.id'), nullable=False),
+    Column('amount', Float, nullable=False),
+    Column('payment_method', String(50)),
+    Column('transaction_id', String(100)),
+    Column('status', String(20)),
+    Column('payment_date', DateTime),
+)
+Table(
+    'banner', _baseline_metadata,
+    Column('id', Integer, primary_key=True),
+    Column('title', String(200), nullable=False),
+    Column('description', Text),
+    Column('image_url', String(500), nullable=False),
+    Column('link_url', String(500)),
+    Column('is_active', Boolean, nullable=False),
+    Column('start_date', DateTime),
+    Column('end_date', DateTime),
+    Column('position', String(50)),
+    Column('priority', Integer),
+    Column('views_count', Integer),
+    Column('clicks_count', Integer),
+    Column('created_at', DateTime),
+    Column('updated_at', DateTime),
+    Column('created_by', Integer, ForeignKey('user.id')),
+)
+
+
+@migration(1, 'Начальная схема')
+def initial_schema(connection):
+    # Создает отсутствующие таблицы снимка; существующие базы не изменяются
+    _baseline_metadata.create_all(connection, checkfirst=True)
+
+
+@migration(2, 'Колонки отмены бронирования')
+def booking_cancellation_columns(connection):
+    booking = db.metadata.tables['booking']
+    add_column(connection, booking.c.cancelled_at)
+    add_column(connection, booking.c.cancellation_reason)
+
+
+@migration(3, 'Индексы для списков, поиска и статистики', transactional=False)
+def query_indexes(connection):
+    for name in (
+        'ix_user_role', 'ix_user_username_lower', 'ix_user_email_lower',
+        'ix_user_first_name', 'ix_user_last_name',
+        'ix_flight_flight_number', 'ix_flight_departure_time', 'ix_flight_airline_departure',
+        'ix_booking_user_id', 'ix_booking_date_flight_price', 'ix_booking_flight_date',
+    ):
+        create_index(connection, name)
+    # Одиночные индексы, которые покрываются составными
+    drop_index(connection, 'ix_flight_airline_id')
+    drop_index(connection, 'ix_booking_flight_id')
+
+
+@migration(4, 'Отметки отставания реплики')
+def replica_heartbeat_table(connection):
+    replica_heartbeat.create(connection, checkfirst=True)
+    if connection.execute(select(replica_heartbeat.c.id)).first() is None:
+        connection.execute(replica_heartbeat.insert(), {'id': 1, 'updated_at': time.time()})
+
+
+@migration(5, 'Архивные таблицы рейсов, бронирований и платежей')
+def archive_tables(connection):
+    # Таблицы создаются вместе с индексами; в порядке внешних ключей
+    for table in (flight_archive, booking_archive, payment_archive):
+        table.create(connection, checkfirst=True)
+
+
+@migration(6, 'Индекс ключа рейса для импорта расписания', transactional=False)
+def flight_key_index(connection):
+    create_index(connection, 'ix_flight_airline_number_departure')
+
+
+@migration(7, 'Регулярные расписания рейсов', transactional=False)
+def schedule_patterns(connection):
+    SchedulePattern.__table__.create(connection, checkfirst=True)
+    add_column(connection, db.metadata.tables['flight'].c.pattern_id)
+    add_column(connection, flight_archive.c.pattern_id)
+    create_index(connection, 'ix_flight_pattern_departure')
+
+
+@migration(8, 'Общая версия учетных записей')
+def principal_version_table(connection):
+    shared_versions.create(connection, checkfirst=True)
+    add_shared_version(connection, 1)  # 'user'
+
+
+@migration(9, 'Общая версия справочников')
+def reference_version_row(connection):
+    add_shared_version(connection, 2)  # 'reference'
+
+
+@migration(10, 'Общие версии статистики и рейсов')
+def flight_version_rows(connection):
+    add_shared_version(connection, 3)  # 'statistics'
+    add_shared_version(connection, 4)  # 'flight'
+
+
+# Индексы поиска по началу строки (text_pattern_ops в PostgreSQL)
+PREFIX_SEARCH_INDEXES = (
+    'ix_user_username_lower', 'ix_user_email_lower', 'ix_user_first_name', 'ix_user_last_name',
+    'ix_flight_flight_number',
+)
+
+
+@migration(11, 'Индексы поиска по началу строки для LIKE в PostgreSQL', transactional=False)
+def prefix_search_indexes(connection):
+    # В SQLite индексы не меняются; в PostgreSQL пересоздаются с text_pattern_ops
+    if connection.dialect.name != 'postgresql':
+        return
+    for name in PREFIX_SEARCH_INDEXES:
+        drop_index(connection, name)
+        create_index(connection, name)
+
+
+# ВЫПОЛНЕНИЕ
+
+def current_version(connection):
+    """Номер последней примененной миграции (0 - таблицы версий еще нет)"""
+    if not inspect(connection).has_table(schema_version.name):
+        return 0
+    return connection.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+
+def applied_migrations(connection):
+    """{version: applied_at} для примененных миграций"""
+    if not inspect(connection).has_table(schema_version.name):
+        return {}
+    return dict(connection.execute(select(schema_version.c.version, schema_version.c.applied_at)).all())
+
+
+def _apply(engine, item):
+    record = {'version': item.version, 'name': item.name, 'applied_at': datetime.utcnow()}
+    if item.transactional:
+        with engine.begin() as connection:
+            item.upgrade(connection)
+            connection.execute(schema_version.insert(), record)
+        return
+
+    with engine.connect() as connection:
+        connection = connection.execution_options(isolation_level='AUTOCOMMIT')
+        item.upgrade(connection)
+        connection.execute(schema_version.insert(), record)
+
+
+# Ключ advisory-блокировки PostgreSQL: миграции выполняет только один процесс
+MIGRATION_LOCK_KEY = 4510
+
+
+@contextmanager
+def _migration_lock(engine):
+    if engine.dialect.name != 'postgresql':
+        yield
+        return
+    with engine.connect() as connection:
+        connection = connection.execution_options(isolation_level='AUTOCOMMIT')
+        connection.execute(text('SELECT pg_advisory_lock(:key)'), {'key': MIGRATION_LOCK_KEY})
+        try:
+            yield
+        finally:
+            connection.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': MIGRATION_LOCK_KEY})
+
+
+def upgrade(engine, target=None):
+    """Применяет миграции с номерами больше текущего и не больше target; возвращает список примененных"""
+    target = head_version() if target is None else target
+
+    with _migration_lock(engine):
+        schema_version.create(engine, checkfirst=True)
+        with engine.connect() as connection:
+            version = current_version(connection)
+
+        applied = []
+        for item in MIGRATIONS:
+            if version < item.version <= target:
+                print(f"Миграция {item.version}: {item.name}")
+                _apply(engine, item)
+                applied.append(item)
+    return applied
+
+
+def check_schema_version(engine):
+    """
+    Проверка при запуске приложения: одно чтение версии схемы без изменений в БД.
+    Возвращает True, если схема актуальна.
+    """
+    try:
+        with engine.connect() as connection:
+            version = connection.execute(select(func.max(schema_version.c.version))).scalar() or 0
+    except Exception:
+        version = 0
+
+    if version < head_version():
+        print(f"Схема базы данных устарела: версия {version}, требуется {head_version()}. "
+              f"Выполните: python manage.py migrate")
+        return False
+    return True
@@ -3,7 +3,10 @@ from flask_login import UserMixin
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 
-db = SQLAlchemy()
+from dbrouting import RoutingSession
+
+# Сессия умеет отправлять чтения в реплику (см. dbrouting.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -22,6 +25,18 @@ class User(UserMixin, db.Model):
     bookings = db.relationship('Booking', backref='user', lazy=True)
     company = db.relationship('Airline', backref='managers', lazy=True)
     
+    # Индексы для фильтра по роли и поиска в админ-панели (поиск идет по началу строки;
+    # в PostgreSQL - через LIKE 'prefix%', которому нужен класс операторов text_pattern_ops)
+    __table_args__ = (
+        db.Index('ix_user_role', 'role'),
+        db.Index('ix_user_username_lower', db.func.lower(username).label('username_lower'),
+                 postgresql_ops={'username_lower': 'text_pattern_ops'}),
+        db.Index('ix_user_email_lower', db.func.lower(email).label('email_lower'),
+                 postgresql_ops={'email_lower': 'text_pattern_ops'}),
+        db.Index('ix_user_first_name', 'first_name', postgresql_ops={'first_name': 'text_pattern_ops'}),
+        db.Index('ix_user_last_name', 'last_name', postgresql_ops={'last_name': 'text_pattern_ops'}),
+    )
+    
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
     
@@ -66,7 +81,16 @@ class Airline(db.Model):
     # Связь с рейсами
     flights = db.relationship('Flight', backref='airline', lazy=True)
 
-class Flight(db.Model):
+class FlightTimesMixin:
+    """Вычисляемые свойства рейса, общие для действующих и архивных рейсов"""
+    is_archived = False
+    
+    @property
+    def duration(self):
+        """Возвращает продолжительность полета"""
+        return self.arrival_time - self.departure_time
+
+class Flight(FlightTimesMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     flight_number = db.Column(db.String(10), nullable=False)
     
@@ -78,7 +102,7 @@ class Flight(db.Model):
     airline_id = db.Column(db.Integer, db.ForeignKey('airline.id'), nullable=False)
     
     # Время
-    departure_time = db.Column(db.DateTime, nullable=False)
+    departure_time = db.Column(db.DateTime, nullable=False, index=True)
     arrival_time = db.Column(db.DateTime, nullable=False)
     
     # Информация о рейсе
@@ -94,45 +118,68 @@ class Flight(db.Model):
     # Статус рейса
     status = db.Column(db.String(20), default='scheduled')  # scheduled, delayed, cancelled, boarding, departed
     
+    # Регулярное расписание, по которому создан рейс (None - рейс добавлен вручную)
+    pattern_id = db.Column(db.Integer, db.ForeignKey('schedule_pattern.id'))
+    
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Связь с бронированиями
     bookings = db.relationship('Booking', backref='flight', lazy=True)
     
-    @property
-    def duration(self):
-        """Возвращает продолжительность полета"""
-        return self.arrival_time - self.departure_time
+    # Рейсы авиакомпании по дате вылета (списки, фильтры, keyset-пагинация)
+    __table_args__ = (
+        # Поиск по началу номера рейса (LIKE 'prefix%' в PostgreSQL, см. _prefix_match в app.py)
+        db.Index('ix_flight_flight_number', 'flight_number', postgresql_ops={'flight_number': 'text_pattern_ops'}),
+        db.Index('ix_flight_airline_departure', 'airline_id', 'departure_time'),
+        # Ключ рейса при импорте расписания (см. schedule_import.py)
+        db.Index('ix_flight_airline_number_departure', 'airline_id', 'flight_number', 'departure_time'),
+        # Будущие рейсы расписания (развертывание и перенос изменений, см. schedules.py)
+        db.Index('ix_flight_pattern_departure', 'pattern_id', 'departure_time'),
+    )
 
-class Booking(db.Model):
+class SchedulePattern(db.Model):
+    """Регулярное расписание: рейс по дням недели в период действия (см. schedules.py)"""
     id = db.Column(db.Integer, primary_key=True)
-    booking_reference = db.Column(db.String(6), unique=True, nullable=False)  # Код бронирования
+    flight_number = db.Column(db.String(10), nullable=False)
+    airline_id = db.Column(db.Integer, db.ForeignKey('airline.id'), nullable=False)
+    departure_airport_id = db.Column(db.Integer, db.ForeignKey('airport.id'), nullable=False)
+    arrival_airport_id = db.Column(db.Integer, db.ForeignKey('airport.id'), nullable=False)
     
-    # Связи
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    flight_id = db.Column(db.Integer, db.ForeignKey('flight.id'), nullable=False)
+    # Дни недели - цифры ISO (1 - понедельник ... 7 - воскресенье), например '135'
+    days_of_week = db.Column(db.String(7), nullable=False)
+    valid_from = db.Column(db.Date, nullable=False)
+    valid_to = db.Column(db.Date)  # None - бессрочно
     
-    # Информация о пассажире
-    passenger_first_name = db.Column(db.String(50), nullable=False)
-    passenger_last_name = db.Column(db.String(50), nullable=False)
-    passenger_email = db.Column(db.String(120))
-    passenger_phone = db.Column(db.String(20))
+    # Время вылета и прибытия; arrival_day_offset - прибытие через N суток после вылета
+    departure_time = db.Column(db.Time, nullable=False)
+    arrival_time = db.Column(db.Time, nullable=False)
+    arrival_day_offset = db.Column(db.Integer, default=0, nullable=False)
     
-    # Детали бронирования
-    seat_class = db.Column(db.String(20), default='economy')  # economy, business, first
-    seat_number = db.Column(db.String(10))
-    price_paid = db.Column(db.Float, nullable=False)
+    aircraft_type = db.Column(db.String(50))
+    total_seats = db.Column(db.Integer, default=180, nullable=False)
+    economy_price = db.Column(db.Float, nullable=False)
+    business_price = db.Column(db.Float)
+    first_class_price = db.Column(db.Float)
     
-    # Статус и даты
-    status = db.Column(db.String(20), default='confirmed')  # confirmed, cancelled, checked_in, refunded
-    booking_date = db.Column(db.DateTime, default=datetime.utcnow)
-    cancelled_at = db.Column(db.DateTime)  # Дата отмены
-    cancellation_reason = db.Column(db.String(100))  # Причина отмены
+    is_active = db.Column(db.Boolean, default=True, nullable=False)
+    # Последняя дата, до которой по расписанию созданы рейсы
+    materialized_until = db.Column(db.Date)
     
-    # Дополнительные услуги
-    baggage_count = db.Column(db.Integer, default=1)
-    meal_preference = db.Column(db.String(50))
-    special_requests = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    airline = db.relationship('Airline', lazy=True)
+    departure_airport = db.relationship('Airport', foreign_keys=[departure_airport_id], lazy=True)
+    arrival_airport = db.relationship('Airport', foreign_keys=[arrival_airport_id], lazy=True)
+    flights = db.relationship('Flight', backref='pattern', lazy=True)
+    
+    def weekdays(self):
+        """Множество номеров дней недели (1-7), по которым выполняется рейс"""
+        return {int(day) for day in self.days_of_week}
+
+class BookingRulesMixin:
+    """Правила отмены и возврата, общие для действующих и архивных бронирований"""
+    is_archived = False
     
     def can_be_cancelled(self):
         """Проверяет, можно ли отменить бронирование"""
@@ -164,6 +211,43 @@ class Booking(db.Model):
         time_until_departure = self.flight.departure_time - datetime.utcnow()
         return time_until_departure.total_seconds() / 3600
 
+class Booking(BookingRulesMixin, db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    booking_reference = db.Column(db.String(6), unique=True, nullable=False)  # Код бронирования
+    
+    # Связи
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    flight_id = db.Column(db.Integer, db.ForeignKey('flight.id'), nullable=False)
+    
+    # Информация о пассажире
+    passenger_first_name = db.Column(db.String(50), nullable=False)
+    passenger_last_name = db.Column(db.String(50), nullable=False)
+    passenger_email = db.Column(db.String(120))
+    passenger_phone = db.Column(db.String(20))
+    
+    # Детали бронирования
+    seat_class = db.Column(db.String(20), default='economy')  # economy, business, first
+    seat_number = db.Column(db.String(10))
+    price_paid = db.Column(db.Float, nullable=False)
+    
+    # Статус и даты
+    status = db.Column(db.String(20), default='confirmed')  # confirmed, cancelled, checked_in, refunded
+    booking_date = db.Column(db.DateTime, default=datetime.utcnow)
+    cancelled_at = db.Column(db.DateTime)  # Дата отмены
+    cancellation_reason = db.Column(db.String(100))  # Причина отмены
+    
+    # Дополнительные услуги
+    baggage_count = db.Column(db.Integer, default=1)
+    meal_preference = db.Column(db.String(50))
+    special_requests = db.Column(db.Text)
+    
+    # Покрывающий индекс для отчетов по периодам (статистика, временные ряды)
+    # и индекс бронирований рейса по дате (списки пассажиров)
+    __table_args__ = (
+        db.Index('ix_booking_date_flight_price', 'booking_date', 'flight_id', 'price_paid'),
+        db.Index('ix_booking_flight_date', 'flight_id', 'booking_date'),
+    )
+
 class Payment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     booking_id = db.Column(db.Integer, db.ForeignKey('booking.id'), nullable=False)
@@ -176,6 +260,66 @@ class Payment(db.Model):
     # Связь с бронированием
     booking = db.relationship('Booking', backref=db.backref('payments', lazy=True))
 
+# АРХИВ
+# Рейсы, вылетевшие давно, переносятся вместе с бронированиями и платежами
+# в таблицы *_archive (см. archive.py). Колонки повторяют действующие таблицы,
+# идентификаторы сохраняются, ссылки на рейс и бронирование указывают на архив.
+
+def _archive_table(source, *indexes):
+    columns = []
+    for column in source.columns:
+        foreign_keys = []
+        for foreign_key in column.foreign_keys:
+            table_name, column_name = foreign_key.target_fullname.split('.')
+            if table_name in ('flight', 'booking'):
+                table_name += '_archive'
+            foreign_keys.append(db.ForeignKey(f'{table_name}.{column_name}'))
+        columns.append(db.Column(column.name, column.type, *foreign_keys,
+                                 primary_key=column.primary_key, nullable=column.nullable,
+                                 autoincrement=False))
+    return db.Table(f'{source.name}_archive', db.metadata, *columns,
+                    db.Column('archived_at', db.DateTime, nullable=False), *indexes)
+
+flight_archive = _archive_table(
+    Flight.__table__,
+    db.Index('ix_flight_archive_departure_time', 'departure_time'),
+    db.Index('ix_flight_archive_airline_departure', 'airline_id', 'departure_time'),
+)
+booking_archive = _archive_table(
+    Booking.__table__,
+    db.Index('ix_booking_archive_user_id', 'user_id'),
+    db.Index('ix_booking_archive_flight_id', 'flight_id'),
+    db.Index('ix_booking_archive_reference', 'booking_reference'),
+    db.Index('ix_booking_archive_date_flight_price', 'booking_date', 'flight_id', 'price_paid'),
+)
+payment_archive = _archive_table(
+    Payment.__table__,
+    db.Index('ix_payment_archive_booking_id', 'booking_id'),
+)
+
+class ArchivedFlight(FlightTimesMixin, db.Model):
+    """Архивный рейс (только чтение)"""
+    __table__ = flight_archive
+    is_archived = True
+
+    departure_airport = db.relationship('Airport', foreign_keys=[flight_archive.c.departure_airport_id], lazy=True)
+    arrival_airport = db.relationship('Airport', foreign_keys=[flight_archive.c.arrival_airport_id], lazy=True)
+    airline = db.relationship('Airline', lazy=True)
+    bookings = db.relationship('ArchivedBooking', backref='flight', lazy=True)
+
+class ArchivedBooking(BookingRulesMixin, db.Model):
+    """Архивное бронирование (только чтение)"""
+    __table__ = booking_archive
+    is_archived = True
+
+    user = db.relationship('User', lazy=True)
+    payments = db.relationship('ArchivedPayment', backref='booking', lazy=True)
+
+class ArchivedPayment(db.Model):
+    """Архивный платеж (только чтение)"""
+    __table__ = payment_archive
+    is_archived = True
+
 class Banner(db.Model):
     """Модель рекламного баннера"""
     id = db.Column(db.Integer, primary_key=True)
@@ -228,12 +372,14 @@ class Banner(db.Model):
     
     def increment_views(self):
         """Увеличивает счетчик просмотров"""
-        self.views_count += 1
+        # Увеличение на стороне БД: не теряет параллельные показы
+        # и не зависит от значения, прочитанного из реплики
+        self.views_count = Banner.views_count + 1
         db.session.commit()
     
     def increment_clicks(self):
         """Увеличивает счетчик кликов"""
-        self.clicks_count += 1
+        self.clicks_count = Banner.clicks_count + 1
         db.session.commit()
     
     def to_dict(self):
@@ -0,0 +1,132 @@
+"""
+Keyset-пагинация (постраничный вывод по курсору).
+
+В отличие от OFFSET, следующая страница выбирается условием
+"строго после последней показанной строки" по ключу сортировки,
+поэтому стоимость запроса не растет с номером страницы.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(values):
+    """Кодирует значения ключа сортировки в строку для URL"""
+    def default(value):
+        if isinstance(value, datetime):
+            return {'dt': value.isoformat()}
+        raise TypeError(f'Неподдерживаемый тип в курсоре: {type(value).__name__}')
+
+    raw = json.dumps(list(values), default=default, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Декодирует курсор; при поврежденном значении возбуждает ValueError"""
+    def object_hook(value):
+        if set(value) != {'dt'} or not isinstance(value['dt'], str):
+            raise ValueError('Некорректное значение в курсоре')
+        return datetime.fromisoformat(value['dt'])
+
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode('ascii'))
+        values = json.loads(raw.decode('utf-8'), object_hook=object_hook)
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise ValueError('Некорректный курсор') from e
+
+    if not isinstance(values, list):
+        raise ValueError('Некорректный курсор')
+    return values
+
+
+def _check_values(columns, values):
+    """
+    Проверяет, что значения курсора подходят к колонкам сортировки по числу
+    и типу: иначе подделанный курсор дошел бы до SQL-сравнения.
+    """
+    if len(values) != len(columns):
+        raise ValueError('Некорректный курсор')
+    for column, value in zip(columns, values):
+        try:
+            expected = column.type.python_type
+        except NotImplementedError:
+            expected = object
+        if expected is float:
+            expected = (int, float)
+        # bool - подкласс int, но в курсоре id он не встречается
+        if isinstance(value, bool) or not isinstance(value, expected):
+            raise ValueError('Некорректный курсор')
+
+
+def _after(columns, values, descending):
+    """
+    Условие "строка идет после values" для сортировки по columns:
+    a > x OR (a = x AND b > y) ... (для убывания знаки меняются).
+    """
+    column, value = columns[0], values[0]
+    beyond = column < value if descending else column > value
+    if len(columns) == 1:
+        return beyond
+    return or_(beyond, and_(column == value, _after(columns[1:], values[1:], descending)))
+
+
+class KeysetPage:
+    """Страница результатов и курсор следующей страницы"""
+
+    __slots__ = ('items', 'next_cursor')
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_more(self):
+        return self.next_cursor is not None
+
+
+def keyset_paginate(query, columns, cursor=None, limit=50, descending=False, key=None):
+    """
+    Возвращает KeysetPage для query, упорядоченного по columns.
+    Последняя колонка должна быть уникальной (обычно id), значения колонок
+    не должны быть NULL. key(item) -> значения колонок для курсора
+    (по умолчанию атрибуты объекта с именами колонок).
+    """
+    if cursor:
+        values = decode_cursor(cursor)
+        _check_values(columns, values)
+        query = query.filter(_after(columns, values, descending))
+
+    ordering = [column.desc() if descending else column.asc() for column in columns]
+    items = query.order_by(*ordering).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        if key is None:
+            values = [getattr(last, column.key) for column in columns]
+        else:
+            values = key(last)
+        next_cursor = encode_cursor(values)
+
+    return KeysetPage(items, next_cursor)
+
+
+def merge_keyset_pages(pages, limit, key, descending=False):
+    """
+    Сливает страницы нескольких источников (например, действующей таблицы и архива),
+    прочитанные с одним курсором, в одну страницу из limit строк по ключу сортировки.
+    Ключи строк разных источников не должны совпадать.
+    """
+    items = sorted((item for page in pages for item in page.items), key=key, reverse=descending)
+    has_more = len(items) > limit or any(page.has_more for page in pages)
+    items = items[:limit]
+
+    next_cursor = None
+    if has_more and items:
+        next_cursor = encode_cursor(key(items[-1]))
+    return KeysetPage(items, next_cursor)
@@ -0,0 +1,62 @@
+"""
+Кэш пользователей (principal) для user_loader.
+
+Изменение пользователя в другом процессе (worker, manage.py) доходит до кэша
+через общую версию группы 'user' (см. cache.py): блокировка или смена роли
+вступает в силу не позже чем через CACHE_SYNC_SECONDS.
+"""
+from sqlalchemy.orm import make_transient_to_detached
+
+from cache import VersionedTTLCache, get_version, invalidate_on_change
+from dbrouting import primary_reads
+from models import db, User
+
+
+def user_namespace(user_id):
+    """Пространство версий данных одного пользователя"""
+    return ('user', user_id)
+
+
+# Любое изменение пользователя (смена роли, блокировка, назначение
+# менеджера в авиакомпанию и т.д.) делает закэшированную запись неактуальной;
+# нового пользователя в кэшах еще нет
+invalidate_on_change((User,), lambda user: (user_namespace(user.id),), on_create=False)
+
+_USER_COLUMNS = tuple(column.key for column in User.__table__.columns)
+
+
+class UserPrincipalCache:
+    """
+    Кэш пользователей для user_loader: хранит значения колонок User
+    и восстанавливает из них объект в текущей сессии без запроса к БД.
+    """
+
+    def __init__(self, ttl=300, maxsize=4096):
+        self._cache = VersionedTTLCache(ttl=ttl, maxsize=maxsize)
+
+    def load(self, user_id):
+        version = get_version(user_namespace(user_id))
+        values = self._cache.get(user_id, version)
+        if values is not None:
+            return self._restore(values)
+
+        # Права и блокировка читаются из основной базы: запись из отстающей
+        # реплики осталась бы в кэше до следующего изменения пользователя
+        with primary_reads():
+            user = db.session.get(User, user_id)
+        if user is not None:
+            self._cache.set(user_id, {key: getattr(user, key) for key in _USER_COLUMNS}, version)
+        return user
+
+    @staticmethod
+    def _restore(values):
+        user = User()
+        for key, value in values.items():
+            setattr(user, key, value)
+        # Объект считается загруженным из БД: связи (bookings, company)
+        # подгружаются как обычно, а изменения сохраняются через UPDATE
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    def clear(self):
+        self._cache.clear()
@@ -0,0 +1,86 @@
+"""
+Подсчет SQL-запросов для проверки страниц на N+1.
+
+Бюджеты QUERY_BUDGETS проверяются тестом tests/test_query_budgets.py.
+
+Пример использования в тестах:
+
+    with assert_max_queries(db.engine, 8):
+        response = client.get('/profile')
+
+    response, count = count_page_queries(client, db.engine, '/admin')
+"""
+import threading
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+# Допустимое количество запросов на отрисовку страницы.
+# Не зависит от числа строк: рост означает появление N+1.
+QUERY_BUDGETS = {
+    '/': 8,
+    '/search': 10,
+    '/profile': 4,
+    '/admin': 10,
+    '/admin/flights': 4,
+    '/manager': 8,
+    '/manager/flights': 4,
+    '/manager/passengers': 5,
+}
+
+
+class QueryCounter:
+    """Считает SQL-запросы, выполненные через engine в текущем потоке"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+        self._thread = threading.get_ident()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == self._thread:
+            self.statements.append(statement)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        event.remove(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+        return False
+
+
+@contextmanager
+def assert_max_queries(engine, limit):
+    """Падает с AssertionError, если внутри блока выполнено больше limit запросов"""
+    with QueryCounter(engine) as counter:
+        yield counter
+
+    if counter.count > limit:
+        statements = '\n'.join(f'  {i + 1}. {statement}' for i, statement in enumerate(counter.statements))
+        raise AssertionError(f'Выполнено {counter.count} SQL-запросов, допустимо {limit}:\n{statements}')
+
+
+def count_page_queries(client, engine, url):
+    """Выполняет GET url тестовым клиентом и возвращает (response, количество запросов)"""
+    with QueryCounter(engine) as counter:
+        response = client.get(url)
+    return response, counter.count
+
+
+def check_query_budgets(client, engine, budgets=None):
+    """
+    Проверяет страницы из budgets ({url: лимит}) для уже авторизованного клиента.
+    Возвращает список нарушений [(url, количество, лимит)]; страницы,
+    недоступные клиенту (редирект, 403), пропускаются.
+    """
+    violations = []
+    for url, limit in (budgets or QUERY_BUDGETS).items():
+        response, count = count_page_queries(client, engine, url)
+        if response.status_code == 200 and count > limit:
+            violations.append((url, count, limit))
+    return violations
@@ -0,0 +1,102 @@
+import threading
+from collections import namedtuple
+
+from sqlalchemy import select
+
+from cache import get_version, invalidate_on_change
+from dbrouting import primary_reads
+from models import db, Airport, Airline
+
+# Справочники меняются только при изменении аэропортов и авиакомпаний
+REFERENCE_NAMESPACE = 'reference'
+invalidate_on_change((Airport, Airline), lambda obj: (REFERENCE_NAMESPACE,))
+
+# Неизменяемые записи справочников: их можно разделять между запросами и потоками,
+# в отличие от ORM-объектов, привязанных к сессии
+AirportRef = namedtuple('AirportRef', 'id code name city country')
+AirlineRef = namedtuple('AirlineRef', 'id code name country')
+
+
+class ReferenceData:
+    """Снимок справочников аэропортов и авиакомпаний с готовыми списками выбора"""
+
+    def __init__(self, airports, airlines):
+        self.airports = tuple(airports)
+        self.airlines = tuple(airlines)
+        self.airports_by_id = {airport.id: airport for airport in self.airports}
+        self.airlines_by_id = {airline.id: airline for airline in self.airlines}
+        self.airports_by_code = {airport.code: airport for airport in self.airports}
+        self.airlines_by_code = {airline.code: airline for airline in self.airlines}
+
+        # Готовые choices для SelectField форм рейсов
+        self.airport_choices = [(airport.id, f"{airport.code} - {airport.city}") for airport in self.airports]
+        self.airline_choices = [(airline.id, f"{airline.code} - {airline.name}") for airline in self.airlines]
+
+        # Уникальные города для автодополнения поиска
+        self.cities = sorted({airport.city for airport in self.airports})
+        self._cities_lower = [(city.lower(), city) for city in self.cities]
+
+    def airport_label(self, airport_id):
+        airport = self.airports_by_id.get(airport_id)
+        return f"{airport.city} ({airport.code})" if airport else None
+
+    def airline_name(self, airline_id):
+        airline = self.airlines_by_id.get(airline_id)
+        return airline.name if airline else None
+
+    def search_cities(self, query, limit=15):
+        """Города, содержащие query без учета регистра (не больше limit)"""
+        query = query.lower()
+        result = []
+        for city_lower, city in self._cities_lower:
+            if query in city_lower:
+                result.append(city)
+                if len(result) >= limit:
+                    break
+        return result
+
+
+def load_reference_data():
+    """Читает справочники двумя запросами без создания ORM-объектов"""
+    connection = db.session.connection()
+    airports = connection.execute(
+        select(Airport.id, Airport.code, Airport.name, Airport.city, Airport.country).order_by(Airport.id)
+    ).all()
+    airlines = connection.execute(
+        select(Airline.id, Airline.code, Airline.name, Airline.country).order_by(Airline.id)
+    ).all()
+    return ReferenceData(
+        (AirportRef(*row) for row in airports),
+        (AirlineRef(*row) for row in airlines),
+    )
+
+
+class ReferenceDataCache:
+    """
+    Кэш справочников на процесс; перестраивается после изменения аэропортов или авиакомпаний,
+    в том числе в другом процессе (общая версия 'reference', см. cache.sync_shared_versions)
+    """
+
+    def __init__(self):
+        self._data = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        version = get_version(REFERENCE_NAMESPACE)
+        if self._data is not None and self._version == version:
+            return self._data
+
+        with self._lock:
+            if self._data is None or self._version != version:
+                # Снимок хранится до следующего изменения справочников,
+                # поэтому строится по основной базе, а не по реплике
+                with primary_reads():
+                    self._data = load_reference_data()
+                self._version = version
+            return self._data
+
+    def clear(self):
+        with self._lock:
+            self._data = None
+            self._version = None
@@ -0,0 +1,360 @@
+"""
+Массовый импорт расписания рейсов из CSV.
+
+Файл читается потоково построчно; коды аэропортов и авиакомпаний
+разрешаются по снимку справочников (refdata.py) без запросов к БД.
+Проверенные строки записываются пакетами: существующие рейсы ищутся одним
+запросом на пакет, новые вставляются, а найденные обновляются через
+executemany. Каждый пакет - отдельная транзакция; ошибочные строки
+пропускаются и попадают в отчет с номером строки файла.
+
+Рейс определяется авиакомпанией, номером и временем вылета. Колонки
+(разделитель - запятая или точка с запятой, порядок любой):
+
+    flight_number, airline, departure_airport, arrival_airport,
+    departure_time, arrival_time, economy_price           - обязательные
+    aircraft_type, total_seats, business_price,
+    first_class_price, status                             - необязательные
+
+Необязательные колонки, которых нет в файле, у существующих рейсов не меняются,
+а новым рейсам задаются по умолчанию (INSERT_DEFAULTS).
+
+Вместо названий колонок можно использовать сокращения в духе SSIM
+(carrier, flight, origin, destination, std, sta, equipment, seats).
+Время - ГГГГ-ММ-ДД ЧЧ:ММ (или с T) либо ДД.ММ.ГГГГ ЧЧ:ММ, без часового пояса.
+
+    python manage.py import-schedule schedule.csv [--batch-size 5000] [--dry-run]
+    POST /admin/flights/import  (multipart, поле file)
+"""
+import csv
+import functools
+import itertools
+import time
+from datetime import datetime
+
+from sqlalchemy import bindparam, case, select, tuple_, update
+
+from cache import bump_version
+from models import db, Flight
+from stats import STATISTICS_NAMESPACE, flight_namespace
+
+# Строк в одном пакете записи (и в одной транзакции)
+IMPORT_BATCH_SIZE = 5000
+
+# Сколько ошибок строк хранится в отчете (считаются все)
+MAX_REPORTED_ERRORS = 1000
+
+REQUIRED_COLUMNS = (
+    'flight_number', 'airline', 'departure_airport', 'arrival_airport',
+    'departure_time', 'arrival_time', 'economy_price',
+)
+OPTIONAL_COLUMNS = ('aircraft_type', 'total_seats', 'business_price', 'first_class_price', 'status')
+
+COLUMN_ALIASES = {
+    'flight': 'flight_number',
+    'carrier': 'airline',
+    'airline_code': 'airline',
+    'origin': 'departure_airport',
+    'destination': 'arrival_airport',
+    'std': 'departure_time',
+    'sta': 'arrival_time',
+    'equipment': 'aircraft_type',
+    'seats': 'total_seats',
+}
+
+FLIGHT_STATUSES = ('scheduled', 'delayed', 'cancelled', 'boarding', 'departed')
+
+# Колонки рейса, которые импорт задает и обновляет
+FLIGHT_FIELDS = (
+    'flight_number', 'airline_id', 'departure_airport_id', 'arrival_airport_id',
+    'departure_time', 'arrival_time', 'aircraft_type', 'total_seats',
+    'economy_price', 'business_price', 'first_class_price', 'status',
+)
+
+
+# Значения необязательных колонок для новых рейсов, если колонки нет в файле;
+# у существующих рейсов отсутствующие в файле колонки не меняются
+INSERT_DEFAULTS = {
+    'aircraft_type': None,
+    'total_seats': 180,
+    'business_price': None,
+    'first_class_price': None,
+    'status': 'scheduled',
+}
+
+
+class ScheduleFormatError(ValueError):
+    """Файл не может быть импортирован целиком (нет заголовка или обязательных колонок)"""
+
+
+class ImportReport:
+    """Итоги импорта: счетчики и ошибки строк"""
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+        self.started = time.perf_counter()
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def to_dict(self):
+        return {
+            'rows': self.rows,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'dry_run': self.dry_run,
+            'seconds': round(time.perf_counter() - self.started, 3),
+        }
+
+
+# РАЗБОР СТРОК
+
+def _parse_datetime(value):
+    """Время без часового пояса; ValueError - неизвестный формат или указан пояс"""
+    value = value.strip()
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        try:
+            return datetime.strptime(value, '%d.%m.%Y %H:%M')
+        except ValueError:
+            raise ValueError('Некорректное время (ожидается ГГГГ-ММ-ДД ЧЧ:ММ)')
+    if parsed.tzinfo is not None:
+        # Время рейсов хранится без пояса: смешение с ним давало бы TypeError при сравнении
+        raise ValueError(f'Время с часовым поясом не поддерживается: {value}')
+    return parsed
+
+
+def _positive_number(value, convert, label):
+    """Число из текста value (None, если пусто); ValueError - не число или не больше нуля"""
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        number = convert(value)
+    except ValueError:
+        raise ValueError(f'{label}: некорректное число {value}')
+    if number <= 0:
+        raise ValueError(f'{label}: значение должно быть больше нуля')
+    return number
+
+
+class RowParser:
+    """Проверка строки и перевод кодов справочников в id"""
+
+    def __init__(self, reference, company_id=None):
+        self.airports = {code.upper(): airport.id for code, airport in reference.airports_by_code.items()}
+        self.airlines = {code.upper(): airline.id for code, airline in reference.airlines_by_code.items()}
+        self.company_id = company_id
+
+    def parse(self, row):
+        """Словарь колонок рейса для строки row ({колонка: текст}); ValueError - описание ошибки"""
+        flight_number = row['flight_number'].strip().upper()
+        if not flight_number or len(flight_number) > 10:
+            raise ValueError('Номер рейса обязателен и не длиннее 10 символов')
+
+        airline_code = row['airline'].strip().upper()
+        airline_id = self.airlines.get(airline_code)
+        if airline_id is None:
+            raise ValueError(f'Неизвестная авиакомпания: {airline_code}')
+        if self.company_id is not None and airline_id != self.company_id:
+            raise ValueError(f'Можно импортировать только рейсы своей авиакомпании: {airline_code}')
+
+        departure_code = row['departure_airport'].strip().upper()
+        arrival_code = row['arrival_airport'].strip().upper()
+        departure_airport_id = self.airports.get(departure_code)
+        arrival_airport_id = self.airports.get(arrival_code)
+        if departure_airport_id is None:
+            raise ValueError(f'Неизвестный аэропорт вылета: {departure_code}')
+        if arrival_airport_id is None:
+            raise ValueError(f'Неизвестный аэропорт прибытия: {arrival_code}')
+        if departure_airport_id == arrival_airport_id:
+            raise ValueError('Аэропорты вылета и прибытия совпадают')
+
+        departure_time = _parse_datetime(row['departure_time'])
+        arrival_time = _parse_datetime(row['arrival_time'])
+        if arrival_time <= departure_time:
+            raise ValueError('Время прибытия должно быть позже времени вылета')
+
+        economy_price = _positive_number(row['economy_price'], float, 'Цена эконом')
+        if economy_price is None:
+            raise ValueError('Цена эконом обязательна')
+        values = {
+            'flight_number': flight_number,
+            'airline_id': airline_id,
+            'departure_airport_id': departure_airport_id,
+            'arrival_airport_id': arrival_airport_id,
+            'departure_time': departure_time,
+            'arrival_time': arrival_time,
+            'economy_price': economy_price,
+        }
+
+        # Необязательные колонки попадают в результат, только если они есть в файле
+        if 'business_price' in row:
+            values['business_price'] = _positive_number(row['business_price'], float, 'Цена бизнес')
+        if 'first_class_price' in row:
+            values['first_class_price'] = _positive_number(row['first_class_price'], float, 'Цена первого класса')
+        if 'total_seats' in row:
+            values['total_seats'] = (_positive_number(row['total_seats'], int, 'Количество мест')
+                                     or INSERT_DEFAULTS['total_seats'])
+
+        if 'aircraft_type' in row:
+            aircraft_type = row['aircraft_type'].strip() or None
+            if aircraft_type and len(aircraft_type) > 50:
+                raise ValueError('Тип самолета не длиннее 50 символов')
+            values['aircraft_type'] = aircraft_type
+
+        if 'status' in row:
+            status = row['status'].strip().lower() or INSERT_DEFAULTS['status']
+            if status not in FLIGHT_STATUSES:
+                raise ValueError(f'Неизвестный статус: {status}')
+            values['status'] = status
+
+        return values
+
+
+def read_schedule(lines):
+    """
+    Итератор (номер строки, {колонка: текст}) по строкам CSV.
+    Разделитель определяется по заголовку; ScheduleFormatError - нет обязательных колонок.
+    """
+    lines = iter(lines)
+    header_line = next(lines, '')
+    if not header_line.strip():
+        raise ScheduleFormatError('Файл пуст')
+    delimiter = ';' if header_line.count(';') > header_line.count(',') else ','
+
+    reader = csv.reader(itertools.chain([header_line], lines), delimiter=delimiter)
+    header = []
+    for name in next(reader):
+        name = name.strip().lower().replace(' ', '_')
+        header.append(COLUMN_ALIASES.get(name, name))
+
+    missing = [name for name in REQUIRED_COLUMNS if name not in header]
+    if missing:
+        raise ScheduleFormatError(f"Нет обязательных колонок: {', '.join(missing)}")
+
+    indexes = [(name, header.index(name)) for name in REQUIRED_COLUMNS + OPTIONAL_COLUMNS if name in header]
+    for values in reader:
+        if not any(values):
+            continue
+        yield reader.line_num, {
+            name: values[index] if index < len(values) else ''
+            for name, index in indexes
+        }
+
+
+# ЗАПИСЬ
+
+_flights = Flight.__table__
+
+
+
+@functools.lru_cache(maxsize=None)
+def _update_flight(fields):
+    """
+    UPDATE ... WHERE id = :b_id для колонок fields (одним executemany на пакет).
+    Свободные места сдвигаются на изменение вместимости, чтобы не потерять проданные.
+    """
+    values = {field: bindparam(f'b_{field}') for field in fields}
+    if 'total_seats' in fields:
+        seats_left = _flights.c.available_seats + bindparam('b_total_seats') - _flights.c.total_seats
+        values['available_seats'] = case((seats_left < 0, 0), else_=seats_left)
+    return update(_flights).where(_flights.c.id == bindparam('b_id')).values(**values)
+
+
+def _flight_key(values):
+    return values['airline_id'], values['flight_number'], values['departure_time']
+
+
+def _existing_flights(batch):
+    """{ключ рейса: id} для рейсов пакета, уже записанных в БД (один запрос по индексу ключа)"""
+    key_columns = tuple_(Flight.airline_id, Flight.flight_number, Flight.departure_time)
+    rows = db.session.connection().execute(
+        select(Flight.airline_id, Flight.flight_number, Flight.departure_time, Flight.id)
+        .where(key_columns.in_(list(batch)))
+        .order_by(Flight.id.desc())
+    )
+    # При нескольких рейсах с одним ключом обновляется первый по id
+    return {(airline_id, flight_number, departure_time): flight_id
+            for airline_id, flight_number, departure_time, flight_id in rows}
+
+
+def _write_batch(batch, report):
+    existing = _existing_flights(batch)
+    # Обновления группируются по набору колонок: меняются только колонки из файла
+    inserts, updates = [], {}
+    for key, values in batch.items():
+        if key in existing:
+            fields = tuple(field for field in FLIGHT_FIELDS if field in values)
+            params = {f'b_{field}': values[field] for field in fields}
+            params['b_id'] = existing[key]
+            updates.setdefault(fields, []).append(params)
+        else:
+            values = dict(INSERT_DEFAULTS, **values)
+            inserts.append(dict(values, available_seats=values['total_seats']))
+    updated_ids = [params['b_id'] for group in updates.values() for params in group]
+
+    if report.dry_run:
+        report.inserted += len(inserts)
+        report.updated += len(updated_ids)
+        return
+
+    try:
+        if inserts:
+            db.session.execute(_flights.insert(), inserts)
+        for fields, group in updates.items():
+            db.session.execute(_update_flight(fields), group)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    report.inserted += len(inserts)
+    report.updated += len(updated_ids)
+    # Core-запросы не проходят через события сессии: кэши сбрасываются явно. Общие версии
+    # групп доходят и до работающего сервера, когда импорт запущен из manage.py
+    bump_version(STATISTICS_NAMESPACE, *(flight_namespace(flight_id) for flight_id in updated_ids))
+
+
+def import_schedule(lines, reference, company_id=None, batch_size=IMPORT_BATCH_SIZE,
+                    dry_run=False, progress=None):
+    """
+    Импортирует расписание из строк CSV lines. reference - снимок справочников
+    (ReferenceData), company_id - ограничение авиакомпанией менеджера.
+    Возвращает ImportReport; ScheduleFormatError - файл не подходит целиком.
+    """
+    parser = RowParser(reference, company_id)
+    report = ImportReport(dry_run)
+
+    # Ключ рейса -> колонки; повтор рейса в одном пакете заменяет предыдущую строку
+    batch = {}
+    for line, row in read_schedule(lines):
+        report.rows += 1
+        try:
+            values = parser.parse(row)
+        except ValueError as e:
+            report.add_error(line, str(e))
+            continue
+
+        batch[_flight_key(values)] = values
+        if len(batch) >= batch_size:
+            _write_batch(batch, report)
+            batch = {}
+            if progress:
+                progress(report)
+
+    if batch:
+        _write_batch(batch, report)
+        if progress:
+            progress(report)
+    return report
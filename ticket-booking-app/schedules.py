@@ -0,0 +1,193 @@
+"""
+Регулярные расписания (SchedulePattern) и их развертывание в рейсы.
+
+Рейсы по расписанию создаются не сразу на весь период действия, а на
+скользящий горизонт SCHEDULE_HORIZON_DAYS дней вперед: пакетная команда
+досоздает недостающие вылеты массовой вставкой (executemany), отмечая
+в materialized_until, до какой даты расписание уже развернуто.
+
+    python manage.py materialize              # по настройкам приложения
+    python manage.py materialize --days 30
+
+Изменения расписания переносятся на будущие рейсы без бронирований
+одним UPDATE (update_pattern_flights); рейсы с бронированиями не меняются.
+Если изменились дни, время или период действия, такие рейсы удаляются
+одним DELETE и создаются заново при развертывании.
+
+Кэши статистики и рейсов сбрасываются через bump_version, в том числе
+у работающего сервера, если команда запущена из manage.py (общие версии, см. cache.py).
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, delete, exists, or_, select, update
+
+from cache import bump_version
+from models import db, Flight, Booking, SchedulePattern
+from stats import STATISTICS_NAMESPACE, flight_namespace
+
+# Поля расписания, определяющие даты и время вылетов: при их изменении
+# будущие рейсы создаются заново
+RESCHEDULE_FIELDS = (
+    'days_of_week', 'valid_from', 'valid_to',
+    'departure_time', 'arrival_time', 'arrival_day_offset',
+)
+
+_flights = Flight.__table__
+
+
+def pattern_dates(pattern, start, end):
+    """Даты вылетов по расписанию pattern в интервале [start, end]"""
+    weekdays = pattern.weekdays()
+    day = max(start, pattern.valid_from)
+    if pattern.valid_to is not None:
+        end = min(end, pattern.valid_to)
+    while day <= end:
+        if day.isoweekday() in weekdays:
+            yield day
+        day += timedelta(days=1)
+
+
+def _flight_values(pattern):
+    """Колонки рейса, которые берутся из расписания (кроме дат и времени)"""
+    return {
+        'flight_number': pattern.flight_number,
+        'airline_id': pattern.airline_id,
+        'departure_airport_id': pattern.departure_airport_id,
+        'arrival_airport_id': pattern.arrival_airport_id,
+        'aircraft_type': pattern.aircraft_type,
+        'total_seats': pattern.total_seats,
+        'available_seats': pattern.total_seats,
+        'economy_price': pattern.economy_price,
+        'business_price': pattern.business_price,
+        'first_class_price': pattern.first_class_price,
+    }
+
+
+def materialize_pattern(pattern, until, today):
+    """
+    Создает рейсы расписания с today (или с уже развернутой даты) по until
+    одной массовой вставкой; возвращает количество новых рейсов. Коммит - за вызывающим.
+    """
+    start = today
+    if pattern.materialized_until is not None:
+        start = max(start, pattern.materialized_until + timedelta(days=1))
+
+    dates = list(pattern_dates(pattern, start, until))
+    if not dates:
+        pattern.materialized_until = until
+        return 0
+
+    # Дни, на которые рейс уже есть (например, оставшийся с бронированиями после изменения расписания)
+    existing = {
+        departure.date() for departure in db.session.execute(
+            select(Flight.departure_time).where(
+                Flight.pattern_id == pattern.id,
+                Flight.departure_time >= datetime.combine(dates[0], datetime.min.time()),
+                Flight.departure_time < datetime.combine(dates[-1] + timedelta(days=1), datetime.min.time()),
+            )
+        ).scalars()
+    }
+
+    values = _flight_values(pattern)
+    rows = []
+    for day in dates:
+        if day in existing:
+            continue
+        arrival_day = day + timedelta(days=pattern.arrival_day_offset or 0)
+        rows.append(dict(
+            values,
+            pattern_id=pattern.id,
+            departure_time=datetime.combine(day, pattern.departure_time),
+            arrival_time=datetime.combine(arrival_day, pattern.arrival_time),
+            status='scheduled',
+        ))
+
+    if rows:
+        db.session.execute(_flights.insert(), rows)
+    pattern.materialized_until = until
+    return len(rows)
+
+
+def materialize_patterns(horizon_days, today=None, pattern_ids=None, progress=None):
+    """
+    Разворачивает действующие расписания на horizon_days дней вперед
+    (каждое расписание - отдельная транзакция). Возвращает (расписаний, рейсов).
+    """
+    today = today or datetime.utcnow().date()
+    until = today + timedelta(days=horizon_days)
+
+    query = SchedulePattern.query.filter(
+        SchedulePattern.is_active.is_(True),
+        or_(SchedulePattern.materialized_until.is_(None), SchedulePattern.materialized_until < until),
+        or_(SchedulePattern.valid_to.is_(None), SchedulePattern.valid_to >= today),
+    )
+    if pattern_ids is not None:
+        query = query.filter(SchedulePattern.id.in_(pattern_ids))
+
+    patterns = created = 0
+    for pattern in query.order_by(SchedulePattern.id).all():
+        try:
+            created += materialize_pattern(pattern, until, today)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        patterns += 1
+        if progress:
+            progress(patterns, created)
+
+    if created:
+        # Вставка идет мимо событий сессии: статистика сбрасывается явно
+        bump_version(STATISTICS_NAMESPACE)
+    return patterns, created
+
+
+def _unbooked_future_flights(pattern_id, now):
+    return and_(
+        _flights.c.pattern_id == pattern_id,
+        _flights.c.departure_time > now,
+        ~exists().where(Booking.flight_id == _flights.c.id),
+    )
+
+
+def update_pattern_flights(pattern, reschedule=False, now=None):
+    """
+    Переносит изменения расписания на его будущие рейсы без бронирований:
+    одним UPDATE или, если изменились даты и время (reschedule) либо
+    расписание отключено, одним DELETE - такие рейсы создаются заново при
+    развертывании. Возвращает id измененных рейсов; коммит - за вызывающим.
+    """
+    now = now or datetime.utcnow()
+    condition = _unbooked_future_flights(pattern.id, now)
+
+    if reschedule or not pattern.is_active:
+        statement = delete(_flights).where(condition)
+        pattern.materialized_until = None
+    else:
+        statement = update(_flights).where(condition).values(**_flight_values(pattern))
+    return db.session.execute(statement.returning(_flights.c.id)).scalars().all()
+
+
+def save_pattern(pattern, horizon_days, reschedule=False):
+    """
+    Сохраняет новое или измененное расписание, переносит изменения на будущие
+    рейсы и сразу разворачивает его на горизонт. Возвращает (изменено рейсов, создано рейсов).
+    """
+    try:
+        db.session.add(pattern)
+        db.session.flush()
+        flight_ids = update_pattern_flights(pattern, reschedule)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    # Core-запросы не проходят через события сессии: кэши сбрасываются явно
+    bump_version(STATISTICS_NAMESPACE, *(flight_namespace(flight_id) for flight_id in flight_ids))
+    _, created = materialize_patterns(horizon_days, pattern_ids=[pattern.id])
+    return len(flight_ids), created
+
+
+def reschedule_needed(pattern, previous):
+    """True, если значения RESCHEDULE_FIELDS расписания отличаются от previous ({поле: значение})"""
+    return any(getattr(pattern, field) != previous[field] for field in RESCHEDULE_FIELDS)
@@ -0,0 +1,142 @@
+"""
+Профилирование SQL-запросов в рамках HTTP-запроса.
+
+Считает и замеряет время запросов через события SQLAlchemy, находит
+повторяющиеся запросы одной формы (N+1), добавляет заголовки
+Server-Timing / X-DB-Queries и пишет в лог медленные запросы.
+
+Включается настройкой SQL_PROFILING; при выключенном профилировании
+обработчики событий не регистрируются и накладных расходов нет.
+"""
+import time
+from collections import defaultdict
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+# Длина текста запроса в логах
+STATEMENT_PREVIEW_LENGTH = 300
+
+
+class RequestProfile:
+    """SQL-статистика одного HTTP-запроса"""
+
+    __slots__ = ('started_at', 'count', 'duration', 'shapes')
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.count = 0
+        self.duration = 0.0
+        # Текст запроса -> [количество выполнений, суммарное время]
+        self.shapes = defaultdict(lambda: [0, 0.0])
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        shape = self.shapes[statement]
+        shape[0] += 1
+        shape[1] += duration
+
+    def repeated(self, threshold):
+        """Запросы одной формы, выполненные не меньше threshold раз: [(текст, количество)]"""
+        return sorted(
+            ((statement, count) for statement, (count, _) in self.shapes.items() if count >= threshold),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+
+    def slowest(self, limit):
+        """Запросы с наибольшим суммарным временем: [(текст, количество, время)]"""
+        items = [(statement, count, duration) for statement, (count, duration) in self.shapes.items()]
+        items.sort(key=lambda item: item[2], reverse=True)
+        return items[:limit]
+
+
+def _current_profile():
+    if has_request_context():
+        return g.get('sql_profile')
+    return None
+
+
+def _preview(statement):
+    statement = ' '.join(statement.split())
+    if len(statement) > STATEMENT_PREVIEW_LENGTH:
+        return statement[:STATEMENT_PREVIEW_LENGTH] + '...'
+    return statement
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile() is not None:
+        conn.info.setdefault('sql_profile_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile()
+    starts = conn.info.get('sql_profile_start')
+    if profile is None or not starts:
+        return
+    profile.record(statement, time.perf_counter() - starts.pop())
+
+
+def init_sql_profiling(app, *engines):
+    """
+    Подключает профилирование к приложению, если включено SQL_PROFILING.
+    Настройки:
+      SQL_PROFILING              - включить профилирование
+      SQL_SLOW_REQUEST_MS        - порог медленного запроса (мс)
+      SQL_N_PLUS_ONE_THRESHOLD   - сколько повторов одного запроса считать N+1
+      SQL_PROFILE_TOP_STATEMENTS - сколько самых долгих запросов писать в лог
+    """
+    if not app.config.get('SQL_PROFILING'):
+        return False
+
+    slow_request_ms = app.config.get('SQL_SLOW_REQUEST_MS', 500)
+    repeat_threshold = app.config.get('SQL_N_PLUS_ONE_THRESHOLD', 5)
+    top_statements = app.config.get('SQL_PROFILE_TOP_STATEMENTS', 5)
+
+    # Запросы считаются по всем engine (основная база и реплика)
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_sql_profile():
+        g.sql_profile = RequestProfile()
+
+    @app.after_request
+    def finish_sql_profile(response):
+        profile = g.pop('sql_profile', None)
+        if profile is None:
+            return response
+
+        total_ms = (time.perf_counter() - profile.started_at) * 1000
+        db_ms = profile.duration * 1000
+
+        response.headers['X-DB-Queries'] = str(profile.count)
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={db_ms:.1f};desc="{profile.count} queries", app;dur={total_ms:.1f}',
+        )
+
+        repeated = profile.repeated(repeat_threshold)
+        if repeated:
+            response.headers['X-DB-Repeated-Queries'] = str(sum(count for _, count in repeated))
+            for statement, count in repeated:
+                app.logger.warning(
+                    'Возможный N+1 в %s %s: запрос выполнен %d раз: %s',
+                    request.method, request.path, count, _preview(statement),
+                )
+
+        if total_ms >= slow_request_ms:
+            lines = [
+                f'  {count} x {duration * 1000:.1f} мс: {_preview(statement)}'
+                for statement, count, duration in profile.slowest(top_statements)
+            ]
+            app.logger.warning(
+                'Медленный запрос %s %s: %.1f мс, SQL: %d запросов за %.1f мс\n%s',
+                request.method, request.path, total_ms, profile.count, db_ms, '\n'.join(lines),
+            )
+
+        return response
+
+    return True
@@ -0,0 +1,262 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import case
+from sqlalchemy.orm import aliased
+
+from cache import invalidate_on_change
+from models import db, User, Airport, Flight, Booking, ArchivedFlight, ArchivedBooking
+
+# Статусы бронирований, которые выводятся отдельными счетчиками
+BOOKING_STATUSES = ('confirmed', 'cancelled', 'refunded')
+
+# Версия статистики увеличивается при любом изменении рейсов и бронирований
+STATISTICS_NAMESPACE = 'statistics'
+invalidate_on_change((Flight, Booking), lambda obj: (STATISTICS_NAMESPACE,))
+
+
+def flight_namespace(flight_id):
+    """Пространство версий данных одного рейса"""
+    return ('flight', flight_id)
+
+
+# Данные рейса меняются при изменении самого рейса или его бронирований
+invalidate_on_change((Flight,), lambda flight: (flight_namespace(flight.id),))
+invalidate_on_change((Booking,), lambda booking: (flight_namespace(booking.flight_id),))
+
+# Итоги за все время считаются по действующим и архивным таблицам (см. archive.py):
+# (бронирования, рейсы)
+BOOKING_SOURCES = ((Booking, Flight), (ArchivedBooking, ArchivedFlight))
+
+
+def resolve_period(period, now=None):
+    """Возвращает (start_date, end_date) для периода today/week/month/all"""
+    now = now or datetime.utcnow()
+
+    if period == 'today':
+        start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        end_date = now.replace(hour=23, minute=59, second=59, microsecond=999999)
+    elif period == 'week':
+        start_date = now - timedelta(days=7)
+        end_date = now
+    elif period == 'month':
+        start_date = now - timedelta(days=30)
+        end_date = now
+    else:  # all
+        start_date = None
+        end_date = None
+
+    return start_date, end_date
+
+
+def statistics_scope(user):
+    """
+    Определяет область статистики для пользователя.
+    None - вся система (админ), id авиакомпании - менеджер,
+    False - нет доступных данных (менеджер без авиакомпании).
+    """
+    if user.is_admin():
+        return None
+    if user.is_manager() and user.company_id:
+        return user.company_id
+    return False
+
+
+def flight_statistics(company_id=None, now=None):
+    """Считает всего/активных/завершенных рейсов одним запросом"""
+    now = now or datetime.utcnow()
+
+    query = db.session.query(
+        db.func.count(Flight.id),
+        db.func.sum(case((Flight.departure_time >= now, 1), else_=0)),
+    )
+    # Архивные рейсы давно вылетели и входят только в общее число и завершенные
+    archived = db.session.query(db.func.count(ArchivedFlight.id))
+    if company_id is not None:
+        query = query.filter(Flight.airline_id == company_id)
+        archived = archived.filter(ArchivedFlight.airline_id == company_id)
+
+    total, active = query.one()
+    total = (total or 0) + (archived.scalar() or 0)
+    active = int(active or 0)
+
+    return {
+        'total_flights': total,
+        'active_flights': active,
+        'completed_flights': total - active,
+    }
+
+
+def _booking_totals(booking, flight, company_id, start_date, end_date):
+    """Строка (количество, выручка, по статусам...) для одной пары таблиц бронирований и рейсов"""
+    columns = [
+        db.func.count(booking.id),
+        db.func.coalesce(db.func.sum(booking.price_paid), 0),
+    ]
+    columns += [
+        db.func.sum(case((booking.status == status, 1), else_=0))
+        for status in BOOKING_STATUSES
+    ]
+
+    query = db.session.query(*columns)
+    if company_id is not None:
+        query = query.join(flight, booking.flight_id == flight.id).filter(
+            flight.airline_id == company_id
+        )
+    if start_date is not None:
+        query = query.filter(booking.booking_date >= start_date)
+    if end_date is not None:
+        query = query.filter(booking.booking_date <= end_date)
+
+    return query.one()
+
+
+def booking_statistics(company_id=None, start_date=None, end_date=None):
+    """
+    Считает количество, выручку и разбивку по статусам бронирований
+    агрегирующими запросами (COUNT/SUM ... CASE) на стороне БД -
+    по одному на действующую и архивную таблицу.
+    """
+    totals = [0] * (2 + len(BOOKING_STATUSES))
+    for booking, flight in BOOKING_SOURCES:
+        row = _booking_totals(booking, flight, company_id, start_date, end_date)
+        totals = [total + (value or 0) for total, value in zip(totals, row)]
+
+    result = {
+        'total_bookings': totals[0],
+        'total_revenue': float(totals[1]),
+    }
+    for status, value in zip(BOOKING_STATUSES, totals[2:]):
+        result[f'{status}_bookings'] = int(value)
+
+    return result
+
+
+def empty_statistics():
+    """Нулевая статистика для пользователей без доступных данных"""
+    result = {
+        'total_flights': 0,
+        'active_flights': 0,
+        'completed_flights': 0,
+        'total_bookings': 0,
+        'total_revenue': 0.0,
+    }
+    for status in BOOKING_STATUSES:
+        result[f'{status}_bookings'] = 0
+    return result
+
+
+def manager_statistics(user, period='all', now=None):
+    """Все показатели панели менеджера для пользователя и периода"""
+    now = now or datetime.utcnow()
+    scope = statistics_scope(user)
+
+    if scope is False:
+        stats = empty_statistics()
+    else:
+        start_date, end_date = resolve_period(period, now)
+        stats = flight_statistics(scope, now)
+        stats.update(booking_statistics(scope, start_date, end_date))
+
+    # Каждое бронирование = 1 пассажир
+    stats['total_passengers'] = stats['total_bookings']
+    stats['period'] = period
+    return stats
+
+
+def admin_statistics(period='all', now=None):
+    """Показатели админ-панели: рейсы системы и бронирования с начала периода"""
+    now = now or datetime.utcnow()
+    start_date, _ = resolve_period(period, now)
+
+    stats = flight_statistics(now=now)
+    bookings = booking_statistics(start_date=start_date)
+    stats['total_bookings'] = bookings['total_bookings']
+    stats['total_revenue'] = bookings['total_revenue']
+    # Каждое бронирование = 1 пассажир
+    stats['total_passengers'] = bookings['total_bookings']
+    return stats
+
+
+def flight_class_statistics(flight_id):
+    """
+    Разбивка бронирований рейса по классам обслуживания одним GROUP BY запросом.
+    Возвращает (class_breakdown, total_bookings, total_revenue).
+    """
+    rows = db.session.query(
+        Booking.seat_class,
+        db.func.count(Booking.id),
+        db.func.coalesce(db.func.sum(Booking.price_paid), 0),
+    ).filter(Booking.flight_id == flight_id).group_by(Booking.seat_class).all()
+
+    class_stats = {
+        seat_class: {'count': count, 'revenue': float(revenue)}
+        for seat_class, count, revenue in rows
+    }
+    total_bookings = sum(item['count'] for item in class_stats.values())
+    total_revenue = sum(item['revenue'] for item in class_stats.values())
+    return class_stats, total_bookings, total_revenue
+
+
+def user_booking_statistics(user_id):
+    """
+    Разбивка бронирований пользователя по статусам одним GROUP BY запросом.
+    Возвращает (status_breakdown, total_bookings, total_spent).
+    """
+    status_stats = {}
+    for booking, _ in BOOKING_SOURCES:
+        rows = db.session.query(
+            booking.status,
+            db.func.count(booking.id),
+            db.func.coalesce(db.func.sum(booking.price_paid), 0),
+        ).filter(booking.user_id == user_id).group_by(booking.status).all()
+
+        for status, count, amount in rows:
+            item = status_stats.setdefault(status, {'count': 0, 'amount': 0.0})
+            item['count'] += count
+            item['amount'] += float(amount)
+
+    total_bookings = sum(item['count'] for item in status_stats.values())
+    total_spent = sum(item['amount'] for item in status_stats.values())
+    return status_stats, total_bookings, total_spent
+
+
+def user_top_routes(user_id, limit=3):
+    """Самые частые направления пользователя: [("Город → Город", количество), ...]"""
+    dep_airport = aliased(Airport)
+    arr_airport = aliased(Airport)
+
+    # Направления пользователя немногочисленны: счетчики по действующим
+    # и архивным бронированиям складываются, затем выбираются самые частые
+    routes = {}
+    for booking, flight in BOOKING_SOURCES:
+        rows = db.session.query(
+            dep_airport.city,
+            arr_airport.city,
+            db.func.count(booking.id),
+        ).join(flight, booking.flight_id == flight.id)\
+            .join(dep_airport, flight.departure_airport_id == dep_airport.id)\
+            .join(arr_airport, flight.arrival_airport_id == arr_airport.id)\
+            .filter(booking.user_id == user_id)\
+            .group_by(dep_airport.city, arr_airport.city).all()
+
+        for departure, arrival, count in rows:
+            route = f"{departure} → {arrival}"
+            routes[route] = routes.get(route, 0) + count
+
+    return sorted(routes.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+def manager_assignment_statistics():
+    """Всего/назначенных/неназначенных менеджеров одним запросом"""
+    total, assigned = db.session.query(
+        db.func.count(User.id),
+        db.func.count(User.company_id),
+    ).filter(User.role == 'manager').one()
+    total = total or 0
+    assigned = assigned or 0
+
+    return {
+        'total_managers': total,
+        'assigned_managers': assigned,
+        'unassigned_managers': total - assigned,
+    }
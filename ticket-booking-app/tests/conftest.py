@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """Приложение на временной базе SQLite, заполненной генератором (профиль demo)"""
+    path = tmp_path_factory.mktemp('db') / 'test.db'
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+
+    from app import create_app
+    app, init_database = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    init_database()
+    return app
+
+
+@pytest.fixture
+def login(app):
+    """Возвращает тестовый клиент, авторизованный под указанным пользователем"""
+    def login_as(username, password):
+        client = app.test_client()
+        response = client.post('/login', data={'username': username, 'password': password})
+        assert response.status_code == 302
+        return client
+    return login_as
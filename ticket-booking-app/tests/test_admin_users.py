@@ -0,0 +1,59 @@
+from datetime import datetime
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.schema import CreateIndex
+
+from app import _prefix_match
+from migrations import PREFIX_SEARCH_INDEXES
+from models import db, Booking, Flight, User, booking_archive
+
+
+def _booking(user_id, reference, booking_date):
+    return {
+        'booking_reference': reference, 'user_id': user_id, 'flight_id': 1,
+        'passenger_first_name': 'Ivan', 'passenger_last_name': 'Petrov',
+        'price_paid': 1000.0, 'status': 'confirmed', 'booking_date': booking_date,
+    }
+
+
+def test_users_page_with_null_booking_date(app, login):
+    """Бронирование без даты в одной из таблиц не ломает сводку по пользователю"""
+    client = login('admin', 'admin123')
+    with app.app_context():
+        user = User(username='nulldate', email='nulldate@example.com')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+        db.session.execute(Booking.__table__.insert(), _booking(user_id, 'NULLD1', None))
+        db.session.execute(booking_archive.insert(), dict(
+            _booking(user_id, 'NULLD2', datetime(2020, 1, 1)), id=10 ** 9, archived_at=datetime(2021, 1, 1),
+        ))
+        db.session.commit()
+    try:
+        response = client.get('/admin/users?q=nulldate')
+        assert response.status_code == 200
+        assert 'nulldate' in response.get_data(as_text=True)
+    finally:
+        with app.app_context():
+            db.session.execute(Booking.__table__.delete().where(Booking.__table__.c.user_id == user_id))
+            db.session.execute(booking_archive.delete().where(booking_archive.c.user_id == user_id))
+            db.session.execute(User.__table__.delete().where(User.__table__.c.id == user_id))
+            db.session.commit()
+
+
+def test_prefix_match_per_dialect(app):
+    """Диапазон строк - только в SQLite; в PostgreSQL - LIKE с экранированием"""
+    with app.app_context():
+        sqlite_sql = str(_prefix_match(User.last_name, 'Pe').compile(dialect=sqlite.dialect()))
+        assert 'LIKE' not in sqlite_sql and '>=' in sqlite_sql
+        condition = _prefix_match(db.func.lower(User.username), 'a_%', dialect='postgresql')
+        compiled = condition.compile(dialect=postgresql.dialect())
+        assert "LIKE" in str(compiled) and 'ESCAPE' in str(compiled)
+        assert compiled.params['lower_1'] == 'a/_/%'
+
+
+def test_prefix_search_indexes_use_pattern_ops():
+    for index in list(User.__table__.indexes) + list(Flight.__table__.indexes):
+        ddl = str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+        expected = index.name in PREFIX_SEARCH_INDEXES
+        assert ('text_pattern_ops' in ddl) == expected, ddl
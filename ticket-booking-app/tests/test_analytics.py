@@ -0,0 +1,95 @@
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+import analytics
+from analytics import booking_timeseries
+from models import db, Booking
+
+
+def _add_booking(flight_id, booking_date, reference):
+    db.session.execute(Booking.__table__.insert(), {
+        'booking_reference': reference, 'user_id': 1, 'flight_id': flight_id,
+        'passenger_first_name': 'Ivan', 'passenger_last_name': 'Petrov',
+        'price_paid': 1000.0, 'status': 'confirmed', 'booking_date': booking_date,
+    })
+
+
+def _total_bookings(result):
+    return sum(point['bookings'] for item in result['series'] for point in item['points'])
+
+
+def test_booking_of_unknown_flight_is_skipped(app):
+    """Бронирование несуществующего рейса не приписывается соседнему рейсу"""
+    with app.app_context():
+        start, end = datetime(2000, 1, 1), datetime(2100, 1, 1)
+        expected = booking_timeseries(None, start, end)
+        try:
+            _add_booking(10 ** 9, datetime(2030, 1, 1), 'ZZZZZ1')
+            assert booking_timeseries(None, start, end) == expected
+        finally:
+            db.session.rollback()
+
+
+def test_no_flights_in_period(app):
+    with app.app_context():
+        start, end = datetime(2090, 1, 1), datetime(2090, 2, 1)
+        try:
+            _add_booking(10 ** 9, datetime(2090, 1, 10), 'ZZZZZ2')
+            result = booking_timeseries(None, start, end, granularity='week', group_by='route')
+            assert result['series'] == [] and _total_bookings(result) == 0
+        finally:
+            db.session.rollback()
+
+
+def test_stale_route_snapshot_is_rebuilt_once(app, monkeypatch):
+    """Одновременные запросы к устаревшему снимку запускают одно перестроение"""
+    started = threading.Event()
+    release = threading.Event()
+    builds = []
+
+    def slow_build():
+        builds.append(1)
+        started.set()
+        release.wait(5)
+        return SimpleNamespace(built_at=datetime.utcnow())
+
+    store = analytics.RouteSnapshotStore(app, max_age=0)
+    store._snapshot = stale = SimpleNamespace(built_at=datetime(2000, 1, 1))
+    monkeypatch.setattr(analytics, 'build_route_snapshot', slow_build)
+
+    assert store.get() is stale
+    assert started.wait(5)
+    assert all(store.get() is stale for _ in range(10))
+    release.set()
+    for _ in range(50):
+        if not store._lock.locked():
+            break
+        time.sleep(0.05)
+    assert len(builds) == 1 and store._snapshot is not stale
+
+
+def test_routes_api_rejects_negative_limit(login):
+    client = login('manager', 'manager123')
+    assert client.get('/manager/api/routes?limit=-1').status_code == 400
+    assert client.get('/manager/api/routes?limit=5').status_code == 200
+
+
+def test_routes_api_zero_limit_returns_no_routes(login):
+    client = login('manager', 'manager123')
+    assert client.get('/manager/api/routes?limit=0').get_json()['routes'] == []
+
+
+def test_failed_background_rebuild_is_logged(app, monkeypatch, caplog):
+    def failing_build():
+        raise RuntimeError('boom')
+
+    store = analytics.RouteSnapshotStore(app, max_age=0)
+    store._snapshot = stale = SimpleNamespace(built_at=datetime(2000, 1, 1))
+    monkeypatch.setattr(analytics, 'build_route_snapshot', failing_build)
+
+    assert store._lock.acquire(blocking=False)
+    store._rebuild_in_background()
+    assert not store._lock.locked() and store._snapshot is stale
+    assert 'boom' in caplog.text
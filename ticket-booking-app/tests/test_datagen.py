@@ -0,0 +1,89 @@
+from datetime import date
+
+from sqlalchemy import create_engine, select
+
+from datagen import BulkWriter, generate_data
+from models import db, User, Flight, Booking, Payment
+from refdata import load_reference_data
+from schedule_import import import_schedule
+
+# Уникальные колонки, которые у копии строки должны отличаться
+UNIQUE_OVERRIDES = {
+    User: {'username': 'roundtrip', 'email': 'roundtrip@example.com'},
+    Booking: {'booking_reference': 'RTRIP1'},
+}
+
+
+def _raw_row(connection, table, row_id, columns):
+    """Значения колонок в том виде, в котором они хранятся в SQLite (без обработки типов)"""
+    names = ', '.join(columns)
+    return connection.exec_driver_sql(f'SELECT {names} FROM "{table.name}" WHERE id = ?', (row_id,)).one()
+
+
+def test_generated_rows_are_stored_like_orm_rows(app):
+    """Строки генератора хранятся в том же формате, что и записанные через ORM (даты с микросекундами)"""
+    with app.app_context():
+        for model in (User, Flight, Booking, Payment):
+            table = model.__table__
+            columns = [column.name for column in table.columns if column.name != 'id']
+            generated = db.session.get(model, 1)
+            copy = model(**{name: getattr(generated, name) for name in columns})
+            for name, value in UNIQUE_OVERRIDES.get(model, {}).items():
+                setattr(copy, name, value)
+            db.session.add(copy)
+            db.session.flush()
+
+            connection = db.session.connection()
+            compared = [name for name in columns if name not in UNIQUE_OVERRIDES.get(model, {})]
+            assert _raw_row(connection, table, 1, compared) == _raw_row(connection, table, copy.id, compared), model
+            db.session.rollback()
+
+
+def test_generated_flight_matches_import_key(app):
+    """Повторный импорт сгенерированного рейса с тем же ключом обновляет его, а не добавляет дубль"""
+    with app.app_context():
+        reference = load_reference_data()
+        flight = db.session.get(Flight, 1)
+        lines = [
+            'flight_number,airline,departure_airport,arrival_airport,departure_time,arrival_time,economy_price\n',
+            f'{flight.flight_number},{reference.airlines_by_id[flight.airline_id].code},'
+            f'{reference.airports_by_id[flight.departure_airport_id].code},'
+            f'{reference.airports_by_id[flight.arrival_airport_id].code},'
+            f'{flight.departure_time.isoformat()},{flight.arrival_time.isoformat()},{flight.economy_price}\n',
+        ]
+        report = import_schedule(lines, reference, dry_run=True)
+        assert (report.inserted, report.updated, report.error_count) == (0, 1, 0)
+
+
+def test_bulk_writer_applies_dialect_bind_processors(app):
+    with app.app_context():
+        writer = BulkWriter(db.session.connection(), Flight.__table__, ('id', 'departure_time'))
+        assert writer.processors and writer.processors[0][0] == 1
+        db.session.rollback()
+
+
+def test_generation_restores_synchronous(app):
+    """После генерации соединения пула снова фиксируют транзакции с настроенным synchronous (NORMAL)"""
+    with app.app_context():
+        connections = [db.engine.connect() for _ in range(3)]
+        try:
+            for connection in connections:
+                assert connection.exec_driver_sql('PRAGMA synchronous').scalar() == 1
+        finally:
+            for connection in connections:
+                connection.close()
+
+
+def test_generation_is_deterministic(app, tmp_path):
+    """Одинаковые seed и базовая дата дают одинаковые рейсы"""
+    rows = []
+    for index in range(2):
+        engine = create_engine(f'sqlite:///{tmp_path / f"gen{index}.db"}')
+        db.metadata.create_all(engine)
+        with app.app_context():
+            generate_data(engine, seed=5, base_date=date(2026, 1, 1), airports=10, airlines=3, users=5,
+                          flights=50, bookings=80)
+        with engine.connect() as connection:
+            rows.append(connection.execute(select(Flight.__table__)).all())
+        engine.dispose()
+    assert rows[0] == rows[1]
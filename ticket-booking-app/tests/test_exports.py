@@ -0,0 +1,37 @@
+import pytest
+
+import exports
+from models import db, Booking, Flight
+
+
+def test_csv_export_escapes_formulas(app, login):
+    """Значения, похожие на формулы, выгружаются как текст, имя файла - в кавычках"""
+    client = login('manager', 'manager123')
+    with app.app_context():
+        booking = Booking.query.join(Flight).filter(Flight.airline_id == 1).first()
+        booking_id, flight_id = booking.id, booking.flight_id
+        original = booking.passenger_first_name, booking.passenger_phone
+        booking.passenger_first_name = '=HYPERLINK("http://example.com")'
+        booking.passenger_phone = '+7 900 123-45-67'
+        db.session.commit()
+    try:
+        response = client.get(f'/manager/passengers/export?format=csv&flight={flight_id}')
+        assert response.status_code == 200
+        assert response.headers['Content-Disposition'].startswith('attachment; filename="manifest_')
+        body = response.get_data(as_text=True)
+        assert ';"\'=HYPERLINK(""http://example.com"")";' in body
+        # Телефон не похож на формулу и выгружается без изменений
+        assert ';+7 900 123-45-67;' in body
+    finally:
+        with app.app_context():
+            booking = db.session.get(Booking, booking_id)
+            booking.passenger_first_name, booking.passenger_phone = original
+            db.session.commit()
+
+
+def test_xlsx_writes_formula_like_text_unchanged():
+    pytest.importorskip('openpyxl')
+    sheet = exports.Workbook(write_only=True).create_sheet('test')
+    cell = exports._xlsx_cell(sheet, '=1+1')
+    assert (cell.value, cell.data_type) == ('=1+1', 's')
+    assert exports._xlsx_cell(sheet, '+7 900 123-45-67') == '+7 900 123-45-67'
@@ -0,0 +1,46 @@
+from cache import sync_shared_versions
+from models import db, Airport, Flight
+from test_principals import bump_in_other_process
+
+
+def _details(client, flight_id):
+    response = client.get(f'/api/flight/{flight_id}/details')
+    assert response.status_code == 200
+    return response.get_json()['flight']
+
+
+def test_flight_change_in_other_worker_invalidates_details(app, login):
+    client = login('admin', 'admin123')
+    flights = Flight.__table__
+    with app.app_context():
+        sync_shared_versions(0)
+        flight_id = db.session.query(Flight.id).order_by(Flight.id.desc()).first()[0]
+        status = _details(client, flight_id)['status']
+
+        with db.engine.begin() as connection:
+            connection.execute(flights.update().where(flights.c.id == flight_id).values(status='delayed-test'))
+            bump_in_other_process(connection, 'flight')
+        try:
+            sync_shared_versions(0)
+            assert _details(client, flight_id)['status'] == 'delayed-test'
+        finally:
+            with db.engine.begin() as connection:
+                connection.execute(flights.update().where(flights.c.id == flight_id).values(status=status))
+
+
+def test_airport_rename_invalidates_details(app, login):
+    client = login('admin', 'admin123')
+    with app.app_context():
+        flight = Flight.query.order_by(Flight.id.desc()).first()
+        flight_id, airport_id = flight.id, flight.departure_airport_id
+        name = _details(client, flight_id)['departure_airport']['name']
+
+        airport = db.session.get(Airport, airport_id)
+        airport.name = 'Переименован'
+        db.session.commit()
+        try:
+            assert _details(client, flight_id)['departure_airport']['name'] == 'Переименован'
+        finally:
+            airport = db.session.get(Airport, airport_id)
+            airport.name = name
+            db.session.commit()
@@ -0,0 +1,44 @@
+from sqlalchemy import create_engine, inspect, text
+
+import migrations
+from cache import _shared_metadata
+from dbrouting import _heartbeat_metadata
+from models import db
+
+
+def _schema(engine):
+    """{таблица: ({колонка: (тип, nullable)}, {индексы})} без служебной таблицы версий"""
+    inspector = inspect(engine)
+    schema = {}
+    with engine.connect() as connection:
+        for table in inspector.get_table_names():
+            if table == migrations.schema_version.name:
+                continue
+            columns = {column['name']: (str(column['type']), column['nullable'])
+                       for column in inspector.get_columns(table)}
+            # Индексы берутся из sqlite_master: рефлексия пропускает индексы по выражениям
+            indexes = set(connection.execute(text(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table "
+                "AND name NOT LIKE 'sqlite_autoindex%'"
+            ), {'table': table}).scalars())
+            schema[table] = (columns, indexes)
+    return schema
+
+
+def test_initial_schema_is_baseline():
+    """Миграция 1 создает исходную схему, а не текущие модели"""
+    engine = create_engine('sqlite://')
+    migrations.upgrade(engine, target=1)
+    schema = _schema(engine)
+    assert 'cancelled_at' not in schema['booking'][0]
+    assert 'schedule_pattern' not in schema and 'flight_archive' not in schema
+
+
+def test_migrations_build_current_models():
+    engine = create_engine('sqlite://')
+    migrations.upgrade(engine)
+
+    expected = create_engine('sqlite://')
+    for metadata in (db.metadata, _heartbeat_metadata, _shared_metadata):
+        metadata.create_all(expected)
+    assert _schema(engine) == _schema(expected)
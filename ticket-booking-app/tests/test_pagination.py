@@ -0,0 +1,88 @@
+import base64
+import json
+import re
+from datetime import datetime
+from html import unescape
+
+import pytest
+
+from models import db, Booking, Flight
+from pagination import _check_values, decode_cursor, encode_cursor
+
+
+def _raw_cursor(values):
+    """Курсор в формате encode_cursor, но с произвольным JSON"""
+    raw = json.dumps(values).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def test_cursor_round_trip():
+    values = [datetime(2030, 1, 2, 3, 4), 'ABC', 42]
+    assert decode_cursor(encode_cursor(values)) == values
+
+
+@pytest.mark.parametrize('values', [
+    [{}],
+    [{'dt': 1}, 1],
+    [{'dt': '2030-01-01', 'x': 1}, 1],
+    {'dt': '2030-01-01'},
+])
+def test_malformed_cursor_values_are_rejected(values):
+    with pytest.raises(ValueError):
+        decode_cursor(_raw_cursor(values))
+
+
+@pytest.mark.parametrize('values', [
+    [datetime(2030, 1, 1)],
+    [datetime(2030, 1, 1), 1, 2],
+    [datetime(2030, 1, 1), '1'],
+    ['2030-01-01', 1],
+    [datetime(2030, 1, 1), True],
+    [datetime(2030, 1, 1), None],
+])
+def test_cursor_must_match_columns(values):
+    with pytest.raises(ValueError):
+        _check_values([Booking.booking_date, Booking.id], values)
+
+
+def test_cursor_matching_columns_is_accepted():
+    _check_values([Booking.booking_date, Booking.id], [datetime(2030, 1, 1), 1])
+    _check_values([Flight.economy_price, Flight.id], [5000, 1])
+
+
+@pytest.mark.parametrize('cursor', [
+    _raw_cursor([{}]),
+    _raw_cursor(['x', 'y']),
+    encode_cursor([datetime(2030, 1, 1)]),
+])
+def test_bad_cursor_redirects(login, cursor):
+    client = login('manager', 'manager123')
+    assert client.get(f'/manager/passengers?cursor={cursor}').status_code == 302
+
+
+def test_passengers_with_null_booking_date_are_paged_once(app, login):
+    """Бронирования без даты не пропускаются и не повторяются между страницами"""
+    client = login('manager', 'manager123')
+    references = ['NULLP1', 'NULLP2', 'NULLP3', 'NULLP4']
+    with app.app_context():
+        flight_id = Flight.query.filter_by(airline_id=1).first().id
+        for reference, booking_date in zip(references, (None, datetime(2030, 1, 1), None, None)):
+            db.session.execute(Booking.__table__.insert(), {
+                'booking_reference': reference, 'user_id': 3, 'flight_id': flight_id,
+                'passenger_first_name': 'Ivan', 'passenger_last_name': 'Petrov',
+                'price_paid': 1000.0, 'status': 'confirmed', 'booking_date': booking_date,
+            })
+        db.session.commit()
+    try:
+        seen = []
+        url = f'/manager/passengers?flight={flight_id}&per_page=1'
+        while url:
+            html = client.get(url).get_data(as_text=True)
+            seen += [reference for reference in references if reference in html]
+            match = re.search(r'href="([^"]*cursor=[^"]*)"', html)
+            url = unescape(match.group(1)) if match else None
+        assert sorted(seen) == references
+    finally:
+        with app.app_context():
+            db.session.execute(Booking.__table__.delete().where(Booking.__table__.c.booking_reference.in_(references)))
+            db.session.commit()
@@ -0,0 +1,55 @@
+from sqlalchemy import select, update
+
+from cache import SHARED_VERSION_ROWS, shared_versions, sync_shared_versions
+from models import db, User
+from principals import UserPrincipalCache
+
+
+def shared_version(group):
+    return db.session.execute(
+        select(shared_versions.c.version).where(shared_versions.c.id == SHARED_VERSION_ROWS[group])
+    ).scalar()
+
+
+def bump_in_other_process(connection, group):
+    """Общая версия, увеличенная другим процессом: локальные версии этого процесса не меняются"""
+    connection.execute(update(shared_versions).where(shared_versions.c.id == SHARED_VERSION_ROWS[group])
+                       .values(version=shared_versions.c.version + 1))
+
+
+def test_user_change_bumps_shared_version(app):
+    with app.app_context():
+        user = User.query.filter_by(username='user').one()
+        before = shared_version('user')
+
+        user.block_user()
+        db.session.commit()
+        assert shared_version('user') == before + 1
+
+        user.unblock_user()
+        db.session.commit()
+        assert shared_version('user') == before + 2
+
+
+def test_change_in_other_worker_reloads_cached_user(app):
+    """Изменение, сделанное другим процессом, видно после сверки общей версии"""
+    cache = UserPrincipalCache(ttl=300)
+    users = User.__table__
+    with app.app_context():
+        sync_shared_versions(0)
+        user_id = User.query.filter_by(username='user').one().id
+        assert cache.load(user_id).is_active
+        db.session.remove()
+
+        with db.engine.begin() as connection:
+            connection.execute(update(users).where(users.c.id == user_id).values(is_active=False))
+            bump_in_other_process(connection, 'user')
+        try:
+            assert cache.load(user_id).is_active  # до сверки - из кэша
+            db.session.remove()
+            sync_shared_versions(0)
+            assert not cache.load(user_id).is_active
+        finally:
+            db.session.remove()
+            with db.engine.begin() as connection:
+                connection.execute(update(users).where(users.c.id == user_id).values(is_active=True))
@@ -0,0 +1,28 @@
+import pytest
+
+from models import db
+from querycount import QUERY_BUDGETS, count_page_queries
+
+# Учетные записи генератора (datagen.DEMO_ACCOUNTS) и страницы из QUERY_BUDGETS, доступные каждой роли
+ROLE_PAGES = (
+    (('user', 'user123'), ('/', '/search', '/profile')),
+    (('admin', 'admin123'), ('/admin', '/admin/flights')),
+    (('manager', 'manager123'), ('/manager', '/manager/flights', '/manager/passengers')),
+)
+
+
+def test_all_budgets_are_checked():
+    assert {url for _, urls in ROLE_PAGES for url in urls} == set(QUERY_BUDGETS)
+
+
+@pytest.mark.parametrize('account, url', [(account, url) for account, urls in ROLE_PAGES for url in urls])
+def test_page_within_query_budget(app, login, account, url):
+    client = login(*account)
+    # Бюджет - для повторного открытия страницы: пользователь уже в кэше, а общие
+    # версии кэшей (cache.py) сверяются не чаще раза в CACHE_SYNC_SECONDS
+    client.get(url)
+    with app.app_context():
+        engine = db.engine
+    response, count = count_page_queries(client, engine, url)
+    assert response.status_code == 200
+    assert count <= QUERY_BUDGETS[url], f'{url}: {count} SQL-запросов, допустимо {QUERY_BUDGETS[url]}'
@@ -0,0 +1,23 @@
+from cache import sync_shared_versions
+from models import db, Airport
+from refdata import ReferenceDataCache
+from test_principals import bump_in_other_process
+
+
+def test_airport_from_other_worker_reaches_reference_cache(app):
+    cache = ReferenceDataCache()
+    with app.app_context():
+        sync_shared_versions(0)
+        assert 'ZZZ' not in cache.get().airports_by_code
+
+        with db.engine.begin() as connection:
+            connection.execute(Airport.__table__.insert(), {
+                'code': 'ZZZ', 'name': 'Test', 'city': 'Testcity', 'country': 'RU',
+            })
+            bump_in_other_process(connection, 'reference')
+        try:
+            sync_shared_versions(0)
+            assert 'ZZZ' in cache.get().airports_by_code
+        finally:
+            with db.engine.begin() as connection:
+                connection.execute(Airport.__table__.delete().where(Airport.__table__.c.code == 'ZZZ'))
@@ -0,0 +1,59 @@
+from models import db, Flight
+from refdata import load_reference_data
+from schedule_import import import_schedule
+from test_principals import shared_version
+
+HEADER = 'flight_number,airline,departure_airport,arrival_airport,departure_time,arrival_time,economy_price'
+
+
+def _import(lines):
+    return import_schedule(lines, load_reference_data())
+
+
+def test_missing_optional_columns_keep_existing_values(app):
+    """Повторный импорт минимального файла не сбрасывает статус, места, цены и тип самолета"""
+    with app.app_context():
+        report = _import([
+            HEADER + ',aircraft_type,total_seats,business_price,status\n',
+            'ZZ1,SU,SVO,LED,2027-03-01 10:00,2027-03-01 11:30,5000,Airbus A321,220,15000,cancelled\n',
+        ])
+        assert (report.inserted, report.error_count) == (1, 0)
+
+        report = _import([HEADER + '\n', 'ZZ1,SU,SVO,LED,2027-03-01 10:00,2027-03-01 11:45,5500\n'])
+        assert (report.inserted, report.updated, report.error_count) == (0, 1, 0)
+
+        flight = Flight.query.filter_by(flight_number='ZZ1').one()
+        assert (flight.status, flight.total_seats, flight.available_seats) == ('cancelled', 220, 220)
+        assert (flight.business_price, flight.aircraft_type) == (15000, 'Airbus A321')
+        assert (flight.economy_price, flight.arrival_time.minute) == (5500, 45)
+
+
+def test_new_flight_gets_defaults_for_missing_columns(app):
+    with app.app_context():
+        report = _import([HEADER + '\n', 'ZZ2,SU,SVO,LED,2027-03-02 10:00,2027-03-02 11:30,5000\n'])
+        assert report.inserted == 1
+
+        flight = Flight.query.filter_by(flight_number='ZZ2').one()
+        assert (flight.status, flight.total_seats, flight.available_seats) == ('scheduled', 180, 180)
+        assert flight.business_price is None
+
+
+def test_timezone_aware_time_is_row_error(app):
+    with app.app_context():
+        report = _import([
+            HEADER + '\n',
+            'ZZ3,SU,SVO,LED,2027-01-01T10:00+03:00,2027-01-01 12:00,5000\n',
+            'ZZ3,SU,SVO,LED,2027-01-01 10:00,2027-01-01 12:00,5000\n',
+        ])
+        assert (report.inserted, report.error_count) == (1, 1)
+        assert report.errors[0]['line'] == 2
+        assert 'часовым поясом' in report.errors[0]['error']
+
+
+def test_import_bumps_shared_versions(app):
+    """Импорт из другого процесса (manage.py) сбрасывает кэши статистики и рейсов сервера"""
+    with app.app_context():
+        before = shared_version('statistics'), shared_version('flight')
+        _import([HEADER + '\n', 'ZZ3,SU,SVO,LED,2027-03-03 10:00,2027-03-03 11:30,5000\n'])
+        assert _import([HEADER + '\n', 'ZZ3,SU,SVO,LED,2027-03-03 10:00,2027-03-03 11:40,5000\n']).updated == 1
+        assert (shared_version('statistics'), shared_version('flight')) == (before[0] + 2, before[1] + 1)
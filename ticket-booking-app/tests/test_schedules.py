@@ -0,0 +1,100 @@
+from datetime import date, time, timedelta
+
+from models import db, Booking, Flight, SchedulePattern
+from schedules import RESCHEDULE_FIELDS, materialize_patterns, reschedule_needed, save_pattern
+from test_principals import shared_version
+
+HORIZON_DAYS = 14
+
+
+def _new_pattern(flight_number, days_of_week='1234567'):
+    """Ежедневное расписание с завтрашнего дня, развернутое на HORIZON_DAYS"""
+    pattern = SchedulePattern(
+        flight_number=flight_number, airline_id=1, departure_airport_id=1, arrival_airport_id=2,
+        days_of_week=days_of_week, valid_from=date.today() + timedelta(days=1),
+        departure_time=time(10, 0), arrival_time=time(12, 0),
+        total_seats=150, economy_price=5000,
+    )
+    save_pattern(pattern, HORIZON_DAYS)
+    return pattern
+
+
+def _save(pattern, **changes):
+    previous = {field: getattr(pattern, field) for field in RESCHEDULE_FIELDS}
+    for field, value in changes.items():
+        setattr(pattern, field, value)
+    return save_pattern(pattern, HORIZON_DAYS, reschedule=reschedule_needed(pattern, previous))
+
+
+def _flights(pattern):
+    return Flight.query.filter_by(pattern_id=pattern.id).order_by(Flight.departure_time).all()
+
+
+def _book(flight):
+    db.session.add(Booking(
+        booking_reference=f'S{flight.id:05d}'[-6:], user_id=1, flight_id=flight.id,
+        passenger_first_name='Ivan', passenger_last_name='Petrov', price_paid=flight.economy_price,
+    ))
+    db.session.commit()
+
+
+def test_price_change_updates_flights_in_place(app):
+    with app.app_context():
+        pattern = _new_pattern('SP1')
+        flight_ids = [flight.id for flight in _flights(pattern)]
+        assert len(flight_ids) == HORIZON_DAYS
+        assert pattern.materialized_until == date.today() + timedelta(days=HORIZON_DAYS)
+        before = shared_version('statistics')
+
+        assert _save(pattern, economy_price=6000) == (HORIZON_DAYS, 0)
+        db.session.expire_all()
+        flights = _flights(pattern)
+        assert [flight.id for flight in flights] == flight_ids
+        assert {flight.economy_price for flight in flights} == {6000}
+        assert shared_version('statistics') > before
+
+
+def test_days_change_recreates_flights(app):
+    with app.app_context():
+        pattern = _new_pattern('SP2')
+
+        changed, created = _save(pattern, days_of_week='1')
+        assert changed == HORIZON_DAYS and created == 2
+        flights = _flights(pattern)
+        assert len(flights) == 2 and {flight.departure_time.isoweekday() for flight in flights} == {1}
+        assert pattern.materialized_until == date.today() + timedelta(days=HORIZON_DAYS)
+
+
+def test_booked_flight_is_left_untouched(app):
+    with app.app_context():
+        pattern = _new_pattern('SP3')
+        booked = _flights(pattern)[0]
+        booked_id, booked_day = booked.id, booked.departure_time.isoweekday()
+        _book(booked)
+
+        assert _save(pattern, economy_price=7000) == (HORIZON_DAYS - 1, 0)
+        db.session.expire_all()
+        assert db.session.get(Flight, booked_id).economy_price == 5000
+
+        # Дни без дня забронированного рейса: он остается, остальные создаются заново
+        other_day = booked_day % 7 + 1
+        changed, created = _save(pattern, days_of_week=str(other_day))
+        assert (changed, created) == (HORIZON_DAYS - 1, 2)
+        flights = _flights(pattern)
+        assert booked_id in {flight.id for flight in flights}
+        assert {flight.departure_time.isoweekday() for flight in flights} == {booked_day, other_day}
+
+
+def test_deactivated_pattern_is_not_materialized(app):
+    with app.app_context():
+        pattern = _new_pattern('SP4')
+        booked = _flights(pattern)[-1]
+        booked_id = booked.id
+        _book(booked)
+
+        assert _save(pattern, is_active=False) == (HORIZON_DAYS - 1, 0)
+        assert pattern.materialized_until is None
+        assert [flight.id for flight in _flights(pattern)] == [booked_id]
+
+        materialize_patterns(HORIZON_DAYS)
+        assert [flight.id for flight in _flights(pattern)] == [booked_id]